@@ -3,26 +3,88 @@ FastAPI application for the AI style transfer service.
 Provides endpoints for image transformation and service status.
 """
 
-from fastapi import FastAPI, UploadFile, HTTPException, File, Form
+from fastapi import FastAPI, UploadFile, HTTPException, File, Form, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, Response
 import uvicorn
+import torch
+import psutil
 from pathlib import Path
+from io import BytesIO
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
 import logging
-import shutil
+import os
 import uuid
 from datetime import datetime
 from typing import Optional
 
-from .services.transform_service import TransformationService
+from ..utils.file_io import buffer_upload_file, default_temp_root
+from ..utils.image_processing import IMAGE_SIGNATURE_LENGTH, is_image_data
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Lock files held for the life of the worker process; closing them releases the GPU slot
+_worker_slot_locks = []
+
+def _pin_worker_gpu():
+    """
+    Pin this worker process to one GPU before PyTorch or TensorFlow initialize CUDA.
+
+    The launcher exports POSTCARD_WORKER_SLOTS and the GPU list in CUDA_VISIBLE_DEVICES.
+    Each worker claims the first free slot lock file and narrows CUDA_VISIBLE_DEVICES
+    to that slot's GPU, so the workers spread round-robin over the devices. A worker
+    restarted by uvicorn takes over the slot released by the one it replaces.
+    """
+    slots = int(os.getenv("POSTCARD_WORKER_SLOTS", "0"))
+    device_ids = [d for d in os.getenv("CUDA_VISIBLE_DEVICES", "").split(",") if d.strip()]
+    if slots <= 1 or len(device_ids) <= 1:
+        return
+    import fcntl
+
+    lock_dir = Path(os.getenv("POSTCARD_TEMP_DIR", str(default_temp_root())))
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    for slot in range(slots):
+        lock_file = open(lock_dir / f"worker_slot_{slot}.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        _worker_slot_locks.append(lock_file)
+        device_id = device_ids[slot % len(device_ids)]
+        os.environ["CUDA_VISIBLE_DEVICES"] = device_id
+        logger.info(f"Worker {os.getpid()} took slot {slot}, pinned to GPU {device_id}")
+        return
+    logger.warning(f"No free worker slot for process {os.getpid()}; it sees all GPUs ({','.join(device_ids)})")
+
+# Must run before the service module is imported: TensorFlow enumerates the GPUs at import time
+_pin_worker_gpu()
+
+from .services.transform_service import TransformationService
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create the transformation service once per worker process at startup,
+    so models are loaded and warmed before the first request instead of at import.
+    """
+    if os.getenv("TORCH_NUM_THREADS"):
+        torch.set_num_threads(int(os.environ["TORCH_NUM_THREADS"]))
+    # Directory creation can block for a long time on network filesystems
+    await asyncio.to_thread(UPLOAD_DIR.mkdir, parents=True, exist_ok=True)
+    await asyncio.to_thread(RESULT_DIR.mkdir, parents=True, exist_ok=True)
+    app.state.transform_service = TransformationService()
+    yield
+    await app.state.transform_service.cleanup()
+
 app = FastAPI(
     title="Postcard AI Transformer",
     description="AI service for transforming modern photos into historical postcard styles",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -33,12 +95,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-UPLOAD_DIR = Path("temp/uploads")
-RESULT_DIR = Path("temp/results")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-RESULT_DIR.mkdir(parents=True, exist_ok=True)
+TEMP_ROOT = Path(os.getenv("POSTCARD_TEMP_DIR", str(default_temp_root())))
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", str(TEMP_ROOT / "uploads")))
+RESULT_DIR = Path(os.getenv("RESULT_DIR", str(TEMP_ROOT / "results")))
+
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+INLINE_JPEG_QUALITY = 90
+# Result IDs are unique, so browsers and proxies may cache downloads
+RESULT_CACHE_CONTROL = "public, max-age=3600, immutable"
+# When set (e.g. "/protected-results/"), nginx serves result files via X-Accel-Redirect
+RESULT_ACCEL_REDIRECT_PREFIX = os.getenv("RESULT_ACCEL_REDIRECT_PREFIX")
 
-transform_service = TransformationService()
+# Results kept in RESULT_DIR for /result/{id}, oldest first, mapped to their size in bytes
+_result_cache: "OrderedDict[str, int]" = OrderedDict()
+
+async def _register_result(process_id: str, result_path: Path) -> None:
+    """
+    Track a saved result and evict the oldest ones once the cache exceeds its byte budget.
+    The stat and the deletions run on worker threads; the cache itself is only touched on the event loop.
+    """
+    try:
+        size = (await asyncio.to_thread(result_path.stat)).st_size
+    except FileNotFoundError:
+        # Nothing was written, e.g. the backend returned the image without saving it
+        return
+    _result_cache[process_id] = size
+    total_bytes = sum(_result_cache.values())
+    evicted_ids = []
+    while total_bytes > RESULT_CACHE_MAX_BYTES and len(_result_cache) > 1:
+        evicted_id, evicted_size = _result_cache.popitem(last=False)
+        total_bytes -= evicted_size
+        evicted_ids.append(evicted_id)
+    if evicted_ids:
+        await asyncio.gather(*(asyncio.to_thread(_remove_result_file, evicted_id) for evicted_id in evicted_ids))
+
+def _remove_result_file(process_id: str) -> None:
+    """Delete one evicted result file, logging instead of raising on failure."""
+    evicted_path = RESULT_DIR / f"result_{process_id}.jpg"
+    try:
+        evicted_path.unlink(missing_ok=True)
+        logger.info(f"Evicted cached result {process_id}")
+    except OSError as e:
+        logger.error(f"Error evicting cached result {evicted_path}: {e}")
+
+def _encode_inline_jpeg(image) -> bytes:
+    """Encode an in-memory result as JPEG; runs off the event loop since encoding is CPU-bound."""
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=INLINE_JPEG_QUALITY)
+    return buffer.getvalue()
 
 @app.get("/health")
 async def health_check():
@@ -67,8 +171,16 @@ async def root():
         }
     }
 
+async def _is_image_upload(upload: UploadFile) -> bool:
+    """Checks an upload's magic bytes (not its client-supplied Content-Type) and rewinds it."""
+    head = await upload.read(IMAGE_SIGNATURE_LENGTH)
+    await upload.seek(0)
+    return is_image_data(head)
+
 @app.post("/transform")
 async def transform_image(
+    request: Request,
+    background_tasks: BackgroundTasks,
     content_image: UploadFile = File(...),
     period_id: Optional[str] = Form(None),
     category_id: Optional[str] = Form(None),
@@ -86,12 +198,15 @@ async def transform_image(
     usm_amount: Optional[float] = Form(None),
     processing_mode: str = Form("local"),
     ai_model_choice: str = Form("local_vgg"),
-    style_blur: Optional[bool] = Form(None)
+    style_blur: Optional[bool] = Form(None),
+    return_inline: bool = Form(False)
 ):
     """
     Transform a content image using either a selected archive style or a local test style.
 
     Handles dispatching to local or cloud processing based on parameters.
+    With return_inline, the JPEG result is streamed back directly instead of
+    being stored for retrieval via /result/{id}.
     """
     if not local_style_image_file and (not period_id or not category_id):
         raise HTTPException(
@@ -104,22 +219,30 @@ async def transform_image(
             detail="Provide EITHER period_id/category_id OR local_style_image_file, not both."
         )
 
+    # Reject non-image uploads by their signature before any decoding or GPU work is scheduled
+    for upload in (content_image, local_style_image_file):
+        if upload is not None and not await _is_image_upload(upload):
+            raise HTTPException(
+                status_code=415,
+                detail=f"Uploaded file '{upload.filename}' is not a supported image (JPEG, PNG, WebP or GIF)."
+            )
+
     try:
         process_id = str(uuid.uuid4())
         content_path = UPLOAD_DIR / f"content_{process_id}.jpg"
         result_path = RESULT_DIR / f"result_{process_id}.jpg"
 
-        logger.info("Saving uploaded content image")
-        with content_path.open("wb") as f:
-            shutil.copyfileobj(content_image.file, f)
+        logger.info("Receiving uploaded content image")
+        content_source = await buffer_upload_file(content_image, content_path)
 
-        logger.info(f"Starting transformation for content: {content_path}")
+        logger.info(f"Starting transformation for content: {content_image.filename}")
+        transform_service: TransformationService = request.app.state.transform_service
         result = await transform_service.transform_image(
-            content_path=content_path,
+            content_source=content_source,
             period_id=period_id,
             category_id=category_id,
             local_style_image_file=local_style_image_file,
-            output_path=result_path,
+            output_path=None if return_inline else result_path,
             style_weight=style_weight,
             content_weight=content_weight,
             num_steps=num_steps,
@@ -136,18 +259,32 @@ async def transform_image(
             style_blur=style_blur
         )
 
+        result_image = result.pop("result_image", None)
+
+        # Delete the spilled upload (if any) after the response has been sent
+        background_tasks.add_task(content_path.unlink, missing_ok=True)
+
+        if return_inline:
+            if result_image is None:
+                raise RuntimeError("Transformation did not produce an in-memory result image.")
+            jpeg_bytes = await asyncio.to_thread(_encode_inline_jpeg, result_image)
+            return Response(
+                content=jpeg_bytes,
+                media_type="image/jpeg",
+                headers={"X-Result-Id": process_id}
+            )
+
         result["result_path"] = str(result_path)
         result["result_id"] = process_id
-
-        content_path.unlink()
+        await _register_result(process_id, result_path)
 
         return JSONResponse(content=result)
 
     except Exception as e:
         logger.exception(f"Transformation failed: {str(e)}")
-        if 'content_path' in locals() and content_path.exists():
+        if 'content_path' in locals():
             try:
-                content_path.unlink()
+                await asyncio.to_thread(content_path.unlink, missing_ok=True)
             except OSError as unlink_err:
                 logger.error(f"Error removing temp content file {content_path}: {unlink_err}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
@@ -164,9 +301,49 @@ async def get_result(process_id: str):
         Transformed image file
     """
     result_path = RESULT_DIR / f"result_{process_id}.jpg"
-    if not result_path.exists():
+    # Results produced by this worker are known without a stat; other workers' results fall back to one off-loop
+    if process_id not in _result_cache and not await asyncio.to_thread(result_path.exists):
         raise HTTPException(status_code=404, detail="Result not found")
-    return FileResponse(result_path)
+    if RESULT_ACCEL_REDIRECT_PREFIX:
+        # Let the fronting nginx stream the file with sendfile instead of this worker
+        return Response(
+            media_type="image/jpeg",
+            headers={
+                "X-Accel-Redirect": f"{RESULT_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{result_path.name}",
+                "Cache-Control": RESULT_CACHE_CONTROL
+            }
+        )
+    return FileResponse(
+        result_path,
+        media_type="image/jpeg",
+        headers={"Cache-Control": RESULT_CACHE_CONTROL}
+    )
+
+def _default_worker_count() -> int:
+    """One worker per GPU (each pinned by _pin_worker_gpu), otherwise one per TORCH_THREADS_PER_WORKER physical cores."""
+    if torch.cuda.is_available():
+        return torch.cuda.device_count()
+    physical_cores = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    return max(1, physical_cores // int(os.getenv("TORCH_THREADS_PER_WORKER", 4)))
 
 if __name__ == "__main__":
-    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
+    # Autoreload is for development only and forces a single worker
+    reload = os.getenv("UVICORN_RELOAD", "false").lower() in ("1", "true", "yes")
+    workers = 1 if reload else int(os.getenv("UVICORN_WORKERS", _default_worker_count()))
+    if torch.cuda.is_available():
+        # Exported to the spawned workers, which pin themselves to one device each in _pin_worker_gpu
+        os.environ.setdefault("CUDA_VISIBLE_DEVICES", ",".join(str(i) for i in range(torch.cuda.device_count())))
+        os.environ["POSTCARD_WORKER_SLOTS"] = str(workers)
+    else:
+        # Split physical cores between workers so intra-op threads don't oversubscribe the CPU
+        physical_cores = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+        os.environ.setdefault("TORCH_NUM_THREADS", str(max(1, physical_cores // workers)))
+    uvicorn.run(
+        "src.api.app:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=reload,
+        workers=workers,
+        loop="auto",
+        http="auto"
+    )
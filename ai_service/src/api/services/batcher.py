@@ -0,0 +1,130 @@
+"""
+Dynamic request batching for the local style transfer pipeline.
+Coalesces concurrent optimizations into one batched VGG forward per step.
+"""
+
+import torch
+import asyncio
+from concurrent.futures import Executor
+from typing import Dict, List, Tuple, Optional
+import logging
+
+from ...models.style_transfer import StyleTransfer
+
+logger = logging.getLogger(__name__)
+
+class StyleTransferBatcher:
+    """Queues style transfer jobs and runs compatible ones as a single batch."""
+
+    def __init__(
+        self,
+        style_transfer: StyleTransfer,
+        executor: Executor,
+        max_batch_size: int = 4,
+        window_ms: float = 20.0
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            style_transfer: StyleTransfer instance that runs the batched optimization
+            executor: Executor the blocking optimization is dispatched to
+            max_batch_size: Maximum number of jobs optimized together
+            window_ms: How long to wait for more jobs after the first one arrives
+        """
+        self.style_transfer = style_transfer
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = window_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def submit(
+        self,
+        content_tensor: torch.Tensor,
+        style_grams: Dict[str, torch.Tensor],
+        num_steps: int,
+        content_weight: float,
+        style_weight: float,
+        tv_weight: float,
+        learning_rate: float
+    ) -> Tuple[torch.Tensor, Dict[str, List[float]]]:
+        """
+        Queue one style transfer and wait for its result.
+
+        Args:
+            content_tensor: Content image tensor (1 x C x H x W)
+            style_grams: Pre-computed average Gram matrices for the style
+            num_steps: Number of optimization steps
+            content_weight: Weight for content loss
+            style_weight: Weight for style loss
+            tv_weight: Weight for total variation loss
+            learning_rate: Learning rate for the Adam optimizer
+
+        Returns:
+            Tuple of (stylized image tensor, loss history dict)
+        """
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+        # Only jobs with the same shape and hyperparameters can share an optimizer
+        key = (tuple(content_tensor.shape), num_steps, content_weight, style_weight, tv_weight, learning_rate)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((key, content_tensor, style_grams, future))
+        return await future
+
+    async def _run(self):
+        """Collects jobs for up to one window (or a full batch) and dispatches them."""
+        while True:
+            pending = [await self._queue.get()]
+            deadline = asyncio.get_running_loop().time() + self.window
+            while len(pending) < self.max_batch_size:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            groups: Dict[Tuple, List[Tuple[torch.Tensor, Dict[str, torch.Tensor], asyncio.Future]]] = {}
+            for key, content_tensor, style_grams, future in pending:
+                groups.setdefault(key, []).append((content_tensor, style_grams, future))
+
+            for key, jobs in groups.items():
+                await self._run_group(key, jobs)
+
+    async def _run_group(self, key: Tuple, jobs: List[Tuple[torch.Tensor, Dict[str, torch.Tensor], asyncio.Future]]):
+        """Runs one batch of compatible jobs on the executor and resolves their futures."""
+        _, num_steps, content_weight, style_weight, tv_weight, learning_rate = key
+        logger.info(f"Running style transfer batch of {len(jobs)} job(s)")
+        try:
+            output_batch, histories = await asyncio.get_running_loop().run_in_executor(
+                self.executor,
+                lambda: self.style_transfer.transfer_style_batch(
+                    torch.cat([content_tensor for content_tensor, _, _ in jobs], dim=0),
+                    [style_grams for _, style_grams, _ in jobs],
+                    num_steps=num_steps,
+                    content_weight=content_weight,
+                    style_weight=style_weight,
+                    tv_weight=tv_weight,
+                    learning_rate=learning_rate
+                )
+            )
+        except Exception as e:
+            logger.error(f"Batched style transfer failed: {e}")
+            for _, _, future in jobs:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for index, (_, _, future) in enumerate(jobs):
+            if not future.done():
+                future.set_result((output_batch[index:index + 1], histories[index]))
+
+    def close(self):
+        """Cancels the background dispatch task."""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
@@ -4,57 +4,83 @@ Handles image processing, style transfer, and quality assessment.
 """
 
 import torch
+import torch.nn.functional as F
 from pathlib import Path
-from typing import Dict, Tuple, Optional, List, Any
+from typing import Dict, Tuple, Optional, List, Any, BinaryIO, Callable
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import threading
 import logging
 from datetime import datetime
+import io
 import random
-import requests
+import time
+import hashlib
+import aiohttp
+import aiofiles
 import uuid
 import os
 import yaml
-import base64
 import shutil
 from fastapi import UploadFile
 
-# --- GPU Configuration for TensorFlow --- #
-os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
-
 import tensorflow as tf
 import tensorflow_hub as hub
 import numpy as np
+import cv2
 from PIL import Image
 
-from ...utils.image_processing import ImageProcessor
+from ...utils.image_processing import ImageProcessor, ImageSource, IMAGE_SIGNATURE_LENGTH, is_image_data
 from ...models.feature_extractor import VGG19FeatureExtractor
-from ...models.style_transfer import StyleTransfer
+from ...models.style_transfer import StyleTransfer, CUDA_GRAPH_WARMUP_STEPS
+from ...models.transformer_net import TransformerNet, OnnxTransformerNet
 from ...utils.quality_metrics import QualityMetrics
-from ...utils.image_enhancements import unsharp_mask, apply_clahe_contrast, adjust_saturation
+from ...utils.image_enhancements import unsharp_mask, apply_clahe_contrast, adjust_saturation_array
+from ...utils.file_io import save_upload_file, default_temp_root
+from .batcher import StyleTransferBatcher
 from gradio_client import Client, file as gradio_file, handle_file
 
 logger = logging.getLogger(__name__)
 
+# --- GPU Configuration for TensorFlow --- #
+# TensorFlow shares the GPU with PyTorch, so allocate on demand instead of reserving all memory up front
+for _tf_gpu in tf.config.list_physical_devices('GPU'):
+    try:
+        tf.config.experimental.set_memory_growth(_tf_gpu, True)
+    except RuntimeError as e:
+        logger.warning(f"Could not enable TensorFlow memory growth for {_tf_gpu.name}: {e}")
+
 # --- Configuration Loading --- #
 CONFIG_PATH = Path(__file__).parent.parent.parent / "config/config.yaml"
-SERVICE_CONFIG = {}
-POST_PROCESSING_CONFIG = {}
-TUNING_CONFIG = {}
-if CONFIG_PATH.exists():
+# The libyaml-backed loader parses several times faster than the pure-Python one
+YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+@functools.lru_cache(maxsize=1)
+def load_service_config() -> Dict[str, Any]:
+    """Parses config.yaml once per process; later calls return the cached result."""
+    if not CONFIG_PATH.exists():
+        logger.warning(f"Configuration file not found at {CONFIG_PATH}. Using defaults.")
+        return {}
     try:
         with open(CONFIG_PATH, 'r') as f:
-            SERVICE_CONFIG = yaml.safe_load(f)
-        POST_PROCESSING_CONFIG = SERVICE_CONFIG.get('post_processing', {})
-        TUNING_CONFIG = SERVICE_CONFIG.get('tuning', {})
+            config = yaml.load(f, Loader=YamlLoader) or {}
         logger.info(f"Loaded configuration from {CONFIG_PATH}")
 
-        cloud_service_config = SERVICE_CONFIG.get('cloud_service', {})
+        cloud_service_config = config.get('cloud_service', {})
         logger.info(f"Cloud service configuration: {cloud_service_config}")
         gradio_space_id = cloud_service_config.get('gradio_space_id', None)
         logger.info(f"GRADIO_SPACE_ID: {gradio_space_id}")
+        return config
     except Exception as e:
         logger.error(f"Failed to load or parse {CONFIG_PATH}: {e}. Using defaults.")
-else:
-    logger.warning(f"Configuration file not found at {CONFIG_PATH}. Using defaults.")
+        return {}
+
+SERVICE_CONFIG = load_service_config()
+POST_PROCESSING_CONFIG = SERVICE_CONFIG.get('post_processing', {})
+TUNING_CONFIG = SERVICE_CONFIG.get('tuning', {})
+PERFORMANCE_CONFIG = SERVICE_CONFIG.get('performance', {})
 
 
 # --- Configuration Values --- #
@@ -67,7 +93,60 @@ DEFAULT_NUM_STEPS = int(TUNING_CONFIG.get('num_steps', 300))
 DEFAULT_CONTENT_LAYERS = TUNING_CONFIG.get('content_layers', ["conv4_2"])
 DEFAULT_STYLE_LAYERS = TUNING_CONFIG.get('style_layers', ["conv1_1", "conv2_1", "conv3_1", "conv4_1", "conv5_1"])
 DEFAULT_LEARNING_RATE = float(TUNING_CONFIG.get('learning_rate', 0.02))
+DEFAULT_PRECISION = str(TUNING_CONFIG.get('precision', 'auto'))
+MAX_IMAGE_SIZE = int(SERVICE_CONFIG.get('processing', {}).get('max_image_size', 512))
+IMAGE_DECODER = str(SERVICE_CONFIG.get('processing', {}).get('decoder', 'turbojpeg'))
 GRADIO_SPACE_ID = SERVICE_CONFIG.get('cloud_service', {}).get('gradio_space_id', None)
+TORCH_COMPILE_ENABLED = bool(PERFORMANCE_CONFIG.get('torch_compile', True))
+TORCH_COMPILE_CACHE_SIZE = int(PERFORMANCE_CONFIG.get('compile_cache_size', 16))
+CUDA_GRAPHS_ENABLED = bool(PERFORMANCE_CONFIG.get('cuda_graphs', True))
+CUDA_GRAPH_CACHE_SIZE = int(PERFORMANCE_CONFIG.get('cuda_graph_cache', 2))
+CPU_TORCHSCRIPT = bool(PERFORMANCE_CONFIG.get('cpu_torchscript', True))
+MAGENTA_XLA_ENABLED = bool(PERFORMANCE_CONFIG.get('magenta_xla', True))
+WARMUP_IMAGE_SIZE = int(PERFORMANCE_CONFIG.get('warmup_image_size', 512))
+# (height, width) pairs compiled and autotuned at startup; each gets its own static-shape graph
+WARMUP_SHAPES = [
+    tuple(int(side) for side in shape)
+    for shape in PERFORMANCE_CONFIG.get('warmup_shapes') or [[WARMUP_IMAGE_SIZE, WARMUP_IMAGE_SIZE]]
+]
+TORCH_COMPILE_MODE = PERFORMANCE_CONFIG.get('compile_mode')
+TRANSFORM_WORKERS = int(PERFORMANCE_CONFIG.get('transform_workers', 1))
+CPU_INT8_METRICS = bool(PERFORMANCE_CONFIG.get('cpu_int8_metrics', True))
+INT8_CALIBRATION_DIR = PERFORMANCE_CONFIG.get('int8_calibration_dir')
+INT8_CALIBRATION_IMAGES = 4
+STYLE_DOWNLOAD_CHUNK_SIZE = 1 << 20
+# JPEG/PNG thumbnails are already compressed; asking for identity avoids a gzip round trip
+STYLE_DOWNLOAD_HEADERS = {'Accept-Encoding': 'identity'}
+HTTP_POOL_SIZE = int(PERFORMANCE_CONFIG.get('http_pool_size', 16))
+HTTP_RETRY_STATUSES = (502, 503, 504)
+HTTP_RETRY_ATTEMPTS = 2
+HTTP_RETRY_BACKOFF = 0.2
+BATCH_MAX_SIZE = int(PERFORMANCE_CONFIG.get('batch_max_size', 4))
+BATCH_WINDOW_MS = float(PERFORMANCE_CONFIG.get('batch_window_ms', 20))
+STYLE_CACHE_ENABLED = bool(SERVICE_CONFIG.get('cache', {}).get('enabled', True))
+STYLE_CACHE_SIZE = int(SERVICE_CONFIG.get('cache', {}).get('style_entries', 16))
+STYLE_TENSOR_CACHE_SIZE = int(SERVICE_CONFIG.get('cache', {}).get('style_tensors', 64))
+STYLE_FILE_CACHE_SIZE = int(SERVICE_CONFIG.get('cache', {}).get('style_files', 256))
+STYLE_BYTES_CACHE_SIZE = int(SERVICE_CONFIG.get('cache', {}).get('style_bytes', 32))
+# Cached thumbnails older than this are downloaded again so archive edits are picked up
+STYLE_FILE_TTL = float(SERVICE_CONFIG.get('cache', {}).get('expiry_minutes', 60)) * 60
+# Optional directory (ideally local NVMe, not tmpfs) where per-image style Gram matrices survive restarts
+_GRAM_CACHE_DIR = SERVICE_CONFIG.get('cache', {}).get('gram_dir')
+GRAM_CACHE_DIR = Path(_GRAM_CACHE_DIR) if _GRAM_CACHE_DIR else None
+
+# Post-processing defaults, resolved once instead of on every request
+_USM_CONFIG = POST_PROCESSING_CONFIG.get('unsharp_mask', {})
+USM_ENABLED = bool(_USM_CONFIG.get('enabled', False))
+USM_AMOUNT = float(_USM_CONFIG.get('amount', 1.0))
+USM_SIGMA = float(_USM_CONFIG.get('sigma', 1.0))
+USM_THRESHOLD = int(_USM_CONFIG.get('threshold', 0))
+_CLAHE_CONFIG = POST_PROCESSING_CONFIG.get('clahe_contrast', {})
+CLAHE_ENABLED = bool(_CLAHE_CONFIG.get('enabled', False))
+CLAHE_CLIP_LIMIT = float(_CLAHE_CONFIG.get('clip_limit', 2.0))
+CLAHE_TILE_SIZE = int(_CLAHE_CONFIG.get('tile_grid_size', 8))
+_SATURATION_CONFIG = POST_PROCESSING_CONFIG.get('saturation_boost', {})
+SATURATION_ENABLED = bool(_SATURATION_CONFIG.get('enabled', False))
+SATURATION_FACTOR = float(_SATURATION_CONFIG.get('factor', 1.2))
 
 logger.info(f"Configuration: GRADIO_SPACE_ID = '{GRADIO_SPACE_ID}'")
 
@@ -80,16 +159,35 @@ if GRADIO_SPACE_ID is None:
     logger.info(f"Forced GRADIO_SPACE_ID to default value: '{GRADIO_SPACE_ID}'")
 
 
-TEMP_STYLE_DIR = Path(SERVICE_CONFIG.get('paths', {}).get('temp_storage', "temp")) / "style_downloads"
-TEMP_STYLE_DIR.mkdir(parents=True, exist_ok=True)
+# Style downloads live on tmpfs (/dev/shm) when available, next to the API's uploads and results
+TEMP_STYLE_DIR = Path(
+    SERVICE_CONFIG.get('paths', {}).get('temp_storage')
+    or os.getenv("POSTCARD_TEMP_DIR", str(default_temp_root()))
+) / "style_downloads"
+
+# Pre-trained feed-forward style networks, one per archive style: <period_id>__<category_id>.onnx|.pt
+FAST_FFN_WEIGHTS_DIR = Path(SERVICE_CONFIG.get('paths', {}).get('model_weights', "./models/weights")) / "fast_ffn"
 
 
 TFHUB_MAGENTA_MODEL_URL = SERVICE_CONFIG.get('cloud_service', {}).get('tfhub_magenta_model_url', "https://tfhub.dev/google/magenta/arbitrary-image-stylization-v1-256/2")
 
 MAGENTA_HUB_MODEL = None
+# Stylization wrapped in a tf.function; XLA fuses the whole forward pass when MAGENTA_XLA_ENABLED
+MAGENTA_STYLIZE_FN = None
+# Batch of one, any spatial size: a single traced graph serves every request shape
+MAGENTA_INPUT_SIGNATURE = (
+    tf.TensorSpec([1, None, None, 3], tf.float32),
+    tf.TensorSpec([1, None, None, 3], tf.float32),
+)
+
+def _make_magenta_stylize_fn(hub_model, jit_compile: bool):
+    """Wraps the hub model in a tf.function that also scales its output to uint8, so the conversion fuses into the graph."""
+    def stylize(content: tf.Tensor, style: tf.Tensor) -> tf.Tensor:
+        return tf.image.convert_image_dtype(hub_model(content, style)[0], tf.uint8, saturate=True)
+    return tf.function(stylize, input_signature=MAGENTA_INPUT_SIGNATURE, jit_compile=jit_compile)
 
 def _load_magenta_model():
-    global MAGENTA_HUB_MODEL
+    global MAGENTA_HUB_MODEL, MAGENTA_STYLIZE_FN
     if MAGENTA_HUB_MODEL is None:
         if not TFHUB_MAGENTA_MODEL_URL:
             logger.error("TensorFlow Hub Magenta model URL is not configured.")
@@ -97,37 +195,82 @@ def _load_magenta_model():
         try:
             logger.info(f"Loading TensorFlow Hub Magenta model from: {TFHUB_MAGENTA_MODEL_URL}")
             os.environ['TFHUB_MODEL_LOAD_FORMAT'] = 'COMPRESSED'
-            MAGENTA_HUB_MODEL = hub.load(TFHUB_MAGENTA_MODEL_URL)
-            logger.info("TensorFlow Hub Magenta model loaded successfully.")
+            hub_model = hub.load(TFHUB_MAGENTA_MODEL_URL)
+            MAGENTA_STYLIZE_FN = _make_magenta_stylize_fn(hub_model, MAGENTA_XLA_ENABLED)
+            MAGENTA_HUB_MODEL = hub_model
+            logger.info(f"TensorFlow Hub Magenta model loaded successfully (XLA: {MAGENTA_XLA_ENABLED}).")
         except Exception as e:
             logger.error(f"Failed to load TensorFlow Hub Magenta model: {e}")
             MAGENTA_HUB_MODEL = None
     return MAGENTA_HUB_MODEL
 
+def _warmup_magenta_model():
+    """Runs one dummy stylization so tracing and XLA compilation happen before the first request."""
+    global MAGENTA_STYLIZE_FN
+    if MAGENTA_STYLIZE_FN is None:
+        return
+    start = datetime.now()
+    dummy = tf.zeros([1, 256, 256, 3], tf.float32)
+    try:
+        MAGENTA_STYLIZE_FN(dummy, dummy)
+    except Exception as e:
+        logger.warning(f"Magenta warmup failed, falling back to uncompiled execution: {e}")
+        MAGENTA_STYLIZE_FN = _make_magenta_stylize_fn(MAGENTA_HUB_MODEL, jit_compile=False)
+        return
+    logger.info(f"Magenta warmup finished in {(datetime.now() - start).total_seconds():.2f}s")
+
+MAGENTA_MAX_DIM = 512
+MAGENTA_INPUT_CACHE_SIZE = int(SERVICE_CONFIG.get('cache', {}).get('magenta_inputs', 8))
+
+def _resize_for_magenta(img: tf.Tensor) -> tf.Tensor:
+    img = tf.image.convert_image_dtype(img, tf.float32)
+    shape = tf.cast(tf.shape(img)[:-1], tf.float32)
+    scale = MAGENTA_MAX_DIM / tf.maximum(shape[0], shape[1])
+    img = tf.image.resize(img, tf.cast(shape * scale, tf.int32))
+    return img[tf.newaxis, :]
+
+@tf.function(input_signature=[tf.TensorSpec(shape=[], dtype=tf.string)])
+def _decode_for_magenta(raw: tf.Tensor) -> tf.Tensor:
+    # decode_image also folds grayscale and RGBA inputs to three channels
+    img = tf.io.decode_image(raw, channels=3, expand_animations=False)
+    return _resize_for_magenta(img)
+
 def _preprocess_for_magenta(pil_image: Image.Image) -> tf.Tensor:
-    max_dim = 512
     img = tf.convert_to_tensor(np.array(pil_image))
     if img.shape[-1] == 1:
         img = tf.image.grayscale_to_rgb(img)
     elif img.shape[-1] == 4:
         img = img[..., :3]
+    return _resize_for_magenta(img)
 
-    img = tf.image.convert_image_dtype(img, tf.float32)
-    shape = tf.cast(tf.shape(img)[:-1], tf.float32)
-    long_dim = tf.maximum(shape[0], shape[1])
-    scale = max_dim / long_dim
-    new_shape = tf.cast(shape * scale, tf.int32)
-    img = tf.image.resize(img, new_shape)
-    img = img[tf.newaxis, :]
-    return img
+@functools.lru_cache(maxsize=MAGENTA_INPUT_CACHE_SIZE if STYLE_CACHE_ENABLED else 0)
+def _preprocess_magenta_bytes(raw: bytes) -> tf.Tensor:
+    # Keyed by the encoded bytes, so trying several styles on one content image decodes it once
+    try:
+        return _decode_for_magenta(tf.constant(raw))
+    except tf.errors.InvalidArgumentError:
+        # TensorFlow only decodes JPEG/PNG/GIF/BMP; other formats (e.g. WebP) go through Pillow
+        logger.info("TensorFlow could not decode the image; falling back to Pillow for Magenta preprocessing")
+        return _preprocess_for_magenta(Image.open(io.BytesIO(raw)).convert('RGB'))
+
+def _load_and_preprocess_for_magenta(source: ImageSource) -> tf.Tensor:
+    """Decodes an image file or buffer with TensorFlow directly, skipping the PIL/NumPy copies."""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+        raw = source.read()
+    else:
+        raw = Path(source).read_bytes()
+    return _preprocess_magenta_bytes(raw)
 
 def _tensor_to_pil_image_magenta(tensor) -> Image.Image:
-    tensor = tensor * 255
-    tensor = np.array(tensor, dtype=np.uint8)
-    if np.ndim(tensor) > 3:
-        assert tensor.shape[0] == 1
-        tensor = tensor[0]
-    return Image.fromarray(tensor)
+    # MAGENTA_STYLIZE_FN already returns uint8, so this is a single host copy without float intermediates
+    array = tensor.numpy() if hasattr(tensor, 'numpy') else np.asarray(tensor)
+    if array.ndim > 3:
+        assert array.shape[0] == 1
+        array = array[0]
+    if array.dtype != np.uint8:
+        array = np.clip(array * 255.0, 0, 255).astype(np.uint8)
+    return Image.fromarray(np.ascontiguousarray(array))
 
 class TransformationService:
     """Coordinates the AI pipeline for image transformation."""
@@ -136,112 +279,568 @@ class TransformationService:
         """Initialize the transformation service components."""
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         logger.info(f"Using device: {self.device}")
+        TEMP_STYLE_DIR.mkdir(parents=True, exist_ok=True)
+        if GRAM_CACHE_DIR is not None:
+            GRAM_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
-
-        self.image_processor = ImageProcessor()
+        self.image_processor = ImageProcessor(max_image_size=MAX_IMAGE_SIZE, decoder=IMAGE_DECODER)
         self.feature_extractor = VGG19FeatureExtractor(layers=list(set(DEFAULT_CONTENT_LAYERS + DEFAULT_STYLE_LAYERS))).to(self.device)
+        if self.device.type == "cuda":
+            self.feature_extractor.half().to(memory_format=torch.channels_last)
+        elif CPU_INT8_METRICS:
+            self._quantize_metrics_extractor()
         self.style_transfer = StyleTransfer(
             content_weight=DEFAULT_CONTENT_WEIGHT,
             style_weight=DEFAULT_STYLE_WEIGHT,
             tv_weight=DEFAULT_TV_WEIGHT,
             content_layers=DEFAULT_CONTENT_LAYERS,
             style_layers=DEFAULT_STYLE_LAYERS,
-            device=self.device
+            device=self.device,
+            precision=DEFAULT_PRECISION
         )
         self.quality_metrics = QualityMetrics(device=self.device)
 
+        self.fast_ffn_models = self._load_fast_ffn_models()
+
+        # Downloaded style thumbnails in TEMP_STYLE_DIR, keyed by URL and named by its SHA-256
+        self._style_file_cache: "OrderedDict[str, Path]" = OrderedDict()
+        # Encoded bytes of recently downloaded style thumbnails, keyed by file path
+        self._style_bytes_cache: "OrderedDict[str, bytes]" = OrderedDict()
+
+        # Shared HTTP connection pool for the gateway and style downloads (created lazily in the event loop)
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        # Style downloads currently running, keyed by thumbnail URL
+        self._style_downloads_in_flight: Dict[str, "asyncio.Future[Optional[Path]]"] = {}
+
+        # Gradio client for GRADIO_SPACE_ID; building one fetches the Space config, so it is reused across requests
+        self._gradio_client: Optional[Client] = None
+        self._gradio_client_lock = asyncio.Lock()
+
+        # Archive style tensors and their Gram matrices, keyed by (period_id, category_id)
+        self._style_cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        # Individual style images (tensor + Gram matrices), keyed by (file path, content size)
+        self._style_tensor_cache: "OrderedDict[Tuple[str, Tuple[int, int]], Dict[str, Any]]" = OrderedDict()
+        self._style_cache_lock = threading.Lock()
+
+        # Blocking PyTorch work runs here so the event loop keeps serving requests
+        self._transform_executor = ThreadPoolExecutor(max_workers=TRANSFORM_WORKERS, thread_name_prefix="transform")
+        self.style_batcher = StyleTransferBatcher(
+            self.style_transfer,
+            self._transform_executor,
+            max_batch_size=BATCH_MAX_SIZE,
+            window_ms=BATCH_WINDOW_MS
+        )
+
+        if TORCH_COMPILE_ENABLED and hasattr(torch, "compile") and self._compile_style_transfer():
+            pass
+        elif self.device.type == "cuda":
+            self.style_transfer.use_cuda_graphs = CUDA_GRAPHS_ENABLED
+            self.style_transfer.graph_cache_size = CUDA_GRAPH_CACHE_SIZE
+            self._warmup_style_transfer()
+        elif CPU_TORCHSCRIPT:
+            self.style_transfer.feature_extractor.script()
+            self._warmup_style_transfer()
+
         logger.info("Transformation service initialized with config defaults")
         logger.info(f"Default Weights - Content: {DEFAULT_CONTENT_WEIGHT}, Style: {DEFAULT_STYLE_WEIGHT}, TV: {DEFAULT_TV_WEIGHT}")
         logger.info(f"Default Steps: {DEFAULT_NUM_STEPS}")
 
-        _load_magenta_model()
+        if _load_magenta_model() is not None:
+            _warmup_magenta_model()
 
-    def _fetch_style_image_urls(self, period_id: str, category_id: str, count: int) -> List[str]:
+    def _load_fast_ffn_models(self) -> Dict[Tuple[str, str], Any]:
+        """
+        Loads the pre-trained feed-forward style networks found in FAST_FFN_WEIGHTS_DIR.
+        ONNX exports run through ONNX Runtime and take precedence over PyTorch checkpoints.
+        """
+        models: Dict[Tuple[str, str], Any] = {}
+        if not FAST_FFN_WEIGHTS_DIR.is_dir():
+            logger.info(f"No fast_ffn weights directory at {FAST_FFN_WEIGHTS_DIR}; fast_ffn model disabled.")
+            return models
+        weights_paths = sorted(FAST_FFN_WEIGHTS_DIR.glob("*.onnx")) + sorted(FAST_FFN_WEIGHTS_DIR.glob("*.pt*"))
+        for weights_path in weights_paths:
+            period_id, separator, category_id = weights_path.stem.partition("__")
+            if not separator:
+                logger.warning(f"Skipping fast_ffn weights with unexpected name: {weights_path.name}")
+                continue
+            if (period_id, category_id) in models:
+                continue
+            try:
+                if weights_path.suffix == ".onnx":
+                    models[(period_id, category_id)] = OnnxTransformerNet(weights_path, self.device)
+                else:
+                    models[(period_id, category_id)] = TransformerNet.from_checkpoint(weights_path, self.device)
+            except Exception as e:
+                logger.error(f"Failed to load fast_ffn weights {weights_path}: {e}")
+        logger.info(f"Loaded {len(models)} fast_ffn style models.")
+        return models
+
+    def _quantize_metrics_extractor(self):
+        """
+        Quantizes the metrics-only VGG extractor to int8 on CPU.
+        Calibrates on images from INT8_CALIBRATION_DIR when configured,
+        otherwise on uniform RGB noise in [0, 1] (the extractor folds the
+        ImageNet normalization into conv1_1).
+        """
+        calibration_images: List[torch.Tensor] = []
+        if INT8_CALIBRATION_DIR and Path(INT8_CALIBRATION_DIR).is_dir():
+            for image_path in sorted(Path(INT8_CALIBRATION_DIR).glob("*.jp*g"))[:INT8_CALIBRATION_IMAGES]:
+                _, image_tensor = self.image_processor.load_image(image_path)
+                calibration_images.append(image_tensor.cpu())
+        if not calibration_images:
+            calibration_images = [
+                self.image_processor.preprocess(
+                    Image.fromarray(np.random.randint(0, 256, (WARMUP_IMAGE_SIZE, WARMUP_IMAGE_SIZE, 3), dtype=np.uint8))
+                ).unsqueeze(0)
+                for _ in range(INT8_CALIBRATION_IMAGES)
+            ]
+        try:
+            self.feature_extractor.quantize_int8(calibration_images)
+        except Exception as e:
+            logger.error(f"Int8 quantization of the metrics extractor failed, keeping FP32: {e}")
+            self.feature_extractor = VGG19FeatureExtractor(layers=list(set(DEFAULT_CONTENT_LAYERS + DEFAULT_STYLE_LAYERS))).to(self.device)
+
+    def _compile_style_transfer(self) -> bool:
+        """
+        Compiles the style transfer feature extractor with torch.compile and warms it up.
+
+        Returns:
+            True if compilation succeeded; on failure (e.g. no Triton or C++ toolchain)
+            the eager extractor is restored and False is returned
+        """
+        eager_extractor = self.style_transfer.feature_extractor
+        # One compiled graph per (batch size, resolution) pair; avoid falling back to eager on new shapes
+        torch._dynamo.config.cache_size_limit = TORCH_COMPILE_CACHE_SIZE
+        compile_mode = TORCH_COMPILE_MODE or ("reduce-overhead" if self.device.type == "cuda" else "default")
+        logger.info(f"Compiling style transfer feature extractor with torch.compile (mode: {compile_mode})")
+        try:
+            self.style_transfer.feature_extractor = torch.compile(
+                eager_extractor, mode=compile_mode, dynamic=False, fullgraph=False
+            )
+            # The per-step forward + loss terms form one graph (the compiled extractor is inlined into it),
+            # so reduce-overhead replays the whole step; the standalone extractor serves the no-grad target passes
+            self.style_transfer.compile_step(mode=compile_mode)
+            # Compilation is lazy, so backend errors surface here rather than at torch.compile
+            self._warmup_style_transfer()
+            return True
+        except Exception as e:
+            logger.warning(f"torch.compile failed, falling back to uncompiled execution: {e}")
+            self.style_transfer.feature_extractor = eager_extractor
+            self.style_transfer.compile_step(enabled=False)
+            torch._dynamo.reset()
+            return False
+
+    def _warmup_style_transfer(self):
+        """Runs a short optimization per WARMUP_SHAPES entry so compilation and cuDNN autotuning happen before the first request."""
+        start = datetime.now()
+        # With CUDA graphs, run just past the eager warmup steps so the first capture (capturable Adam state,
+        # capture-stream cuBLAS workspaces) is also paid here rather than by the first request
+        num_steps = CUDA_GRAPH_WARMUP_STEPS + 1 if self.style_transfer.use_cuda_graphs else 1
+        for height, width in WARMUP_SHAPES:
+            # Real optimization steps, so the no-grad target pass, the losses and the backward all get compiled
+            dummy = torch.rand(1, 3, height, width, device=self.device)
+            style_grams = self.style_transfer.compute_image_style_grams([dummy])
+            self.style_transfer.transfer_style_batch(dummy, style_grams, num_steps=num_steps)
+        if self.device.type == "cuda":
+            torch.cuda.empty_cache()
+        logger.info(f"Style transfer warmup finished in {(datetime.now() - start).total_seconds():.2f}s")
+
+    def _get_http_session(self) -> aiohttp.ClientSession:
+        """Returns the shared HTTP session, creating it on first use inside the running event loop."""
+        if self._http_session is None or self._http_session.closed:
+            # Keep-alive pool shared by the gateway call and all thumbnail fetches
+            connector = aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, limit_per_host=HTTP_POOL_SIZE, ttl_dns_cache=300)
+            self._http_session = aiohttp.ClientSession(connector=connector)
+        return self._http_session
+
+    async def _get_gradio_client(self) -> Client:
+        """Returns the shared Gradio client, connecting to the Space off the event loop on first use."""
+        if self._gradio_client is None:
+            async with self._gradio_client_lock:
+                if self._gradio_client is None:
+                    logger.info(f"Connecting Gradio client to Space: {GRADIO_SPACE_ID}")
+                    self._gradio_client = await asyncio.to_thread(Client, GRADIO_SPACE_ID)
+        return self._gradio_client
+
+    async def _fetch_style_image_urls(self, period_id: str, category_id: str, count: int) -> List[str]:
         """Fetches multiple style image URLs from the API gateway."""
         target_url = f"{API_GATEWAY_URL}/api/styles/{period_id}/{category_id}/references?count={count}"
         logger.info(f"Fetching style references from: {target_url}")
 
         try:
-            response = requests.get(target_url, timeout=15)
-            response.raise_for_status()
-            data = response.json()
+            for attempt in range(HTTP_RETRY_ATTEMPTS + 1):
+                async with self._get_http_session().get(target_url, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                    if response.status in HTTP_RETRY_STATUSES and attempt < HTTP_RETRY_ATTEMPTS:
+                        logger.warning(f"Gateway returned {response.status}, retrying ({attempt+1}/{HTTP_RETRY_ATTEMPTS})")
+                        await asyncio.sleep(HTTP_RETRY_BACKOFF * (2 ** attempt))
+                        continue
+                    response.raise_for_status()
+                    data = await response.json(content_type=None)
+                    break
             urls = data.get('urls', [])
             if not urls:
                  logger.warning(f"No style URLs returned from gateway for {period_id}/{category_id}")
                  return []
             logger.info(f"Received {len(urls)} style URLs.")
             return urls
-        except requests.exceptions.Timeout:
+        except asyncio.TimeoutError:
             logger.error(f"Timeout fetching style references from gateway: {target_url}")
             raise RuntimeError("Timeout connecting to gateway for style references.")
-        except requests.exceptions.ConnectionError:
+        except aiohttp.ClientConnectionError:
             logger.error(f"Connection error fetching style references from gateway: {target_url}")
             raise RuntimeError("Could not connect to gateway for style references.")
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching style references from gateway ({e.response.status_code if e.response else 'Network Error'}): {e}")
+        except aiohttp.ClientResponseError as e:
+            logger.error(f"Error fetching style references from gateway ({e.status}): {e}")
             raise RuntimeError(f"Could not fetch style references: {e}")
         except Exception as e:
             logger.error(f"Error parsing style references response: {e}")
             raise RuntimeError("Failed to parse style references response.")
 
-
-    async def _download_style_images(self, style_urls: List[str]) -> List[Path]:
-        """Downloads multiple style images from URLs to a temporary directory."""
-        downloaded_paths = []
+    async def _download_style_image(self, index: int, total: int, url: str) -> Optional[Path]:
+        """Streams one style thumbnail to TEMP_STYLE_DIR; returns None (after logging) if it cannot be fetched."""
+        thumb_url = self._thumb_url(url)
+        cached_path = await self._lookup_cached_style_file(thumb_url)
+        if cached_path is not None:
+            logger.info(f"Using cached style image {index+1}/{total} for {thumb_url}")
+            return cached_path
+
+        # Concurrent requests for the same archive style share one download instead of each fetching it
+        download = self._style_downloads_in_flight.get(thumb_url)
+        if download is None:
+            download = asyncio.ensure_future(self._fetch_style_file(index, total, url, thumb_url))
+            self._style_downloads_in_flight[thumb_url] = download
+            download.add_done_callback(lambda _: self._style_downloads_in_flight.pop(thumb_url, None))
+        else:
+            logger.info(f"Joining in-flight download of style image {index+1}/{total} from {thumb_url}")
+        # Shielded so one cancelled request does not abort the download for the others
+        return await asyncio.shield(download)
+
+    async def _fetch_style_file(self, index: int, total: int, url: str, thumb_url: str) -> Optional[Path]:
+        """Performs the actual download for _download_style_image and records it in the style file cache."""
+        logger.info(f"Downloading style image {index+1}/{total} from {thumb_url}")
+        style_path = self._style_file_path(thumb_url)
+        # Write under a unique name and rename, so concurrent requests never read a partial file
+        temp_style_path = TEMP_STYLE_DIR / f"style_{uuid.uuid4()}.jpg"
         try:
-            for i, url in enumerate(style_urls):
-                thumb_url = url if "?thumb=1" in url else f"{url}?thumb=1"
-                logger.info(f"Downloading style image {i+1}/{len(style_urls)} from {thumb_url}")
-                try:
-                    response = requests.get(thumb_url, stream=True, timeout=30)
-                    response.raise_for_status()
+            async with self._get_http_session().get(
+                thumb_url, headers=STYLE_DOWNLOAD_HEADERS, timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                response.raise_for_status()
 
+                # Sniff the signature instead of trusting Content-Type; CDNs often send application/octet-stream
+                try:
+                    head = await response.content.readexactly(IMAGE_SIGNATURE_LENGTH)
+                except asyncio.IncompleteReadError:
+                    head = b''
+                if not is_image_data(head):
                     content_type = response.headers.get('content-type')
-                    if not content_type or not content_type.startswith('image/'):
-                        logger.warning(f"Skipping non-image URL: {thumb_url} (Content-Type: {content_type}) Original: {url}")
-                        continue
+                    logger.warning(f"Skipping non-image URL: {thumb_url} (Content-Type: {content_type}) Original: {url}")
+                    return None
+
+                # Thumbnails are small, so the body is kept in memory: it is verified and later decoded
+                # from there, and the file is written once only to serve as the cross-request cache
+                buffer = bytearray(head)
+                async for chunk in response.content.iter_chunked(STYLE_DOWNLOAD_CHUNK_SIZE):
+                    buffer += chunk
+            data = bytes(buffer)
+            # Corrupt or truncated files are rejected here rather than failing after the content is on the GPU
+            if not await asyncio.to_thread(self._install_style_file, data, temp_style_path, style_path):
+                logger.warning(f"Skipping corrupt style image from {thumb_url}. Original URL: {url}")
+                return None
+            self._store_style_bytes(style_path, data)
+            await self._store_cached_style_file(thumb_url, style_path)
+            logger.info(f"Style image cached at {style_path}")
+            return style_path
+        except asyncio.TimeoutError:
+            logger.warning(f"Timeout downloading style image from {thumb_url}. Original URL: {url}. Skipping.")
+        except aiohttp.ClientConnectionError:
+            logger.warning(f"Connection error downloading style image from {thumb_url}. Original URL: {url}. Skipping.")
+        except aiohttp.ClientResponseError as e:
+            logger.warning(f"Failed to download style image from {thumb_url} (Status: {e.status}): {e}. Original URL: {url}. Skipping.")
+        except asyncio.CancelledError:
+            self._cleanup_temp_files([temp_style_path])
+            raise
+        except Exception as e:
+            logger.warning(f"Generic error processing download from {thumb_url}: {e}. Original URL: {url}. Skipping.")
+        await self._cleanup_temp_files_async([temp_style_path])
+        return None
 
-                    temp_style_filename = f"style_{uuid.uuid4()}.jpg"
-                    temp_style_path = TEMP_STYLE_DIR / temp_style_filename
-                    with open(temp_style_path, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            f.write(chunk)
-                    downloaded_paths.append(temp_style_path)
-                    logger.info(f"Style image saved temporarily to {temp_style_path}")
-                except requests.exceptions.Timeout:
-                    logger.warning(f"Timeout downloading style image from {thumb_url}. Original URL: {url}. Skipping.")
-                except requests.exceptions.ConnectionError:
-                     logger.warning(f"Connection error downloading style image from {thumb_url}. Original URL: {url}. Skipping.")
-                except requests.exceptions.RequestException as e:
-                    status_code = e.response.status_code if e.response else "N/A"
-                    logger.warning(f"Failed to download style image from {thumb_url} (Status: {status_code}): {e}. Original URL: {url}. Skipping.")
-                except ValueError as e:
-                     logger.warning(f"ValueError during download from {thumb_url}: {e}. Original URL: {url}. Skipping.")
-                except Exception as e:
-                    logger.warning(f"Generic error processing download from {thumb_url}: {e}. Original URL: {url}. Skipping.")
+    def _install_style_file(self, data: bytes, temp_style_path: Path, style_path: Path) -> bool:
+        """
+        Verifies a downloaded style image and moves it into the style file cache, all in one worker-thread hop.
+        Returns False, leaving nothing on disk, if the image is corrupt.
+        """
+        if not self._verify_image_bytes(data):
+            return False
+        temp_style_path.write_bytes(data)
+        os.replace(temp_style_path, style_path)
+        # A refreshed download may differ from the previous one at the same path
+        self._drop_cached_style_tensors(style_path)
+        return True
+
+    @staticmethod
+    def _verify_image_bytes(data: bytes) -> bool:
+        """Checks an encoded image's structure with Pillow without decoding the pixel data."""
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image.verify()
+            return True
+        except Exception:
+            return False
+
+    def _read_style_bytes(self, style_path: Path) -> bytes:
+        """Returns the encoded bytes of a style image, from memory when it was downloaded recently."""
+        with self._style_cache_lock:
+            data = self._style_bytes_cache.get(str(style_path))
+            if data is not None:
+                self._style_bytes_cache.move_to_end(str(style_path))
+                return data
+        return Path(style_path).read_bytes()
+
+    def _store_style_bytes(self, style_path: Path, data: bytes):
+        """Keeps a style image's encoded bytes, evicting the least recently used beyond STYLE_BYTES_CACHE_SIZE."""
+        if not STYLE_CACHE_ENABLED:
+            return
+        with self._style_cache_lock:
+            self._style_bytes_cache[str(style_path)] = data
+            self._style_bytes_cache.move_to_end(str(style_path))
+            while len(self._style_bytes_cache) > STYLE_BYTES_CACHE_SIZE:
+                self._style_bytes_cache.popitem(last=False)
 
-            if not downloaded_paths:
-                 raise RuntimeError("Failed to download any valid style images.")
+    async def _download_style_images(self, style_urls: List[str]) -> List[Path]:
+        """Downloads multiple style images concurrently to a temporary directory."""
+        results = await asyncio.gather(
+            *(self._download_style_image(i, len(style_urls), url) for i, url in enumerate(style_urls)),
+            return_exceptions=True
+        )
+        downloaded_paths = [result for result in results if isinstance(result, Path)]
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.warning(f"Unexpected error downloading style image: {result}. Skipping.")
 
-            return downloaded_paths
-        except Exception as e:
-            self._cleanup_temp_files(downloaded_paths)
-            raise e
+        if not downloaded_paths:
+            raise RuntimeError("Failed to download any valid style images.")
+
+        return downloaded_paths
+
+    @staticmethod
+    def _thumb_url(url: str) -> str:
+        """Returns the thumbnail variant of a style reference URL, which is what gets downloaded."""
+        return url if "?thumb=1" in url else f"{url}?thumb=1"
+
+    @staticmethod
+    def _style_file_path(thumb_url: str) -> Path:
+        """Returns the on-disk cache location of a style thumbnail, named by URL digest."""
+        return TEMP_STYLE_DIR / f"{hashlib.sha256(thumb_url.encode()).hexdigest()}.jpg"
+
+    async def _lookup_cached_style_file(self, thumb_url: str) -> Optional[Path]:
+        """
+        Returns a cached style thumbnail that is younger than STYLE_FILE_TTL, or None.
+
+        Files left in TEMP_STYLE_DIR by an earlier process are adopted into the cache,
+        so a restart does not force every style to be downloaded again.
+        """
+        path = self._style_file_cache.get(thumb_url) or self._style_file_path(thumb_url)
+        try:
+            age = time.time() - (await asyncio.to_thread(path.stat)).st_mtime
+        except OSError:
+            self._style_file_cache.pop(thumb_url, None)
+            return None
+        if age > STYLE_FILE_TTL:
+            logger.info(f"Cached style image for {thumb_url} expired ({age:.0f}s old)")
+            self._style_file_cache.pop(thumb_url, None)
+            return None
+        await self._store_cached_style_file(thumb_url, path)
+        return path
+
+    async def _store_cached_style_file(self, url: str, path: Path):
+        """
+        Records a downloaded style file, deleting the least recently used ones beyond STYLE_FILE_CACHE_SIZE.
+        The cache is only updated on the event loop; evicted files are deleted on worker threads.
+        """
+        self._style_file_cache[url] = path
+        self._style_file_cache.move_to_end(url)
+        evicted = []
+        while len(self._style_file_cache) > STYLE_FILE_CACHE_SIZE:
+            evicted.append(self._style_file_cache.popitem(last=False))
+        if evicted:
+            await asyncio.gather(*(
+                asyncio.to_thread(self._remove_cached_style_file, evicted_url, evicted_path)
+                for evicted_url, evicted_path in evicted
+            ))
+
+    def _remove_cached_style_file(self, url: str, path: Path):
+        """Deletes an evicted style file together with its persisted Gram matrices and in-memory bytes."""
+        self._drop_persisted_grams(path)
+        with self._style_cache_lock:
+            self._style_bytes_cache.pop(str(path), None)
+        try:
+            path.unlink(missing_ok=True)
+            logger.info(f"Evicted cached style image for {url}")
+        except OSError as e:
+            logger.error(f"Error removing cached style image {path}: {e}")
 
     def _cleanup_temp_files(self, file_paths: List[Path]):
-        """Removes a list of temporary files."""
+        """Removes a list of temporary files. Cached style downloads are long-lived and kept."""
+        cached_paths = set(self._style_file_cache.values())
         for file_path in file_paths:
-             if file_path and file_path.exists():
-                try:
-                    os.remove(file_path)
-                    logger.info(f"Cleaned up temporary style image: {file_path}")
-                except OSError as e:
-                    logger.error(f"Error removing temporary file {file_path}: {e}")
+            if file_path and file_path not in cached_paths:
+                self._remove_temp_file(file_path)
+
+    async def _cleanup_temp_files_async(self, file_paths: List[Path]):
+        """Like _cleanup_temp_files, but removes the files concurrently on worker threads so teardown never stalls the event loop."""
+        cached_paths = set(self._style_file_cache.values())
+        removable = [file_path for file_path in file_paths if file_path and file_path not in cached_paths]
+        if removable:
+            await asyncio.gather(*(asyncio.to_thread(self._remove_temp_file, file_path) for file_path in removable))
+
+    @staticmethod
+    def _remove_temp_file(file_path: Path):
+        """Deletes one temporary file if it still exists, logging instead of raising on failure."""
+        if file_path.exists():
+            try:
+                os.remove(file_path)
+                logger.info(f"Cleaned up temporary file: {file_path}")
+            except OSError as e:
+                logger.error(f"Error removing temporary file {file_path}: {e}")
+
+    def _get_cached_style(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        """Returns the cached style entry for an archive style, marking it as recently used."""
+        with self._style_cache_lock:
+            if not STYLE_CACHE_ENABLED or key not in self._style_cache:
+                return None
+            self._style_cache.move_to_end(key)
+            return self._style_cache[key]
+
+    def _store_cached_style(self, key: Tuple[str, str], entry: Dict[str, Any]):
+        """Stores a style entry, evicting the least recently used ones beyond STYLE_CACHE_SIZE."""
+        if not STYLE_CACHE_ENABLED:
+            return
+        with self._style_cache_lock:
+            self._style_cache[key] = entry
+            self._style_cache.move_to_end(key)
+            while len(self._style_cache) > STYLE_CACHE_SIZE:
+                evicted_key, _ = self._style_cache.popitem(last=False)
+                logger.info(f"Evicted cached style {evicted_key}")
+
+    def _get_cached_style_tensor(self, key: Tuple[str, Tuple[int, int]]) -> Optional[Dict[str, Any]]:
+        """Returns the cached device tensor and Gram matrices for one style image at one size."""
+        with self._style_cache_lock:
+            if not STYLE_CACHE_ENABLED or key not in self._style_tensor_cache:
+                return None
+            self._style_tensor_cache.move_to_end(key)
+            return self._style_tensor_cache[key]
+
+    def _drop_cached_style_tensors(self, style_path: Path):
+        """Removes every cached tensor decoded from style_path, at any size."""
+        with self._style_cache_lock:
+            for key in [key for key in self._style_tensor_cache if key[0] == str(style_path)]:
+                del self._style_tensor_cache[key]
+            self._style_bytes_cache.pop(str(style_path), None)
+        self._drop_persisted_grams(style_path)
+
+    def _gram_cache_path(self, key: Tuple[str, Tuple[int, int]]) -> Optional[Path]:
+        """Returns where the Gram matrices for one style image at one size are persisted, or None if disabled."""
+        if GRAM_CACHE_DIR is None or not STYLE_CACHE_ENABLED:
+            return None
+        style_path, (width, height) = key
+        # Grams depend on the selected layers, the VGG precision and the input range as well as the image
+        variant = hashlib.sha256(f"{','.join(self.style_transfer.style_layers)}|{self.style_transfer.amp_dtype}|rgb01".encode()).hexdigest()[:12]
+        return GRAM_CACHE_DIR / f"{Path(style_path).stem}_{width}x{height}_{variant}.pt"
+
+    def _load_persisted_grams(self, key: Tuple[str, Tuple[int, int]]) -> Optional[Dict[str, torch.Tensor]]:
+        """Loads Gram matrices saved by _persist_grams onto the device; None if absent or unreadable."""
+        gram_path = self._gram_cache_path(key)
+        if gram_path is None or not gram_path.exists():
+            return None
+        try:
+            grams = torch.load(gram_path, map_location=self.device)
+            logger.info(f"Loaded persisted style Gram matrices from {gram_path}")
+            return grams
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable persisted Gram matrices {gram_path}: {e}")
+            return None
+
+    def _persist_grams(self, key: Tuple[str, Tuple[int, int]], grams: Dict[str, torch.Tensor]):
+        """Saves one style image's Gram matrices so a restarted service can skip its VGG forward."""
+        gram_path = self._gram_cache_path(key)
+        if gram_path is None:
+            return
+        temp_path = gram_path.with_name(f"{gram_path.stem}_{uuid.uuid4()}.tmp")
+        try:
+            torch.save({layer: gram.cpu() for layer, gram in grams.items()}, temp_path)
+            os.replace(temp_path, gram_path)
+        except OSError as e:
+            logger.error(f"Error persisting style Gram matrices to {gram_path}: {e}")
+            temp_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _drop_persisted_grams(style_path: Path):
+        """Deletes the persisted Gram matrices of style_path, at any size."""
+        if GRAM_CACHE_DIR is None:
+            return
+        for gram_path in GRAM_CACHE_DIR.glob(f"{Path(style_path).stem}_*.pt"):
+            gram_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _average_gram_key(
+        style_cache_key: Tuple[str, str],
+        style_paths: List[str],
+        target_size: Tuple[int, int]
+    ) -> Optional[Tuple[str, Tuple[int, int]]]:
+        """
+        Builds the persistence key of an archive style's average Gram matrices at one size.
+        The key covers every reference file and its modification time, so a refreshed
+        download never matches averages computed from the previous version.
+
+        Returns:
+            Key in the form used by _gram_cache_path, or None if a reference file is gone
+        """
+        try:
+            references = "|".join(sorted(f"{path}:{os.stat(path).st_mtime_ns}" for path in style_paths))
+        except OSError:
+            return None
+        style_digest = hashlib.sha256("|".join(style_cache_key).encode()).hexdigest()[:16]
+        references_digest = hashlib.sha256(references.encode()).hexdigest()[:16]
+        return (f"avg_{style_digest}_{references_digest}", target_size)
+
+    def _has_persisted_average(self, style_cache_key: Tuple[str, str], style_urls: List[str], target_size: Tuple[int, int]) -> bool:
+        """Whether the average Gram matrices of the style files that style_urls download to are already persisted."""
+        style_paths = [str(self._style_file_path(self._thumb_url(url))) for url in style_urls]
+        average_key = self._average_gram_key(style_cache_key, style_paths, target_size)
+        gram_path = self._gram_cache_path(average_key) if average_key else None
+        return gram_path is not None and gram_path.exists()
+
+    def _persist_average_grams(self, key: Tuple[str, Tuple[int, int]], grams: Dict[str, torch.Tensor]):
+        """Persists an archive style's average Gram matrices, replacing ones saved for an older reference set."""
+        gram_path = self._gram_cache_path(key)
+        if gram_path is None:
+            return
+        style_prefix = key[0].rsplit("_", 1)[0]
+        for stale_path in GRAM_CACHE_DIR.glob(f"{style_prefix}_*.pt"):
+            if not stale_path.name.startswith(key[0]):
+                stale_path.unlink(missing_ok=True)
+        self._persist_grams(key, grams)
+
+    def _store_cached_style_tensor(self, key: Tuple[str, Tuple[int, int]], entry: Dict[str, Any]):
+        """Stores one style image's tensor and Gram matrices, evicting beyond STYLE_TENSOR_CACHE_SIZE."""
+        if not STYLE_CACHE_ENABLED:
+            return
+        with self._style_cache_lock:
+            self._style_tensor_cache[key] = entry
+            self._style_tensor_cache.move_to_end(key)
+            while len(self._style_tensor_cache) > STYLE_TENSOR_CACHE_SIZE:
+                self._style_tensor_cache.popitem(last=False)
+
+    def _on_device(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Runs blocking device work under StyleTransfer.device_work, so it never overlaps a CUDA graph capture."""
+        with self.style_transfer.device_work():
+            return fn(*args)
 
     # --- LOCAL TRANSFORMATION LOGIC --- #
     async def _local_transform(
         self,
-        content_path: Path,
+        content_source: ImageSource,
         style_source_paths: List[Path],
         output_path: Optional[Path],
         final_style_weight: float,
@@ -255,11 +854,24 @@ class TransformationService:
         clahe_clip_limit_param: Optional[float],
         usm_enabled_param: Optional[bool],
         usm_amount_param: Optional[float],
-        is_local_test_style: bool = False
+        is_local_test_style: bool = False,
+        style_cache_key: Optional[Tuple[str, str]] = None,
+        style_urls: Optional[List[str]] = None,
+        cached_style: Optional[Dict[str, Any]] = None
     ) -> Dict:
-        """Performs the style transfer using the local PyTorch implementation."""
+        """
+        Performs the style transfer using the local PyTorch implementation.
+        Archive styles found in the style cache are passed in as cached_style and
+        reuse its tensors and Gram matrices, even if the entry is evicted meanwhile;
+        an entry cached at another size is decoded again from its reference files.
+        Style references listed in style_urls are downloaded here, while the
+        content image decodes, and each one is decoded as soon as it arrives.
+        Gram matrices and post-processing run on the transform executor, and the
+        optimization itself is queued on the batcher so concurrent requests share
+        one VGG forward per step.
+        """
         logger.info(f"Executing local transformation process (Source: {'Local Test Image' if is_local_test_style else 'Archive References'})")
-        temp_style_paths_to_clean: List[Path] = [] if is_local_test_style else style_source_paths
+        temp_style_paths_to_clean: List[Path] = [] if is_local_test_style else list(style_source_paths)
 
         parameters_used = {
             'content_weight': final_content_weight,
@@ -270,172 +882,486 @@ class TransformationService:
             'post_processing_applied': {}
         }
 
+        loop = asyncio.get_running_loop()
+        # 1. Load and Process Images for Style Transfer
+        logger.info("Loading images for local processing")
+        content_task = asyncio.ensure_future(asyncio.to_thread(self._on_device, self.image_processor.load_image, content_source))
+        style_downloads = [
+            asyncio.create_task(self._download_style_image(i, len(style_urls), url))
+            for i, url in enumerate(style_urls or [])
+        ]
         try:
-            # 1. Load and Process Images for Style Transfer
-            logger.info("Loading images for local processing")
-            content_pil_img, content_tensor = self.image_processor.load_image(str(content_path))
-            style_tensors: List[torch.Tensor] = []
-            loaded_style_paths: List[str] = []
+            content_pil_img, content_tensor = await content_task
             target_size = content_pil_img.size
             logger.info(f"Content image dimensions for style resizing: {target_size}")
-            for style_path in style_source_paths:
-                try:
-                    style_pil_img = Image.open(style_path).convert('RGB')
-                    if style_pil_img.size != target_size:
-                        logger.info(f"Resizing style image from {style_pil_img.size} to {target_size} to match content image.")
-                        style_pil_img_resized = style_pil_img.resize(target_size, Image.Resampling.LANCZOS)
-                    else:
-                        style_pil_img_resized = style_pil_img
-                    style_tensor = self.image_processor.preprocess(style_pil_img_resized).unsqueeze(0).to(self.device)
-                    style_tensors.append(style_tensor)
-                    loaded_style_paths.append(str(style_path))
-                except FileNotFoundError:
-                    logger.error(f"Style image not found at {style_path}. Skipping.")
-                except Exception as e:
-                    logger.error(f"Error loading/processing style image {style_path}: {e}. Skipping.")
-            if not style_tensors:
-                raise RuntimeError("Failed to load any valid style images.")
+            if cached_style is not None and cached_style['size'] != target_size:
+                # Decoded again from the original files: resampling the cached tensors would compound the loss
+                logger.info(f"Rebuilding cached style references for {style_cache_key} at {target_size} (cached at {cached_style['size']})")
+                style_source_paths = [Path(path) for path in cached_style['paths']]
+                cached_style = None
+            # With the average already persisted for these reference files, downloads only need decoding
+            compute_grams = not (style_cache_key and style_urls and await asyncio.to_thread(
+                self._has_persisted_average, style_cache_key, style_urls, target_size
+            ))
+            style_entries = await self._load_style_references(
+                style_source_paths, style_downloads, target_size, style_cache_key, temp_style_paths_to_clean, compute_grams
+            )
+            if cached_style is None and not style_entries and style_cache_key and not style_downloads:
+                # The cached reference files were evicted since the style was cached; fetch them again
+                logger.warning(f"Cached style references for {style_cache_key} are gone, downloading them again")
+                style_urls = await self._fetch_style_image_urls(*style_cache_key, STYLE_REFERENCE_COUNT)
+                style_downloads = [
+                    asyncio.create_task(self._download_style_image(i, len(style_urls), url))
+                    for i, url in enumerate(style_urls)
+                ]
+                style_entries = await self._load_style_references(
+                    [], style_downloads, target_size, style_cache_key, temp_style_paths_to_clean
+                )
+            style_tensors, style_grams, loaded_style_paths = await loop.run_in_executor(
+                self._transform_executor,
+                functools.partial(self._on_device, self._build_style_targets, style_entries, target_size, style_cache_key, cached_style)
+            )
 
             # 2. Perform Style Transfer
-            logger.info("Starting local style transfer optimization")
+            logger.info("Queueing local style transfer optimization")
             logger.info(f" -> Using Weights: Style={final_style_weight:.2e}, Content={final_content_weight:.2f}, TV={final_tv_weight:.2e} | Steps={final_num_steps} | LR: {final_learning_rate:.3f}")
-            output_tensor, history = self.style_transfer.transfer_style(
+            output_tensor, history = await self.style_batcher.submit(
                 content_tensor,
-                style_tensors,
+                style_grams,
                 num_steps=final_num_steps,
-                style_weight=final_style_weight,
                 content_weight=final_content_weight,
+                style_weight=final_style_weight,
                 tv_weight=final_tv_weight,
                 learning_rate=final_learning_rate
             )
 
-            # 3. Convert initial stylized tensor to PIL Image
-            processed_pil_image = self.image_processor.tensor_to_image(output_tensor)
-
-            # 4. Compute Quality Metrics (on the image BEFORE aesthetic post-processing)
-            logger.info("Computing local quality metrics on pre-enhancement image")
-            metrics = self.quality_metrics.assess_quality(
-                content_tensor,
-                style_tensors,
-                output_tensor, 
-                self.feature_extractor,
-                history
+            return await loop.run_in_executor(
+                self._transform_executor,
+                functools.partial(
+                    self._on_device,
+                    self._finish_local_transform,
+                    content_tensor,
+                    style_tensors,
+                    output_tensor,
+                    history,
+                    output_path,
+                    parameters_used,
+                    loaded_style_paths,
+                    saturation_enabled_param,
+                    saturation_factor_param,
+                    clahe_enabled_param,
+                    clahe_clip_limit_param,
+                    usm_enabled_param,
+                    usm_amount_param
+                )
             )
+        finally:
+            for task in [content_task, *style_downloads]:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*style_downloads, return_exceptions=True)
+            await self._cleanup_temp_files_async(temp_style_paths_to_clean)
 
-            # 5. Apply Post-Processing Enhancements (use param if provided, else config)
-            logger.info("Applying post-processing enhancements based on parameters or config...")
-            final_enhanced_pil_image = processed_pil_image.copy()
-
-            # --- Unsharp Mask --- #
-            usm_config = POST_PROCESSING_CONFIG.get('unsharp_mask', {})
-            usm_enabled = usm_enabled_param if usm_enabled_param is not None else usm_config.get('enabled', False)
-            usm_amount = usm_amount_param if usm_amount_param is not None else float(usm_config.get('amount', 1.0))
-            usm_sigma = float(usm_config.get('sigma', 1.0))
-            usm_threshold = int(usm_config.get('threshold', 0))
-
-            parameters_used['post_processing_applied']['unsharp_mask'] = {
-                'enabled': usm_enabled,
-                'amount': usm_amount,
-                'sigma': usm_sigma,
-                'threshold': usm_threshold
-            }
-            if usm_enabled:
-                logger.info(f"Applying Unsharp Mask: amount={usm_amount}, sigma={usm_sigma}, threshold={usm_threshold}")
-                numpy_bgr = np.array(final_enhanced_pil_image.convert('RGB'))[:, :, ::-1].copy()
-                sharpened_bgr = unsharp_mask(
-                    numpy_bgr,
-                    amount=usm_amount,
-                    sigma=usm_sigma,
-                    threshold=usm_threshold
-                )
-                final_enhanced_pil_image = Image.fromarray(sharpened_bgr[:, :, ::-1])
-
-            # --- CLAHE Contrast --- #
-            clahe_config = POST_PROCESSING_CONFIG.get('clahe_contrast', {})
-            clahe_enabled = clahe_enabled_param if clahe_enabled_param is not None else clahe_config.get('enabled', False)
-            clahe_clip_limit = clahe_clip_limit_param if clahe_clip_limit_param is not None else float(clahe_config.get('clip_limit', 2.0))
-            clahe_tile_size = int(clahe_config.get('tile_grid_size', 8))
-
-            parameters_used['post_processing_applied']['clahe_contrast'] = {
-                'enabled': clahe_enabled,
-                'clip_limit': clahe_clip_limit,
-                'tile_grid_size': clahe_tile_size
-            }
-            if clahe_enabled:
-                logger.info(f"Applying CLAHE Contrast: clip_limit={clahe_clip_limit}, tile_size={clahe_tile_size}")
-                numpy_bgr = np.array(final_enhanced_pil_image.convert('RGB'))[:, :, ::-1].copy()
-                contrasted_bgr = apply_clahe_contrast(
-                    numpy_bgr,
-                    clip_limit=clahe_clip_limit,
-                    tile_grid_size=clahe_tile_size
-                )
-                final_enhanced_pil_image = Image.fromarray(contrasted_bgr[:, :, ::-1])
+    def _load_style_tensor(self, style_path: Path, target_size: Tuple[int, int], use_tensor_cache: bool) -> Optional[Dict[str, Any]]:
+        """
+        Decodes one style reference at the content size.
 
-            satur_config = POST_PROCESSING_CONFIG.get('saturation_boost', {})
-            saturation_enabled = saturation_enabled_param if saturation_enabled_param is not None else satur_config.get('enabled', False)
-            saturation_factor = saturation_factor_param if saturation_factor_param is not None else float(satur_config.get('factor', 1.2))
+        Args:
+            style_path: Path to the style image
+            target_size: Content image size (width, height) the style is resized to
+            use_tensor_cache: Whether archive downloads may reuse the per-image tensor cache
 
-            parameters_used['post_processing_applied']['saturation_boost'] = {
-                'enabled': saturation_enabled,
-                'factor': saturation_factor
-            }
-            if saturation_enabled:
-                logger.info(f"Applying Saturation Boost: factor={saturation_factor}")
-                final_enhanced_pil_image = adjust_saturation(
-                    final_enhanced_pil_image,
-                    factor=saturation_factor
+        Returns:
+            Dict with the path, tensor cache key, tensor and per-image Gram matrices
+            (None until computed), or None if the image could not be loaded
+        """
+        # Archive downloads are named by URL digest, so the path identifies the image across requests
+        tensor_cache_key = (str(style_path), target_size)
+        cached_tensor = self._get_cached_style_tensor(tensor_cache_key) if use_tensor_cache else None
+        if cached_tensor is not None:
+            return {'path': str(style_path), 'key': tensor_cache_key, 'tensor': cached_tensor['tensor'], 'grams': cached_tensor['grams']}
+        try:
+            style_pil_img = self.image_processor.open_image(io.BytesIO(self._read_style_bytes(style_path)), min_size=target_size)
+            style_tensor = self.image_processor.to_device(self.image_processor.preprocess(style_pil_img).unsqueeze(0), self.device)
+            if style_pil_img.size != target_size:
+                # Resampled on the device (antialiased bicubic) instead of a CPU LANCZOS pass in Pillow
+                logger.info(f"Resizing style image from {style_pil_img.size} to {target_size} to match content image.")
+                style_tensor = F.interpolate(
+                    style_tensor, size=(target_size[1], target_size[0]), mode='bicubic', align_corners=False, antialias=True
                 )
+            style_tensor = style_tensor.contiguous()
+            grams = self._load_persisted_grams(tensor_cache_key) if use_tensor_cache else None
+            if grams is not None:
+                self._store_cached_style_tensor(tensor_cache_key, {'tensor': style_tensor, 'grams': grams})
+            return {'path': str(style_path), 'key': tensor_cache_key, 'tensor': style_tensor, 'grams': grams}
+        except FileNotFoundError:
+            logger.error(f"Style image not found at {style_path}. Skipping.")
+        except Exception as e:
+            logger.error(f"Error loading/processing style image {style_path}: {e}. Skipping.")
+        return None
 
-            # 6. Save Final (potentially enhanced) Result
-            if output_path:
-                logger.info(f"Saving final result to {output_path}")
-                self.image_processor.save_image(final_enhanced_pil_image, str(output_path))
-
-            # 7. Format Return Value
-            return {
-                "status": "success",
-                "metrics": metrics,
-                "used_style_paths": loaded_style_paths,
-                "processing_mode": "local",
-                "timestamp": datetime.now().isoformat(),
-                "parameters_used": parameters_used
-            }
+    async def _load_style_references(
+        self,
+        style_source_paths: List[Path],
+        style_downloads: List["asyncio.Task[Optional[Path]]"],
+        target_size: Tuple[int, int],
+        style_cache_key: Optional[Tuple[str, str]],
+        downloaded_paths: List[Path],
+        compute_grams: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Decodes style references on worker threads as they become available.
+        Downloads still in flight are consumed in completion order, so each
+        decode and its Gram matrices overlap the remaining network transfers.
+
+        Args:
+            style_source_paths: Style images already on disk
+            style_downloads: Pending style download tasks
+            target_size: Content image size (width, height)
+            style_cache_key: (period_id, category_id) for archive styles, None for local test styles
+            downloaded_paths: Receives every downloaded path so the caller can clean it up
+            compute_grams: Whether downloads get their per-image Gram matrices right away;
+                           off when the style's average Gram matrices are already persisted
+
+        Returns:
+            List of style entries as returned by _load_style_tensor
+        """
+        use_tensor_cache = style_cache_key is not None
+        decodes = [
+            asyncio.ensure_future(asyncio.to_thread(self._on_device, self._load_style_tensor, path, target_size, use_tensor_cache))
+            for path in style_source_paths
+        ]
+        try:
+            for download in asyncio.as_completed(style_downloads):
+                try:
+                    style_path = await download
+                except Exception as e:
+                    logger.warning(f"Unexpected error downloading style image: {e}. Skipping.")
+                    continue
+                if style_path is None:
+                    continue
+                downloaded_paths.append(style_path)
+                decodes.append(asyncio.ensure_future(
+                    self._prepare_downloaded_style(style_path, target_size, use_tensor_cache) if compute_grams
+                    else asyncio.to_thread(self._on_device, self._load_style_tensor, style_path, target_size, use_tensor_cache)
+                ))
+            if style_downloads and not downloaded_paths:
+                raise RuntimeError("Failed to download any valid style images.")
+            return [entry for entry in await asyncio.gather(*decodes) if entry is not None]
         finally:
-            self._cleanup_temp_files(temp_style_paths_to_clean)
+            for decode in decodes:
+                if not decode.done():
+                    decode.cancel()
+
+    async def _prepare_downloaded_style(
+        self,
+        style_path: Path,
+        target_size: Tuple[int, int],
+        use_tensor_cache: bool
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Decodes a freshly downloaded style reference and computes its Gram matrices right away,
+        so the VGG pass runs while later downloads are still in flight instead of after the last one.
+
+        Args:
+            style_path: Path to the downloaded style image
+            target_size: Content image size (width, height)
+            use_tensor_cache: Whether the entry may be stored in the per-image tensor cache
+
+        Returns:
+            Style entry as returned by _load_style_tensor, with its Gram matrices filled in
+        """
+        entry = await asyncio.to_thread(self._on_device, self._load_style_tensor, style_path, target_size, use_tensor_cache)
+        if entry is None or entry['grams'] is not None:
+            return entry
+        entry['grams'] = await asyncio.get_running_loop().run_in_executor(
+            self._transform_executor,
+            functools.partial(self._on_device, self._compute_entry_grams, entry, use_tensor_cache)
+        )
+        return entry
+
+    def _compute_entry_grams(self, entry: Dict[str, Any], use_tensor_cache: bool) -> Dict[str, torch.Tensor]:
+        """Computes the Gram matrices of one decoded style entry and caches them for archive styles."""
+        grams = self.style_transfer.compute_image_style_grams([entry['tensor']])[0]
+        if use_tensor_cache:
+            self._store_cached_style_tensor(entry['key'], {'tensor': entry['tensor'], 'grams': grams})
+            self._persist_grams(entry['key'], grams)
+        return grams
+
+    def _build_style_targets(
+        self,
+        style_entries: List[Dict[str, Any]],
+        target_size: Tuple[int, int],
+        style_cache_key: Optional[Tuple[str, str]],
+        cached_style: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[torch.Tensor], Dict[str, torch.Tensor], List[str]]:
+        """
+        Combines freshly decoded style references into tensors and average style Gram matrices.
+        A cached style entry, which must already be at target_size, is returned as is.
+        """
+        if cached_style is not None:
+            logger.info(f"Using cached style references for {style_cache_key}")
+            return list(cached_style['tensors']), cached_style['grams'], list(cached_style['paths'])
+
+        if not style_entries:
+            raise RuntimeError("Failed to load any valid style images.")
+        style_tensors = [entry['tensor'] for entry in style_entries]
+        loaded_style_paths = [entry['path'] for entry in style_entries]
+        # Persisted per reference set, size and layer/precision variant: a warm style skips the per-image Grams
+        average_key = self._average_gram_key(style_cache_key, loaded_style_paths, target_size) if style_cache_key else None
+        style_grams = self._load_persisted_grams(average_key) if average_key else None
+        if style_grams is None:
+            style_grams = self._average_entry_grams(style_entries, style_cache_key)
+            if average_key:
+                self._persist_average_grams(average_key, style_grams)
+        if style_cache_key:
+            self._store_cached_style(style_cache_key, {
+                'tensors': style_tensors,
+                'grams': style_grams,
+                'size': target_size,
+                'paths': loaded_style_paths
+            })
+
+        return style_tensors, style_grams, loaded_style_paths
+
+    def _average_entry_grams(
+        self,
+        style_entries: List[Dict[str, Any]],
+        style_cache_key: Optional[Tuple[str, str]]
+    ) -> Dict[str, torch.Tensor]:
+        """Averages the style entries' per-image Gram matrices, computing missing ones in one batched VGG forward."""
+        style_tensors = [entry['tensor'] for entry in style_entries]
+        # None marks references decoded without Gram matrices
+        per_image_grams: List[Optional[Dict[str, torch.Tensor]]] = [entry['grams'] for entry in style_entries]
+        missing = [i for i, grams in enumerate(per_image_grams) if grams is None]
+        if missing:
+            new_grams = self.style_transfer.compute_image_style_grams([style_tensors[i] for i in missing])
+            for i, image_grams in zip(missing, new_grams):
+                per_image_grams[i] = image_grams
+                if style_cache_key:
+                    self._store_cached_style_tensor(style_entries[i]['key'], {'tensor': style_tensors[i], 'grams': image_grams})
+                    self._persist_grams(style_entries[i]['key'], image_grams)
+        # Same average as StyleTransfer._calculate_average_style_grams, from per-image Gram matrices
+        return {
+            layer: torch.mean(torch.stack([grams[layer] for grams in per_image_grams], dim=0), dim=0)
+            for layer in per_image_grams[0]
+        }
+
+    def _finish_local_transform(
+        self,
+        content_tensor: torch.Tensor,
+        style_tensors: List[torch.Tensor],
+        output_tensor: torch.Tensor,
+        history: Dict[str, List[float]],
+        output_path: Optional[Path],
+        parameters_used: Dict[str, Any],
+        loaded_style_paths: List[str],
+        saturation_enabled_param: Optional[bool],
+        saturation_factor_param: Optional[float],
+        clahe_enabled_param: Optional[bool],
+        clahe_clip_limit_param: Optional[float],
+        usm_enabled_param: Optional[bool],
+        usm_amount_param: Optional[float]
+    ) -> Dict:
+        """Computes quality metrics, applies post-processing and saves the stylized result."""
+        # 3. Convert initial stylized tensor to PIL Image
+        processed_pil_image = self.image_processor.tensor_to_image(output_tensor)
+
+        # 4. Compute Quality Metrics (on the image BEFORE aesthetic post-processing)
+        logger.info("Computing local quality metrics on pre-enhancement image")
+        metrics = self.quality_metrics.assess_quality(
+            content_tensor,
+            style_tensors,
+            output_tensor, 
+            self.feature_extractor,
+            history
+        )
+
+        # 5. Apply Post-Processing Enhancements (use param if provided, else config)
+        logger.info("Applying post-processing enhancements based on parameters or config...")
+        final_enhanced_pil_image = processed_pil_image
+        # All enabled stages share one BGR uint8 array; PIL is rebuilt once at the end
+        enhanced_bgr: Optional[np.ndarray] = None
+
+        # --- Unsharp Mask --- #
+        usm_enabled = usm_enabled_param if usm_enabled_param is not None else USM_ENABLED
+        usm_amount = usm_amount_param if usm_amount_param is not None else USM_AMOUNT
+        usm_sigma = USM_SIGMA
+        usm_threshold = USM_THRESHOLD
+
+        parameters_used['post_processing_applied']['unsharp_mask'] = {
+            'enabled': usm_enabled,
+            'amount': usm_amount,
+            'sigma': usm_sigma,
+            'threshold': usm_threshold
+        }
+        if usm_enabled:
+            logger.info(f"Applying Unsharp Mask: amount={usm_amount}, sigma={usm_sigma}, threshold={usm_threshold}")
+            enhanced_bgr = cv2.cvtColor(np.asarray(processed_pil_image), cv2.COLOR_RGB2BGR)
+            enhanced_bgr = unsharp_mask(
+                enhanced_bgr,
+                amount=usm_amount,
+                sigma=usm_sigma,
+                threshold=usm_threshold
+            )
+
+        # --- CLAHE Contrast --- #
+        clahe_enabled = clahe_enabled_param if clahe_enabled_param is not None else CLAHE_ENABLED
+        clahe_clip_limit = clahe_clip_limit_param if clahe_clip_limit_param is not None else CLAHE_CLIP_LIMIT
+        clahe_tile_size = CLAHE_TILE_SIZE
+
+        parameters_used['post_processing_applied']['clahe_contrast'] = {
+            'enabled': clahe_enabled,
+            'clip_limit': clahe_clip_limit,
+            'tile_grid_size': clahe_tile_size
+        }
+        if clahe_enabled:
+            logger.info(f"Applying CLAHE Contrast: clip_limit={clahe_clip_limit}, tile_size={clahe_tile_size}")
+            if enhanced_bgr is None:
+                enhanced_bgr = cv2.cvtColor(np.asarray(processed_pil_image), cv2.COLOR_RGB2BGR)
+            enhanced_bgr = apply_clahe_contrast(
+                enhanced_bgr,
+                clip_limit=clahe_clip_limit,
+                tile_grid_size=clahe_tile_size
+            )
+
+        saturation_enabled = saturation_enabled_param if saturation_enabled_param is not None else SATURATION_ENABLED
+        saturation_factor = saturation_factor_param if saturation_factor_param is not None else SATURATION_FACTOR
+
+        parameters_used['post_processing_applied']['saturation_boost'] = {
+            'enabled': saturation_enabled,
+            'factor': saturation_factor
+        }
+        if saturation_enabled:
+            logger.info(f"Applying Saturation Boost: factor={saturation_factor}")
+            if enhanced_bgr is None:
+                enhanced_bgr = cv2.cvtColor(np.asarray(processed_pil_image), cv2.COLOR_RGB2BGR)
+            enhanced_bgr = adjust_saturation_array(
+                enhanced_bgr,
+                factor=saturation_factor
+            )
+
+        if enhanced_bgr is not None:
+            final_enhanced_pil_image = Image.fromarray(cv2.cvtColor(enhanced_bgr, cv2.COLOR_BGR2RGB))
+
+        # 6. Save Final (potentially enhanced) Result
+        if output_path:
+            logger.info(f"Saving final result to {output_path}")
+            self.image_processor.save_image(final_enhanced_pil_image, str(output_path))
+
+        # 7. Format Return Value
+        return {
+            "status": "success",
+            "metrics": metrics,
+            "used_style_paths": loaded_style_paths,
+            "processing_mode": "local",
+            "timestamp": datetime.now().isoformat(),
+            "parameters_used": parameters_used,
+            "result_image": final_enhanced_pil_image
+        }
+
+    # --- FEED-FORWARD TRANSFORMATION LOGIC --- #
+    async def _fast_ffn_transform(
+        self,
+        content_source: ImageSource,
+        period_id: str,
+        category_id: str,
+        output_path: Optional[Path],
+    ) -> Dict:
+        """Performs style transfer with a single forward pass of a pre-trained TransformerNet."""
+        model = self.fast_ffn_models.get((period_id, category_id))
+        if model is None:
+            raise ValueError(f"No pre-trained fast_ffn model available for period '{period_id}' and category '{category_id}'.")
+
+        logger.info(f"Executing fast_ffn transformation for {period_id}/{category_id}")
+        output_pil_image = await asyncio.get_running_loop().run_in_executor(
+            self._transform_executor,
+            functools.partial(self._on_device, self._run_fast_ffn, model, content_source, output_path)
+        )
+
+        parameters_used = {
+            'content_weight': None,
+            'style_weight': None,
+            'tv_weight': None,
+            'num_steps': None,
+            'learning_rate': None,
+            'post_processing_applied': {}
+        }
+        return {
+            "status": "success",
+            "metrics": { "content_similarity": None, "style_consistency_avg": None },
+            "used_style_paths": [],
+            "processing_mode": "local (fast_ffn)",
+            "timestamp": datetime.now().isoformat(),
+            "parameters_used": parameters_used,
+            "result_image": output_pil_image
+        }
+
+    def _run_fast_ffn(self, model, content_source: ImageSource, output_path: Optional[Path]) -> Image.Image:
+        """Decodes the content image, runs the TransformerNet forward and saves the result."""
+        content_pil_img = self.image_processor.load_pil(content_source)
+        # TransformerNet works in the 0-255 range, so the pixels are copied to the device once, unscaled
+        content_tensor = self.image_processor.to_device(
+            torch.from_numpy(np.asarray(content_pil_img)).permute(2, 0, 1).unsqueeze(0).float(), self.device
+        )
+
+        with torch.inference_mode():
+            output_tensor = model(content_tensor)
+
+        output_array = output_tensor[0].clamp(0, 255).permute(1, 2, 0).byte().cpu().numpy()
+        output_pil_image = Image.fromarray(output_array)
+
+        if output_path:
+            logger.info(f"Saving fast_ffn result to {output_path}")
+            self.image_processor.save_image(output_pil_image, str(output_path))
+        return output_pil_image
 
     # --- CLOUD TRANSFORMATION LOGIC (Magenta TF Hub) --- #
+    @staticmethod
+    def _load_magenta_content(content_source: ImageSource) -> tf.Tensor:
+        """Decodes and preprocesses the content image for the Magenta model."""
+        return _load_and_preprocess_for_magenta(content_source)
+
+    def _run_magenta_model(self, content_tensor_tf: tf.Tensor, style_image_path: Path, output_path: Optional[Path]) -> Image.Image:
+        """Decodes the style image, stylizes the content with the compiled Magenta function and saves the result."""
+        # 1. Load and preprocess the style image for Magenta model
+        logger.info("Loading and preprocessing style image for Magenta model...")
+        style_tensor_tf = _preprocess_magenta_bytes(self._read_style_bytes(style_image_path))
+
+        # 2. Perform Stylization
+        logger.info("Stylizing image with Magenta model...")
+        stylized_image_tf = MAGENTA_STYLIZE_FN(content_tensor_tf, style_tensor_tf)
+
+        # 3. Convert output tensor to PIL Image
+        output_pil_image = _tensor_to_pil_image_magenta(stylized_image_tf)
+
+        # 4. Save Result
+        if output_path:
+            logger.info(f"Saving Magenta model result to {output_path}")
+            self.image_processor.save_image(output_pil_image, str(output_path))
+        return output_pil_image
+
     async def _execute_tfhub_magenta_model_locally(
         self,
-        content_path: Path,
+        content_source: ImageSource,
         style_image_path: Path,
         output_path: Optional[Path],
+        content_tensor_tf: Optional[tf.Tensor] = None,
     ) -> Dict:
-        """Performs style transfer using the Magenta TF Hub model (run locally)."""
+        """
+        Performs style transfer using the Magenta TF Hub model (run locally).
+        content_tensor_tf, when given, is the already preprocessed content image.
+        """
         logger.info("Executing local transformation using TF Hub Magenta model...")
         hub_model = _load_magenta_model()
         if not hub_model:
             raise RuntimeError("TF Hub Magenta model could not be loaded.")
 
         try:
-            # 1. Load and preprocess images for Magenta model
-            logger.info("Loading and preprocessing images for Magenta model...")
-            content_pil_img = Image.open(content_path).convert('RGB')
-            style_pil_img = Image.open(style_image_path).convert('RGB')
-
-            content_tensor_tf = _preprocess_for_magenta(content_pil_img)
-            style_tensor_tf = _preprocess_for_magenta(style_pil_img)
-
-            # 2. Perform Stylization
-            logger.info("Stylizing image with Magenta model...")
-            stylized_image_tf = hub_model(tf.constant(content_tensor_tf), tf.constant(style_tensor_tf))[0]
-
-            # 3. Convert output tensor to PIL Image
-            output_pil_image = _tensor_to_pil_image_magenta(stylized_image_tf)
-
-            # 4. Save Result
-            if output_path:
-                logger.info(f"Saving Magenta model result to {output_path}")
-                self.image_processor.save_image(output_pil_image, str(output_path))
+            # Decoding, inference and saving block, so they run off the event loop
+            if content_tensor_tf is None:
+                content_tensor_tf = await asyncio.to_thread(self._load_magenta_content, content_source)
+            output_pil_image = await asyncio.to_thread(self._run_magenta_model, content_tensor_tf, style_image_path, output_path)
 
             # 5. Format Return Value (Metrics are not directly comparable/available)
             # Also include placeholder parameters_used for consistency
@@ -453,16 +1379,24 @@ class TransformationService:
                 "used_style_paths": [str(style_image_path)],
                 "processing_mode": "cloud (TFHub Magenta)",
                 "timestamp": datetime.now().isoformat(),
-                "parameters_used": parameters_used
+                "parameters_used": parameters_used,
+                "result_image": output_pil_image
             }
         except Exception as e:
             logger.error(f"Magenta model transformation failed: {e}")
             raise RuntimeError(f"Magenta model transformation process failed: {e}")
 
     # --- CLOUD TRANSFORMATION LOGIC (Gradio Space) --- #
+    @staticmethod
+    async def _spill_content(content_source: BinaryIO, destination: Path):
+        """Writes an in-memory content image to disk without blocking the event loop."""
+        content_source.seek(0)
+        async with aiofiles.open(destination, "wb") as f:
+            await f.write(content_source.read())
+
     async def _cloud_transform_gradio_space(
         self,
-        content_path: Path,
+        content_source: ImageSource,
         style_urls: Optional[List[str]] = None,
         local_style_image_file: Optional[UploadFile] = None,
         output_path: Optional[Path] = None,
@@ -491,36 +1425,47 @@ class TransformationService:
             'post_processing_applied': {}
         }
 
+        content_spill: Optional[asyncio.Future] = None
         try:
+            # Gradio uploads from disk, so spill in-memory content to a temp file while the style is fetched
+            if isinstance(content_source, (str, Path)):
+                content_file_path = Path(content_source)
+            else:
+                content_file_path = TEMP_STYLE_DIR / f"content_{uuid.uuid4()}.jpg"
+                temp_style_paths_to_clean.append(content_file_path)
+                content_spill = asyncio.ensure_future(self._spill_content(content_source, content_file_path))
+
             # 1. Get the single style image path (either download or from upload)
             if local_style_image_file:
                 temp_local_style_path = TEMP_STYLE_DIR / f"style_{uuid.uuid4()}_{local_style_image_file.filename}"
-                with open(temp_local_style_path, "wb") as f:
-                    # Read the file content from UploadFile
-                    file_content = await local_style_image_file.read()
-                    f.write(file_content)
+                await save_upload_file(local_style_image_file, temp_local_style_path)
                 style_source_path = temp_local_style_path
                 temp_style_paths_to_clean.append(temp_local_style_path)
                 logger.info(f"Using uploaded local test style image: {local_style_image_file.filename}")
             else:
                 if not style_urls:
                     raise ValueError("Style URLs must be provided for Gradio cloud processing if not using local file.")
-                temp_style_paths_to_clean = await self._download_style_images([style_urls[0]])
-                if not temp_style_paths_to_clean:
+                downloaded_paths = await self._download_style_images([style_urls[0]])
+                if not downloaded_paths:
                      raise ValueError("Failed to download the primary style image for cloud processing.")
-                style_source_path = temp_style_paths_to_clean[0]
+                temp_style_paths_to_clean.extend(downloaded_paths)
+                style_source_path = downloaded_paths[0]
 
             if not style_source_path:
                 raise RuntimeError("Could not determine style source path for cloud processing.")
 
-            # 2. Initialize Gradio Client
-            client = Client(GRADIO_SPACE_ID)
+            if content_spill is not None:
+                await content_spill
+
+            # 2. Get the shared Gradio Client (connected once per process)
+            client = await self._get_gradio_client()
 
-            # 3. Call predict method with all parameters
+            # 3. Call predict method with all parameters; the synchronous client blocks until the Space responds
             logger.info(f"Calling Gradio client predict for Space: {GRADIO_SPACE_ID}")
             try:
-                result_filepath_temp = client.predict(
-                    content_img=handle_file(str(content_path)),
+                result_filepath_temp = await asyncio.to_thread(
+                    client.predict,
+                    content_img=handle_file(str(content_file_path)),
                     style_image=handle_file(str(style_source_path)),
                     style_weight=style_weight_val,
                     content_weight=content_weight_val,
@@ -529,20 +1474,22 @@ class TransformationService:
                 )
             except Exception as e:
                 logger.error(f"Gradio API call failed: {e}")
+                # The Space may have restarted or changed its API; reconnect on the next request
+                if self._gradio_client is client:
+                    self._gradio_client = None
                 raise RuntimeError("Cloud service (Gradio) failed to process the request.")
 
             logger.info(f"Gradio client saved result temporarily to: {result_filepath_temp}")
 
-            # 4. Copy result to desired output path
+            # 4. Copy result to desired output path (all disk access stays off the event loop)
+            if not result_filepath_temp or not await asyncio.to_thread(os.path.exists, result_filepath_temp):
+                logger.error(f"Gradio client did not return a valid file path: {result_filepath_temp}")
+                raise RuntimeError("Cloud service did not return a valid result file.")
             if output_path:
                 logger.info(f"Copying cloud result to {output_path}")
-                if result_filepath_temp and Path(result_filepath_temp).exists():
-                    shutil.copyfile(result_filepath_temp, output_path)
-                else:
-                    logger.error(f"Gradio client did not return a valid file path: {result_filepath_temp}")
-                    raise RuntimeError("Cloud service did not return a valid result file.")
+                await asyncio.to_thread(shutil.copyfile, result_filepath_temp, output_path)
             else:
-                logger.warning(f"No output_path provided. Cloud result is in temp file: {result_filepath_temp}")
+                result_image = await asyncio.to_thread(lambda: Image.open(result_filepath_temp).convert('RGB'))
 
             # 5. Format Return Value
             return {
@@ -551,28 +1498,26 @@ class TransformationService:
                 "used_style_paths": [str(style_source_path)],
                 "processing_mode": f"cloud (Gradio Space: {GRADIO_SPACE_ID})",
                 "timestamp": datetime.now().isoformat(),
-                "parameters_used": parameters_used
+                "parameters_used": parameters_used,
+                "result_image": None if output_path else result_image
             }
 
         except Exception as e:
             logger.error(f"Cloud transformation failed: {e}")
             raise RuntimeError(f"Cloud transformation process failed: {e}")
         finally:
-            self._cleanup_temp_files(temp_style_paths_to_clean)
-            if 'result_filepath_temp' in locals():
-                 result_temp_path_obj = Path(result_filepath_temp)
-                 if result_temp_path_obj.exists():
-                     try:
-                         os.remove(result_filepath_temp)
-                         logger.info(f"Cleaned up temporary Gradio result file: {result_filepath_temp}")
-                     except OSError as e:
-                         logger.error(f"Error removing temporary Gradio file {result_filepath_temp}: {e}")
+            if content_spill is not None and not content_spill.done():
+                content_spill.cancel()
+                await asyncio.gather(content_spill, return_exceptions=True)
+            await self._cleanup_temp_files_async(temp_style_paths_to_clean)
+            if 'result_filepath_temp' in locals() and result_filepath_temp:
+                await asyncio.to_thread(self._remove_temp_file, Path(result_filepath_temp))
 
 
     # --- Main Transformation Method --- #
     async def transform_image(
         self,
-        content_path: Path,
+        content_source: ImageSource,
         period_id: Optional[str] = None,
         category_id: Optional[str] = None,
         local_style_image_file: Optional[UploadFile] = None,
@@ -613,64 +1558,72 @@ class TransformationService:
                 style_source_path_for_magenta: Optional[Path] = None
                 temp_magenta_style_path_to_clean: List[Path] = []
                 temp_local_style_path_magenta: Optional[Path] = None
+                # Decode the content while the style image is saved or downloaded
+                magenta_content_task = asyncio.ensure_future(asyncio.to_thread(self._load_magenta_content, content_source))
 
-                if local_style_image_file:
-                    temp_local_style_path_magenta = TEMP_STYLE_DIR / f"style_{uuid.uuid4()}_{local_style_image_file.filename}"
-                    with open(temp_local_style_path_magenta, "wb") as f:
-                        file_content = await local_style_image_file.read()
-                        f.write(file_content)
-                    style_source_path_for_magenta = temp_local_style_path_magenta
-                    temp_magenta_style_path_to_clean.append(temp_local_style_path_magenta)
-                elif period_id and category_id:
-                    style_urls = self._fetch_style_image_urls(period_id, category_id, 1)
-                    if not style_urls:
-                        raise ValueError(f"Could not find style URL for Magenta model ({period_id}/{category_id})")
-                    downloaded_paths = await self._download_style_images(style_urls)
-                    if not downloaded_paths:
-                        raise ValueError("Failed to download style image for Magenta model.")
-                    style_source_path_for_magenta = downloaded_paths[0]
-                    temp_magenta_style_path_to_clean.extend(downloaded_paths)
-                else:
-                    raise ValueError("Style source (local file or period/category) not provided for Magenta model.")
-                if not style_source_path_for_magenta:
-                     raise RuntimeError("Style source path for Magenta model was not determined.")
+                try:
+                    if local_style_image_file:
+                        temp_local_style_path_magenta = TEMP_STYLE_DIR / f"style_{uuid.uuid4()}_{local_style_image_file.filename}"
+                        await save_upload_file(local_style_image_file, temp_local_style_path_magenta)
+                        style_source_path_for_magenta = temp_local_style_path_magenta
+                        temp_magenta_style_path_to_clean.append(temp_local_style_path_magenta)
+                    elif period_id and category_id:
+                        style_urls = await self._fetch_style_image_urls(period_id, category_id, 1)
+                        if not style_urls:
+                            raise ValueError(f"Could not find style URL for Magenta model ({period_id}/{category_id})")
+                        downloaded_paths = await self._download_style_images(style_urls)
+                        if not downloaded_paths:
+                            raise ValueError("Failed to download style image for Magenta model.")
+                        style_source_path_for_magenta = downloaded_paths[0]
+                        temp_magenta_style_path_to_clean.extend(downloaded_paths)
+                    else:
+                        raise ValueError("Style source (local file or period/category) not provided for Magenta model.")
+                    if not style_source_path_for_magenta:
+                         raise RuntimeError("Style source path for Magenta model was not determined.")
+                except BaseException:
+                    magenta_content_task.cancel()
+                    raise
                 try:
                     result = await self._execute_tfhub_magenta_model_locally(
-                        content_path,
+                        content_source,
                         style_image_path=style_source_path_for_magenta,
                         output_path=output_path,
+                        content_tensor_tf=await magenta_content_task,
                     )
                 finally:
-                    self._cleanup_temp_files(temp_magenta_style_path_to_clean)
-                    if temp_local_style_path_magenta and temp_local_style_path_magenta.exists():
-                        self._cleanup_temp_files([temp_local_style_path_magenta])
+                    await self._cleanup_temp_files_async(temp_magenta_style_path_to_clean)
+                    if temp_local_style_path_magenta:
+                        await self._cleanup_temp_files_async([temp_local_style_path_magenta])
 
             elif ai_model_choice == 'local_vgg':
                 logger.info("Dispatching to local_vgg model, local processing.")
                 style_source_paths: List[Path]
                 is_local_test = False
                 temp_local_style_path: Optional[Path] = None
+                style_cache_key: Optional[Tuple[str, str]] = None
+                style_urls: Optional[List[str]] = None
+                cached_style: Optional[Dict[str, Any]] = None
                 if local_style_image_file:
                     temp_local_style_path = TEMP_STYLE_DIR / f"style_{uuid.uuid4()}_{local_style_image_file.filename}"
-                    with open(temp_local_style_path, "wb") as f:
-                        file_content = await local_style_image_file.read()
-                        f.write(file_content)
+                    await save_upload_file(local_style_image_file, temp_local_style_path)
                     style_source_paths = [temp_local_style_path]
                     is_local_test = True
                 else:
                     if period_id is None or category_id is None:
                         raise ValueError("Period ID and Category ID must be provided for local_vgg if not using local test style.")
-                    style_urls = self._fetch_style_image_urls(period_id, category_id, STYLE_REFERENCE_COUNT)
-                    if not style_urls:
-                        raise ValueError(f"Could not find any style image URLs for period '{period_id}' and category '{category_id}'.")
-                    temp_style_paths = await self._download_style_images(style_urls)
-                    if not temp_style_paths:
-                        raise ValueError("Failed to download any valid style images for local processing.")
-                    style_source_paths = temp_style_paths
+                    style_cache_key = (period_id, category_id)
+                    style_source_paths = []
+                    # The entry itself is handed on, so an eviction before it is used cannot leave the request without styles
+                    cached_style = self._get_cached_style(style_cache_key)
+                    if cached_style is None:
+                        # Downloads are started inside _local_transform so they overlap content decoding
+                        style_urls = await self._fetch_style_image_urls(period_id, category_id, STYLE_REFERENCE_COUNT)
+                        if not style_urls:
+                            raise ValueError(f"Could not find any style image URLs for period '{period_id}' and category '{category_id}'.")
                     is_local_test = False
                 try:
                     result = await self._local_transform(
-                        content_path,
+                        content_source,
                         style_source_paths=style_source_paths,
                         output_path=output_path,
                         final_style_weight=final_style_weight,
@@ -684,11 +1637,25 @@ class TransformationService:
                         clahe_clip_limit_param=clahe_clip_limit,
                         usm_enabled_param=usm_enabled,
                         usm_amount_param=usm_amount,
-                        is_local_test_style=is_local_test
+                        is_local_test_style=is_local_test,
+                        style_cache_key=style_cache_key,
+                        style_urls=style_urls,
+                        cached_style=cached_style
                     )
                 finally:
-                    if temp_local_style_path and temp_local_style_path.exists():
-                        self._cleanup_temp_files([temp_local_style_path])
+                    if temp_local_style_path:
+                        await self._cleanup_temp_files_async([temp_local_style_path])
+
+            elif ai_model_choice == 'fast_ffn':
+                logger.info("Dispatching to pre-trained feed-forward model, local processing.")
+                if local_style_image_file or period_id is None or category_id is None:
+                    raise ValueError("fast_ffn requires period_id and category_id of a pre-trained archive style.")
+                result = await self._fast_ffn_transform(
+                    content_source,
+                    period_id=period_id,
+                    category_id=category_id,
+                    output_path=output_path,
+                )
 
             elif ai_model_choice == 'cloud_gradio':
                 logger.info("Dispatching to Gradio Space for cloud processing.")
@@ -697,11 +1664,11 @@ class TransformationService:
                     raise ValueError("Gradio Space cloud backend not configured.")
                 style_urls_for_gradio = None
                 if not local_style_image_file and period_id and category_id:
-                    style_urls_for_gradio = self._fetch_style_image_urls(period_id, category_id, 1)
+                    style_urls_for_gradio = await self._fetch_style_image_urls(period_id, category_id, 1)
                     if not style_urls_for_gradio:
                         raise ValueError("No style URLs for Gradio.")
                 result = await self._cloud_transform_gradio_space(
-                    content_path,
+                    content_source,
                     style_urls=style_urls_for_gradio,
                     local_style_image_file=local_style_image_file,
                     output_path=output_path,
@@ -710,7 +1677,7 @@ class TransformationService:
                     style_blur=style_blur,
                 )
             else:
-                raise ValueError(f"Unsupported AI model choice: '{ai_model_choice}'. Supported: local_vgg, local_magenta, cloud_gradio.")
+                raise ValueError(f"Unsupported AI model choice: '{ai_model_choice}'. Supported: local_vgg, local_magenta, fast_ffn, cloud_gradio.")
 
             return result
 
@@ -718,7 +1685,10 @@ class TransformationService:
             logger.exception(f"Transformation failed (model: {ai_model_choice}, mode: {processing_mode}): {str(e)}") # Use exception for stack trace
             raise RuntimeError(f"Image transformation failed: {str(e)}")
 
-    def cleanup(self):
+    async def cleanup(self):
         """Clean up any temporary resources."""
         # Future use: clean up TEMP_STYLE_DIR on shutdown
-        pass
+        self.style_batcher.close()
+        if self._http_session is not None and not self._http_session.closed:
+            await self._http_session.close()
+        await asyncio.to_thread(self._transform_executor.shutdown, wait=True)
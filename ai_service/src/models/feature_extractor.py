@@ -6,15 +6,100 @@ Handles model loading, layer selection, and feature extraction.
 import torch
 import torch.nn as nn
 from torchvision.models import vgg19, VGG19_Weights
-from typing import Dict, List, Optional
+from torchvision.models.vgg import cfgs, make_layers
+from typing import ClassVar, Dict, List, Optional, Tuple
 from collections import OrderedDict
+from pathlib import Path
+import copy
+import functools
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# VGG19's topology is fixed: conv layer name -> (block index, index within block), where each block ends with a max pool
+VGG19_LAYER_MAP: "OrderedDict[str, Tuple[int, int]]" = OrderedDict(
+    (f'conv{block + 1}_{conv + 1}', (block, 2 * conv))
+    for block, conv_count in enumerate((2, 2, 4, 4, 4))
+    for conv in range(conv_count)
+)
+# End (exclusive) of each block in vgg19().features
+VGG19_BLOCK_ENDS = (5, 10, 19, 28, 37)
+# Input statistics VGG19 was trained with; folded into conv1_1 so the extractor takes raw [0, 1] RGB
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+def _features_cache_path() -> Path:
+    """Returns where the trimmed VGG19 trunk weights are kept, next to torchvision's checkpoint."""
+    return Path(torch.hub.get_dir()) / "checkpoints" / "vgg19_features_imagenet1k_v1.pt"
+
+def _load_state_dict(path: Path) -> Dict[str, torch.Tensor]:
+    """Memory-maps a saved state dict, so only the pages actually copied into parameters are read."""
+    return torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+
+@functools.lru_cache(maxsize=1)
+def _pretrained_vgg19_features() -> nn.Sequential:
+    """
+    Loads the ImageNet VGG19 convolutional trunk once per process.
+
+    The torchvision checkpoint is ~550 MB, ~400 MB of it classifier weights the
+    extractor discards, and its legacy format cannot be memory-mapped. The first
+    load therefore saves the trunk alone (~80 MB) and later processes map that file.
+    """
+    cache_path = _features_cache_path()
+    if cache_path.exists():
+        try:
+            features = make_layers(cfgs["E"])
+            features.load_state_dict(_load_state_dict(cache_path))
+            return features.eval()
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable VGG19 trunk cache {cache_path}: {e}")
+
+    features = vgg19(weights=VGG19_Weights.IMAGENET1K_V1).features.eval()
+    temp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        torch.save(features.state_dict(), temp_path)
+        os.replace(temp_path, cache_path)
+        logger.info(f"Saved VGG19 trunk weights to {cache_path}")
+    except OSError as e:
+        logger.warning(f"Could not save VGG19 trunk weights to {cache_path}: {e}")
+        temp_path.unlink(missing_ok=True)
+    return features
+
+class _QuantizableConv2d(nn.Module):
+    """Conv2d between quant/dequant stubs so it can be converted to an int8 kernel on its own."""
+
+    def __init__(self, conv: nn.Conv2d):
+        super().__init__()
+        self.quant = torch.ao.quantization.QuantStub()
+        self.conv = conv
+        self.dequant = torch.ao.quantization.DeQuantStub()
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.dequant(self.conv(self.quant(x)))
+
+class _FeatureTrunk(nn.Module):
+    """Flattened VGG prefix returning the outputs at the given layer indices; scriptable with torch.jit.script."""
+
+    def __init__(self, layers: List[nn.Module], output_indices: List[int]):
+        super().__init__()
+        self.layers = nn.ModuleList(layers)
+        self.output_indices = output_indices
+
+    def forward(self, x: torch.Tensor) -> List[torch.Tensor]:
+        outputs: List[torch.Tensor] = []
+        for index, layer in enumerate(self.layers):
+            x = layer(x)
+            if index in self.output_indices:
+                outputs.append(x)
+        return outputs
+
 class VGG19FeatureExtractor(nn.Module):
     """VGG19-based feature extractor for style transfer."""
 
+    layer_map: ClassVar["OrderedDict[str, Tuple[int, int]]"] = VGG19_LAYER_MAP
+
     def __init__(self, layers: Optional[List[str]] = None):
         """
         Initialize the feature extractor with specified layers.
@@ -30,30 +115,12 @@ class VGG19FeatureExtractor(nn.Module):
             'conv4_1', 'conv5_1'
         ]
 
-        vgg = vgg19(weights=VGG19_Weights.IMAGENET1K_V1)
-
-        self.blocks = nn.ModuleList()
-        self.layer_map = OrderedDict()
-
-        current_block = []
-        block_count = 1
-        conv_count = 1
-
-        for layer in vgg.features:
-            current_block.append(layer)
-
-            if isinstance(layer, nn.MaxPool2d):
-                self.blocks.append(nn.Sequential(*current_block))
-                current_block = []
-                block_count += 1
-                conv_count = 1
-            elif isinstance(layer, nn.Conv2d):
-                layer_name = f'conv{block_count}_{conv_count}'
-                self.layer_map[layer_name] = (len(self.blocks), len(current_block) - 1)
-                conv_count += 1
-
-        if current_block:
-            self.blocks.append(nn.Sequential(*current_block))
+        # Each instance gets its own copy: precision casts, memory format changes and int8 quantization modify weights in place
+        features = copy.deepcopy(_pretrained_vgg19_features())
+        self.blocks = nn.ModuleList(
+            features[start:end] for start, end in zip((0,) + VGG19_BLOCK_ENDS[:-1], VGG19_BLOCK_ENDS)
+        )
+        self._fold_input_normalization(self.blocks[0][0])
 
         missing_layers = set(self.layers) - set(self.layer_map.keys())
         if missing_layers:
@@ -62,50 +129,130 @@ class VGG19FeatureExtractor(nn.Module):
         for param in self.parameters():
             param.requires_grad = False
 
+        # TorchScript trunk built by script(); shares its parameters with self.blocks
+        self._scripted: Optional[torch.jit.ScriptModule] = None
+        self._scripted_layers: List[str] = []
+        self._build_plan()
+
         self.eval()
 
+    @staticmethod
+    def _fold_input_normalization(conv: nn.Conv2d) -> None:
+        """
+        Absorb the ImageNet (x - mean) / std normalization into the first convolution (in place),
+        so no per-forward elementwise pass over the image is needed. Only the one-pixel border
+        differs slightly, since conv1_1's zero padding now stands for black rather than the mean colour.
+        """
+        mean = torch.tensor(IMAGENET_MEAN).view(1, 3, 1, 1)
+        std = torch.tensor(IMAGENET_STD).view(1, 3, 1, 1)
+        with torch.no_grad():
+            conv.bias.sub_((conv.weight * (mean / std)).sum(dim=(1, 2, 3)))
+            conv.weight.div_(std)
+
     def forward(self, x: torch.Tensor) -> Dict[str, torch.Tensor]:
         """
         Extract features from specified layers.
 
         Args:
-            x: Input tensor (B x C x H x W)
+            x: Raw RGB input tensor in [0, 1] (B x C x H x W)
 
         Returns:
             Dictionary mapping layer names to feature tensors
         """
+        # Match the weights' dtype so a half-precision extractor accepts FP32 images
+        first_layer = self.blocks[0][0]
+        current_input = x.to(first_layer.weight.dtype) if isinstance(first_layer, nn.Conv2d) else x.float()
+        # Follow the weights' memory format so cuDNN keeps channels_last (Tensor Core) kernels end to end
+        if isinstance(first_layer, nn.Conv2d) and first_layer.weight.is_contiguous(memory_format=torch.channels_last):
+            current_input = current_input.contiguous(memory_format=torch.channels_last)
+        if self._scripted is not None:
+            return dict(zip(self._scripted_layers, self._scripted(current_input)))
+
         features = {}
-        current_input = x
-        processed_layers = set()
+        for layer, name in self._plan:
+            current_input = layer(current_input)
+            if name is not None:
+                features[name] = current_input
+        return features
 
-        layer_indices = {name: self.layer_map[name] for name in self.layers}
-        max_block_needed = max(idx for idx, _ in layer_indices.values()) if layer_indices else -1
+    def _flatten(self) -> Tuple[List[nn.Module], Dict[str, int]]:
+        """
+        Flatten the VGG blocks up to the deepest selected layer.
 
+        Returns:
+            Tuple of (layers in forward order, position of each selected layer)
+        """
+        flat_layers: List[nn.Module] = []
+        flat_index = {}
         for block_idx, block in enumerate(self.blocks):
-            if block_idx > max_block_needed:
-                 break
-
-            current_conv_in_block = 0
-            for i, layer in enumerate(block):
-                 current_input = layer(current_input)
-
-                 if isinstance(layer, nn.Conv2d):
-                     current_conv_in_block += 1
-                     for name, (target_block, target_conv_idx) in layer_indices.items():
-                          layer_name_here = f'conv{block_idx + 1}_{current_conv_in_block}'
-
-                          if name == layer_name_here and name not in processed_layers:
-                              features[name] = current_input 
-                              processed_layers.add(name)
+            for layer_idx, layer in enumerate(block):
+                flat_index[(block_idx, layer_idx)] = len(flat_layers)
+                flat_layers.append(layer)
+        positions = {name: flat_index[self.layer_map[name]] for name in self.layers}
+        depth = max(positions.values()) + 1 if positions else 0
+        return flat_layers[:depth], positions
+
+    def _build_plan(self) -> None:
+        """Precompute the (layer, output name) sequence run by the eager forward."""
+        flat_layers, positions = self._flatten()
+        names = {position: name for name, position in positions.items()}
+        # A plain list, so the layers are not registered twice as submodules
+        self._plan = [(layer, names.get(index)) for index, layer in enumerate(flat_layers)]
+
+    def quantize_int8(self, calibration_images: List[torch.Tensor]) -> "VGG19FeatureExtractor":
+        """
+        Statically quantize the convolutions to int8 for CPU inference (in place).
+        Quantized kernels have no autograd support, so only use this on
+        extractors that never backpropagate to their input (e.g. metrics).
 
-            if len(processed_layers) == len(self.layers):
-                 break
+        Args:
+            calibration_images: Representative preprocessed CPU image tensors (B x C x H x W)
+                                used to calibrate activation ranges
 
-        if len(features) != len(self.layers):
-             missing = set(self.layers) - set(features.keys())
-             logger.warning(f"Could not extract all requested features. Missing: {missing}")
+        Returns:
+            The quantized extractor
+        """
+        engines = torch.backends.quantized.supported_engines
+        backend = next((engine for engine in ('x86', 'fbgemm', 'qnnpack') if engine in engines), None)
+        if backend is None:
+            raise RuntimeError("No int8 quantization engine is available in this PyTorch build.")
+        torch.backends.quantized.engine = backend
+
+        qconfig = torch.ao.quantization.get_default_qconfig(backend)
+        for block in self.blocks:
+            for index, layer in enumerate(block):
+                if isinstance(layer, nn.Conv2d):
+                    wrapped = _QuantizableConv2d(layer)
+                    wrapped.qconfig = qconfig
+                    block[index] = wrapped
+
+        self._scripted = None
+        self._build_plan()
+        torch.ao.quantization.prepare(self, inplace=True)
+        with torch.no_grad():
+            for image in calibration_images:
+                self(image)
+        torch.ao.quantization.convert(self, inplace=True)
+        logger.info(f"Quantized VGG19 feature extractor to int8 ({backend} engine, {len(calibration_images)} calibration images)")
+        return self
+
+    def script(self) -> "VGG19FeatureExtractor":
+        """
+        Compile the forward pass with TorchScript (in place), replacing the
+        per-layer Python dispatch with a single graph. Mainly useful on CPU,
+        where torch.compile is unavailable or disabled. Gradients still flow
+        to the input. Selecting new layers or quantizing reverts to eager.
 
-        return features
+        Returns:
+            The scripted extractor
+        """
+        flat_layers, positions = self._flatten()
+        self._scripted_layers = sorted(self.layers, key=positions.get)
+        output_indices = [positions[name] for name in self._scripted_layers]
+        trunk = _FeatureTrunk(flat_layers, output_indices)
+        self._scripted = torch.jit.script(trunk)
+        logger.info(f"Scripted VGG19 feature extractor with TorchScript ({len(trunk.layers)} layers)")
+        return self
 
     def get_layer_names(self) -> List[str]:
         """Get names of all available layers."""
@@ -129,12 +276,15 @@ class VGG19FeatureExtractor(nn.Module):
         if missing_layers:
             raise ValueError(f"Invalid layer names: {missing_layers}")
         self.layers = layers.copy()
+        self._scripted = None
+        self._build_plan()
 
     @staticmethod
     def gram_matrix(features: torch.Tensor) -> torch.Tensor:
         """
         Compute Gram matrix for style feature representation.
         Normalizes by the number of elements in each feature map (C*H*W).
+        Always accumulates in FP32, even for half-precision features.
 
         Args:
             features: Feature tensor (B x C x H x W)
@@ -143,10 +293,37 @@ class VGG19FeatureExtractor(nn.Module):
             Normalized Gram matrix (B x C x C)
         """
         batch_size, channels, height, width = features.size()
-        features_reshaped = features.view(batch_size, channels, -1)
-        gram = torch.bmm(features_reshaped, features_reshaped.transpose(1, 2))
+        # A view for both NCHW and channels_last features; the transpose is absorbed by the GEMM
+        features_reshaped = features.float().reshape(batch_size, channels, -1)
+        norm_factor = max(channels * height * width, 1)
+        with torch.autocast(device_type=features.device.type, enabled=False):
+            # Normalization is folded into the GEMM's alpha instead of a separate elementwise pass
+            return torch.baddbmm(
+                features_reshaped.new_empty(batch_size, channels, channels),
+                features_reshaped, features_reshaped.transpose(1, 2),
+                beta=0, alpha=1.0 / norm_factor
+            )
+
+    @staticmethod
+    def average_gram_matrix(features: torch.Tensor) -> torch.Tensor:
+        """
+        Compute the mean of the per-image normalized Gram matrices of a batch.
+        Concatenating the images along the spatial axis turns the sum of
+        per-image Gram matrices into a single matmul.
+
+        Args:
+            features: Feature tensor (B x C x H x W)
 
-        norm_factor = channels * height * width
-        if norm_factor > 0:
-            gram = gram / norm_factor
-        return gram
+        Returns:
+            Average normalized Gram matrix (1 x C x C)
+        """
+        batch_size, channels, height, width = features.size()
+        features_joined = features.float().transpose(0, 1).reshape(channels, batch_size * height * width)
+        norm_factor = max(batch_size * channels * height * width, 1)
+        with torch.autocast(device_type=features.device.type, enabled=False):
+            gram = torch.addmm(
+                features_joined.new_empty(channels, channels),
+                features_joined, features_joined.t(),
+                beta=0, alpha=1.0 / norm_factor
+            )
+        return gram.unsqueeze(0)
@@ -7,12 +7,152 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 from typing import Dict, List, Tuple, Optional
+from collections import OrderedDict
 from .feature_extractor import VGG19FeatureExtractor
+import contextlib
 import logging
+import threading
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
+PRECISION_DTYPES = {'fp32': None, 'fp16': torch.float16, 'bf16': torch.bfloat16}
+
+HISTORY_KEYS = ('content_loss', 'style_loss', 'tv_loss', 'total_loss')
+
+# Eager steps run before a batched optimization step is captured into a CUDA graph
+CUDA_GRAPH_WARMUP_STEPS = 3
+
+# Steps between host-side checks for non-finite gradients (each check is one device sync)
+NAN_CHECK_INTERVAL = 10
+
+@torch.jit.script
+def _squared_error(input_tensor: torch.Tensor, target: torch.Tensor) -> torch.Tensor:
+    """Mean squared error over all elements, in FP32, fused by TorchScript (one reduction, like F.mse_loss)."""
+    return (input_tensor.float() - target.float()).pow(2).mean()
+
+@torch.jit.script
+def _squared_error_per_image(input_tensor: torch.Tensor, target: torch.Tensor) -> torch.Tensor:
+    """Mean squared error for each image in the batch, in FP32, fused by TorchScript."""
+    # The upcasts fuse into the subtraction instead of materializing FP32 copies of half-precision features
+    return (input_tensor.float() - target.float()).pow(2).flatten(1).mean(1)
+
+@torch.jit.script
+def _tv_loss_per_image(image: torch.Tensor) -> torch.Tensor:
+    """Squared total variation loss for each image in the batch, fused by TorchScript."""
+    # Squared differences are smooth at zero, unlike abs, and fuse into the same pass as the subtraction;
+    # reducing over dims directly avoids the copy flatten would make of a channels_last difference
+    tv_h = torch.diff(image, dim=-2).square().mean(dim=[1, 2, 3])
+    tv_w = torch.diff(image, dim=-1).square().mean(dim=[1, 2, 3])
+    return tv_h + tv_w
+
+# Device types whose PyTorch build has no fused Adam kernel, so the fallback is logged once per type
+_UNFUSED_ADAM_DEVICES = set()
+
+def _make_adam(image: torch.Tensor, learning_rate: float, capturable: bool = False) -> optim.Adam:
+    """
+    Creates the Adam optimizer for an image being optimized.
+    The fused kernel performs the whole update in one launch instead of a chain of
+    elementwise ops; it is always available on CUDA and, from PyTorch 2.4, on CPU.
+    Inside a CUDA graph the step is replayed anyway, so the capturable (unfused)
+    variant is used there.
+    """
+    if capturable:
+        return optim.Adam([image], lr=learning_rate, capturable=True)
+    device_type = image.device.type
+    if device_type == "cuda":
+        return optim.Adam([image], lr=learning_rate, fused=True)
+    if device_type not in _UNFUSED_ADAM_DEVICES:
+        try:
+            return optim.Adam([image], lr=learning_rate, fused=True)
+        except (RuntimeError, TypeError) as e:
+            _UNFUSED_ADAM_DEVICES.add(device_type)
+            logger.info(f"Fused Adam unavailable on {device_type}, using the foreach implementation: {e}")
+    return optim.Adam([image], lr=learning_rate)
+
+def _append_history(history: Dict[str, List[float]], step_losses: List[torch.Tensor]) -> None:
+    """Copies buffered per-step losses (each ordered as HISTORY_KEYS) to the host in one transfer."""
+    if not step_losses:
+        return
+    for values in torch.stack(step_losses).cpu().tolist():
+        for key, value in zip(HISTORY_KEYS, values):
+            history[key].append(value)
+    step_losses.clear()
+
+class _CaptureGate:
+    """
+    Keeps other threads' device work out of a CUDA graph capture.
+    Ordinary device work runs inside shared() and never blocks other shared work;
+    a capture waits in exclusive() until that work has drained and holds new
+    work back until the capture is finished.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active = 0
+        self._capturing = False
+
+    @contextlib.contextmanager
+    def shared(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._capturing)
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._capturing)
+            # Set before draining, so a steady stream of shared work cannot starve the capture
+            self._capturing = True
+            self._condition.wait_for(lambda: self._active == 0)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._capturing = False
+                self._condition.notify_all()
+
+class _FiniteGradGuard:
+    """
+    Tracks whether an optimized image's gradients stayed finite without a device sync per step.
+    Each passing host-side check snapshots the image, so a failed check rolls back to the last verified state.
+    """
+
+    def __init__(self, image: torch.Tensor):
+        self.image = image
+        self.finite = torch.ones((), dtype=torch.bool, device=image.device)
+        self.snapshot = image.detach().clone()
+        self.good_steps = 0
+
+    def record(self):
+        """Folds the current gradient into the on-device finiteness flag."""
+        if self.image.grad is not None:
+            self.finite &= torch.isfinite(self.image.grad).all()
+
+    def check(self, steps: int) -> bool:
+        """
+        Reads the flag on the host.
+
+        Args:
+            steps: Number of optimizer steps applied to the image so far
+
+        Returns:
+            True if every recorded gradient was finite; otherwise restores the last snapshot and returns False
+        """
+        if not self.finite.item():
+            with torch.no_grad():
+                self.image.copy_(self.snapshot)
+            return False
+        self.snapshot.copy_(self.image.detach())
+        self.good_steps = steps
+        return True
+
 class StyleTransfer:
     """Neural style transfer implementation."""
 
@@ -23,7 +163,8 @@ class StyleTransfer:
         tv_weight: float = 1e-6,
         content_layers: Optional[List[str]] = None,
         style_layers: Optional[List[str]] = None,
-        device: Optional[torch.device] = None
+        device: Optional[torch.device] = None,
+        precision: str = "auto"
     ):
         """
         Initialize style transfer module.
@@ -35,6 +176,8 @@ class StyleTransfer:
             content_layers: Layers to use for content loss
             style_layers: Layers to use for style loss
             device: Torch device to use
+            precision: VGG compute precision: "fp32", "fp16", "bf16", or "auto"
+                       (bf16 on GPUs that support it, else fp16, on CUDA; fp32 otherwise)
         """
         self.content_weight = content_weight
         self.style_weight = style_weight
@@ -49,10 +192,54 @@ class StyleTransfer:
         self.device = device or torch.device(
             "cuda" if torch.cuda.is_available() else "cpu"
         )
+        if self.device.type == "cuda":
+            # TF32 runs the FP32 convolutions and Gram GEMMs on Ampere+ tensor cores (10-bit mantissa, FP32 range)
+            torch.set_float32_matmul_precision('high')
+            torch.backends.cuda.matmul.allow_tf32 = True
+            torch.backends.cudnn.allow_tf32 = True
+            # Let cuDNN autotune convolution algorithms for each new input shape
+            torch.backends.cudnn.benchmark = True
 
         all_layers = list(set(self.content_layers + self.style_layers))
         self.feature_extractor = VGG19FeatureExtractor(layers=all_layers).to(self.device)
 
+        # Run VGG in reduced precision under autocast; the optimized image stays FP32
+        if precision == "auto":
+            if self.device.type != "cuda":
+                precision = "fp32"
+            else:
+                # bf16 keeps FP32's exponent range, so it needs no GradScaler (whose step syncs with the host every iteration)
+                precision = "bf16" if torch.cuda.is_bf16_supported() else "fp16"
+        if precision not in PRECISION_DTYPES:
+            raise ValueError(f"Unsupported precision '{precision}'. Use one of: auto, {', '.join(PRECISION_DTYPES)}")
+        if precision == "fp16" and self.device.type != "cuda":
+            logger.warning("fp16 precision requires CUDA; falling back to fp32")
+            precision = "fp32"
+        self.amp_dtype = PRECISION_DTYPES[precision]
+        if self.amp_dtype is not None:
+            self.feature_extractor.to(self.amp_dtype)
+        if self.device.type == "cuda":
+            # NHWC lets cuDNN pick Tensor Core convolution kernels for the VGG forward/backward
+            self.feature_extractor.to(memory_format=torch.channels_last)
+        # The optimized image is kept in the extractor's layout so no step pays an NCHW<->NHWC copy
+        self._image_memory_format = torch.channels_last if self.device.type == "cuda" else torch.preserve_format
+
+        # Replay batched optimization steps from a captured CUDA graph (incompatible with torch.compile's reduce-overhead mode)
+        self.use_cuda_graphs = False
+        # Captured batched steps kept for reuse by later calls with the same shape and hyperparameters (0 disables)
+        self.graph_cache_size = 0
+        self._step_graphs: "OrderedDict[Tuple, Tuple]" = OrderedDict()
+        self._capture_gate = _CaptureGate()
+        self.compile_step(enabled=False)
+
+    def device_work(self):
+        """
+        Context manager for device work done outside the optimization (uploads,
+        resizes, Gram matrices, metrics) on other threads. It waits while a CUDA
+        graph is being captured, and a capture waits for it to finish.
+        """
+        return self._capture_gate.shared()
+
     def compute_content_loss(
         self,
         input_features: Dict[str, torch.Tensor],
@@ -70,10 +257,9 @@ class StyleTransfer:
         """
         content_loss = 0.0
         for layer in self.content_layers:
-            input_feat = input_features[layer]
-            target_feat = target_features[layer]
-
-            loss = torch.mean((input_feat - target_feat) ** 2)
+            # Squared differences of deep half-precision activations can exceed the fp16 range,
+            # so the error is computed in FP32; targets arrive detached from _extract_targets
+            loss = _squared_error(input_features[layer], target_features[layer])
             content_loss += loss
 
         return content_loss / len(self.content_layers)
@@ -89,7 +275,7 @@ class StyleTransfer:
 
         Args:
             input_features: Features from the current input image
-            target_avg_grams: Dictionary mapping style layer names to the pre-computed
+            target_avg_grams: Dictionary mapping style layer names to the pre-computed, detached
                               average (and normalized) Gram matrix from the style reference images.
 
         Returns:
@@ -97,18 +283,16 @@ class StyleTransfer:
         """
         style_loss = 0.0
         for layer in self.style_layers:
-            input_feat = input_features[layer]
-            target_gram = target_avg_grams[layer].detach()
-            input_gram = self.feature_extractor.gram_matrix(input_feat)
+            input_gram = self.feature_extractor.gram_matrix(input_features[layer])
 
-            loss = torch.mean((input_gram - target_gram) ** 2)
+            loss = _squared_error(input_gram, target_avg_grams[layer])
             style_loss += loss
 
         return style_loss / len(self.style_layers)
 
     def compute_tv_loss(self, image: torch.Tensor) -> torch.Tensor:
         """
-        Compute total variation loss for smoothness.
+        Compute the squared total variation loss for smoothness.
 
         Args:
             image: Input image tensor
@@ -116,34 +300,187 @@ class StyleTransfer:
         Returns:
             Total variation loss tensor
         """
-        tv_h = torch.mean(torch.abs(image[:, :, 1:, :] - image[:, :, :-1, :]))
-        tv_w = torch.mean(torch.abs(image[:, :, :, 1:] - image[:, :, :, :-1]))
-        return tv_h + tv_w
+        return _tv_loss_per_image(image).mean()
 
+    def _loss_terms(
+        self,
+        input_features: Dict[str, torch.Tensor],
+        input_image: torch.Tensor,
+        target_content_features: Dict[str, torch.Tensor],
+        target_avg_grams: Dict[str, torch.Tensor]
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """Unweighted content, style and TV losses of the optimized image (FP32 scalars)."""
+        return (
+            self.compute_content_loss(input_features, target_content_features).float(),
+            self.compute_style_loss(input_features, target_avg_grams).float(),
+            self.compute_tv_loss(input_image).float()
+        )
+
+    def _batch_loss_terms(
+        self,
+        input_features: Dict[str, torch.Tensor],
+        input_images: torch.Tensor,
+        target_content_features: Dict[str, torch.Tensor],
+        target_grams: Dict[str, torch.Tensor]
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """Unweighted content, style and TV losses of each image in the batch (FP32, one value per image)."""
+        content_loss = sum(
+            _squared_error_per_image(input_features[layer], target_content_features[layer])
+            for layer in self.content_layers
+        ) / len(self.content_layers)
+        style_loss = sum(
+            _squared_error_per_image(self.feature_extractor.gram_matrix(input_features[layer]), target_grams[layer])
+            for layer in self.style_layers
+        ) / len(self.style_layers)
+        return content_loss, style_loss, _tv_loss_per_image(input_images)
+
+    def _step_terms(
+        self,
+        input_image: torch.Tensor,
+        target_content_features: Dict[str, torch.Tensor],
+        target_avg_grams: Dict[str, torch.Tensor]
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """VGG forward of the optimized image followed by its unweighted loss terms."""
+        return self._loss_terms(self.feature_extractor(input_image), input_image, target_content_features, target_avg_grams)
+
+    def _batch_step_terms(
+        self,
+        input_images: torch.Tensor,
+        target_content_features: Dict[str, torch.Tensor],
+        target_grams: Dict[str, torch.Tensor]
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """VGG forward of the optimized batch followed by each image's unweighted loss terms."""
+        return self._batch_loss_terms(self.feature_extractor(input_images), input_images, target_content_features, target_grams)
+
+    def compile_step(self, enabled: bool = True, mode: str = "default") -> None:
+        """
+        Compile the per-step VGG forward and loss terms as one graph with
+        torch.compile, so Inductor fuses the Gram matrices, squared errors and
+        TV reductions with the last convolutions in both forward and backward,
+        and reduce-overhead mode replays the whole step from CUDA graphs. The
+        weighted sum stays eager, so changing loss weights between requests
+        never triggers a recompile.
+
+        Args:
+            enabled: False restores the eager step functions
+            mode: torch.compile mode
+        """
+        if enabled:
+            self._step_terms_fn = torch.compile(self._step_terms, mode=mode, dynamic=False)
+            self._batch_step_terms_fn = torch.compile(self._batch_step_terms, mode=mode, dynamic=False)
+        else:
+            self._step_terms_fn = self._step_terms
+            self._batch_step_terms_fn = self._batch_step_terms
+
+    @torch.no_grad()
     def _calculate_average_style_grams(self, style_images: List[torch.Tensor]) -> Dict[str, torch.Tensor]:
         """Calculates the average Gram matrix for each style layer across multiple style images."""
         if not style_images:
             raise ValueError("Style images list cannot be empty.")
 
-        num_style_images = len(style_images)
-        layer_grams: Dict[str, List[torch.Tensor]] = {layer: [] for layer in self.style_layers}
-
+        # One VGG forward per distinct size (usually just one); each group's average Gram is a single matmul per layer
+        groups: Dict[Tuple[int, ...], List[torch.Tensor]] = {}
         for style_image in style_images:
-            style_features = self.feature_extractor(style_image)
-            for layer in self.style_layers:
-                layer_features = style_features[layer]
-                gram = self.feature_extractor.gram_matrix(layer_features)
-                layer_grams[layer].append(gram.detach())
+            groups.setdefault(tuple(style_image.shape), []).append(style_image)
 
         avg_grams: Dict[str, torch.Tensor] = {}
-        for layer in self.style_layers:
-            if layer_grams[layer]:
-                avg_grams[layer] = torch.mean(torch.stack(layer_grams[layer], dim=0), dim=0)
-            else:
-                raise RuntimeError(f"Could not calculate average Gram matrix for layer {layer} - no style images processed?")
+        for images in groups.values():
+            batch_features = self.feature_extractor(torch.cat(images, dim=0))
+            weight = len(images) / len(style_images)
+            for layer in self.style_layers:
+                gram = self.feature_extractor.average_gram_matrix(batch_features[layer]).detach()
+                if weight != 1.0:
+                    gram = gram.mul_(weight)
+                avg_grams[layer] = gram if layer not in avg_grams else avg_grams[layer].add_(gram)
 
         return avg_grams
 
+    @torch.no_grad()
+    def _extract_targets(
+        self,
+        content_image: torch.Tensor,
+        style_images: List[torch.Tensor],
+        style_grams: Optional[Dict[str, torch.Tensor]] = None,
+        content_features: Optional[Dict[str, torch.Tensor]] = None
+    ) -> Tuple[Dict[str, torch.Tensor], Dict[str, torch.Tensor]]:
+        """
+        Computes the content target features and average style Gram matrices
+        once per transfer, outside the optimization loop and without autograd.
+        When the style images share the content image's shape, content and styles
+        go through VGG as a single batch instead of separate forward passes.
+        Pre-computed content features and/or Gram matrices skip their forward passes.
+        """
+        if content_features is not None:
+            target_content_features = {layer: content_features[layer].detach() for layer in self.content_layers}
+            target_avg_grams = self._detached_grams(style_grams) if style_grams is not None else self._calculate_average_style_grams(style_images)
+            return target_content_features, target_avg_grams
+
+        if style_grams is None and all(s.shape == content_image.shape for s in style_images):
+            batch_features = self.feature_extractor(torch.cat([content_image] + list(style_images), dim=0))
+            # Copied out of the batch: a [:1] view would keep every style image's activations alive for the whole optimization
+            target_content_features = {
+                layer: batch_features[layer][:1].clone()
+                for layer in self.content_layers
+            }
+            target_avg_grams = {
+                layer: self.feature_extractor.average_gram_matrix(batch_features[layer][1:]).detach()
+                for layer in self.style_layers
+            }
+            return target_content_features, target_avg_grams
+
+        content_features = self.feature_extractor(content_image)
+        target_content_features = {
+            layer: content_features[layer].detach()
+            for layer in self.content_layers
+        }
+        target_avg_grams = self._detached_grams(style_grams) if style_grams is not None else self._calculate_average_style_grams(style_images)
+        return target_content_features, target_avg_grams
+
+    def _detached_grams(self, style_grams: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        """Detaches caller-supplied Gram matrices once, so the loss terms never need to per step."""
+        return {layer: style_grams[layer].detach() for layer in self.style_layers}
+
+    def compute_style_grams(self, style_images: List[torch.Tensor]) -> Dict[str, torch.Tensor]:
+        """
+        Pre-compute the average style Gram matrices for reuse across transfers.
+
+        Args:
+            style_images: List of style image tensors
+
+        Returns:
+            Dictionary mapping style layer names to detached average Gram matrices
+        """
+        with torch.no_grad():
+            return self._calculate_average_style_grams(style_images)
+
+    def compute_image_style_grams(self, style_images: List[torch.Tensor]) -> List[Dict[str, torch.Tensor]]:
+        """
+        Pre-compute the Gram matrices of each style image individually.
+        Same-shaped images go through VGG as a single batch, one forward per distinct size.
+
+        Args:
+            style_images: List of style image tensors (1 x C x H x W)
+
+        Returns:
+            One dictionary per image mapping style layer names to detached Gram matrices (1 x C x C)
+        """
+        if not style_images:
+            return []
+        groups: Dict[Tuple[int, ...], List[int]] = {}
+        for index, style_image in enumerate(style_images):
+            groups.setdefault(tuple(style_image.shape), []).append(index)
+
+        image_grams: List[Dict[str, torch.Tensor]] = [{} for _ in style_images]
+        with torch.no_grad():
+            for indices in groups.values():
+                batch_features = self.feature_extractor(torch.cat([style_images[i] for i in indices], dim=0))
+                for layer in self.style_layers:
+                    # Per-image Gram matrices of the whole group in one batched matmul
+                    batch_grams = self.feature_extractor.gram_matrix(batch_features[layer]).detach()
+                    for position, index in enumerate(indices):
+                        image_grams[index][layer] = batch_grams[position:position + 1]
+        return image_grams
+
     def transfer_style(
         self,
         content_image: torch.Tensor,
@@ -153,11 +490,14 @@ class StyleTransfer:
         style_weight: Optional[float] = None,
         tv_weight: Optional[float] = None,
         learning_rate: float = 0.02,
-        callback = None
+        callback = None,
+        style_grams: Optional[Dict[str, torch.Tensor]] = None,
+        content_features: Optional[Dict[str, torch.Tensor]] = None
     ) -> Tuple[torch.Tensor, Dict[str, List[float]]]:
         """
         Perform style transfer optimization using multiple style references.
-        Uses Adam optimizer.
+        Uses Adam optimizer and always runs eagerly; CUDA graph capture and
+        replay live in transfer_style_batch, which the service uses.
 
         Args:
             content_image: Content image tensor
@@ -168,40 +508,45 @@ class StyleTransfer:
             tv_weight: Optional override for TV weight
             learning_rate: Learning rate for the Adam optimizer.
             callback: Optional callback function for progress updates
+            style_grams: Optional pre-computed average Gram matrices (see
+                         compute_style_grams); skips the style forward pass
+            content_features: Optional pre-computed content layer features of
+                              content_image; skips the content forward pass
 
         Returns:
             Tuple of (stylized image tensor, loss history dict)
         """
-        if not style_images:
+        if not style_images and style_grams is None:
              raise ValueError("Must provide at least one style image.")
 
         content_w = content_weight if content_weight is not None else self.content_weight
         style_w = style_weight if style_weight is not None else self.style_weight
         tv_w = tv_weight if tv_weight is not None else self.tv_weight
 
-        target_content_features = {
-            layer: self.feature_extractor(content_image)[layer].detach()
-            for layer in self.content_layers
-        }
-        target_avg_grams = self._calculate_average_style_grams(style_images)
-
-        input_image = content_image.clone().requires_grad_(True)
-
-        optimizer = optim.Adam([input_image], lr=learning_rate)
-        history = {
-            'content_loss': [], 'style_loss': [], 'tv_loss': [], 'total_loss': []
-        }
-
-        logger.info(f"Starting Adam Optimization - Steps: {num_steps}, LR: {learning_rate}")
-        logger.info(f"Initial Weights - Style: {style_w:.2e}, Content: {content_w:.2f}, TV: {tv_w:.2e}")
-
-        for i in range(num_steps):
-            optimizer.zero_grad()
+        target_content_features, target_avg_grams = self._extract_targets(
+            content_image, style_images, style_grams, content_features
+        )
 
-            input_features = self.feature_extractor(input_image)
-            content_loss = self.compute_content_loss(input_features, target_content_features)
-            style_loss = self.compute_style_loss(input_features, target_avg_grams)
-            tv_loss = self.compute_tv_loss(input_image)
+        # Detached so gradients flow only into the generated image, never back to the caller's tensor
+        input_image = content_image.detach().clone(memory_format=self._image_memory_format).requires_grad_(True)
+
+        optimizer = _make_adam(input_image, learning_rate)
+        # fp16 gradients of the heavily weighted style loss can underflow; bf16 has FP32's range and needs no scaling
+        scaler = torch.amp.GradScaler("cuda", enabled=self.amp_dtype == torch.float16 and self.device.type == "cuda")
+        history = {key: [] for key in HISTORY_KEYS}
+        # Losses stay on the device until read, avoiding four host syncs per step
+        step_losses: List[torch.Tensor] = []
+
+        def compute_losses() -> torch.Tensor:
+            """Forward and backward pass; returns the losses ordered as HISTORY_KEYS."""
+            with torch.autocast(
+                device_type=self.device.type,
+                dtype=self.amp_dtype or torch.float32,
+                enabled=self.amp_dtype is not None
+            ):
+                content_loss, style_loss, tv_loss = self._step_terms_fn(
+                    input_image, target_content_features, target_avg_grams
+                )
 
             total_loss = (
                 content_w * content_loss +
@@ -209,34 +554,60 @@ class StyleTransfer:
                 tv_w * tv_loss
             )
 
-            total_loss.backward()
+            scaler.scale(total_loss).backward()
+            return torch.stack([content_loss, style_loss, tv_loss, total_loss]).detach()
+
+        logger.info(f"Starting Adam Optimization - Steps: {num_steps}, LR: {learning_rate}")
+        logger.info(f"Initial Weights - Style: {style_w:.2e}, Content: {content_w:.2f}, TV: {tv_w:.2e}")
+
+        # Both eager and replayed steps are checked through the guard (created after a cached graph's inputs
+        # are refreshed, so its snapshot is this call's start); with loss scaling, overflowing steps are
+        # skipped by the scaler instead (which then lowers the scale), so no guard or snapshot is needed
+        nan_guard = None if scaler.is_enabled() else _FiniteGradGuard(input_image)
+        aborted = False
+
+        for i in range(num_steps):
+            optimizer.zero_grad(set_to_none=True)
+            losses = compute_losses()
 
-            if input_image.grad is not None and torch.isnan(input_image.grad).any():
-                logger.error(f"NaN gradient detected at step {i}. Stopping optimization.")
-                break 
+            if nan_guard is not None:
+                nan_guard.record()
+                if i > 0 and i % NAN_CHECK_INTERVAL == 0 and not nan_guard.check(i):
+                    logger.error(f"NaN gradient detected by step {i}. Restored step {nan_guard.good_steps} and stopping optimization.")
+                    aborted = True
+                    break
 
-            optimizer.step()
+            scaler.step(optimizer)
+            scaler.update()
 
             with torch.no_grad():
-                 input_image.clamp_(0, 1)
+                input_image.clamp_(0, 1)
 
-            history['content_loss'].append(content_loss.item())
-            history['style_loss'].append(style_loss.item())
-            history['tv_loss'].append(tv_loss.item())
-            history['total_loss'].append(total_loss.item())
+            step_losses.append(losses)
 
             if i % 25 == 0:
+                content_value, style_value, tv_value, total_value = losses.tolist()
                 logger.info(f"Step {i}/{num_steps} - "
-                            f"Total Loss: {total_loss.item():.4e}, "
-                            f"Content Loss: {content_loss.item():.4e} (W: {content_w}), "
-                            f"Style Loss: {style_loss.item():.4e} (W: {style_w}), "
-                            f"TV Loss: {tv_loss.item():.4e} (W: {tv_w})")
+                            f"Total Loss: {total_value:.4e}, "
+                            f"Content Loss: {content_value:.4e} (W: {content_w}), "
+                            f"Style Loss: {style_value:.4e} (W: {style_w}), "
+                            f"TV Loss: {tv_value:.4e} (W: {tv_w})")
 
             if callback:
+                _append_history(history, step_losses)
                 callback(i, input_image.detach(), history)
 
-        with torch.no_grad():
-            input_image.clamp_(0, 1)
+        if nan_guard is not None and not aborted and not nan_guard.check(num_steps):
+            logger.error(f"NaN gradient detected. Restored step {nan_guard.good_steps}.")
+            aborted = True
+
+        _append_history(history, step_losses)
+        # Every completed step already ends with a clamp; only a rollback to the unclamped start needs one here
+        if aborted:
+            for key in history:
+                del history[key][nan_guard.good_steps:]
+            with torch.no_grad():
+                input_image.clamp_(0, 1)
 
         final_steps = len(history['total_loss'])
         if final_steps < num_steps:
@@ -245,3 +616,198 @@ class StyleTransfer:
                 history[key].extend(nan_fill)
 
         return input_image.detach(), history
+
+    def transfer_style_batch(
+        self,
+        content_images: torch.Tensor,
+        style_grams: List[Dict[str, torch.Tensor]],
+        num_steps: int = 300,
+        content_weight: Optional[float] = None,
+        style_weight: Optional[float] = None,
+        tv_weight: Optional[float] = None,
+        learning_rate: float = 0.02
+    ) -> Tuple[torch.Tensor, List[Dict[str, List[float]]]]:
+        """
+        Optimize several independent images together, one VGG forward per step.
+        Losses are summed over the batch, so each image receives exactly the
+        gradient (and Adam update) it would get from transfer_style on its own.
+        With use_cuda_graphs on CUDA (and no fp16 loss scaling), the step is captured once and replayed;
+        up to graph_cache_size captured steps are kept, so a later call with the
+        same shape and hyperparameters replays from its first step. An entry is
+        taken out of the cache while a call replays it: a concurrent call with the
+        same key captures its own graph, and whichever finishes last keeps the slot.
+        Each entry pins the batch image, its Adam state, the content and style
+        targets and the graph's private memory pool on the GPU until evicted.
+
+        Args:
+            content_images: Batch of content image tensors (B x C x H x W) of one shape
+            style_grams: One dictionary of pre-computed average Gram matrices per image
+            num_steps: Number of optimization steps
+            content_weight: Optional override for content weight
+            style_weight: Optional override for style weight
+            tv_weight: Optional override for TV weight
+            learning_rate: Learning rate for the Adam optimizer.
+
+        Returns:
+            Tuple of (stylized image batch, per-image loss history dicts)
+        """
+        batch_size = content_images.size(0)
+        if len(style_grams) != batch_size:
+            raise ValueError("Must provide one set of style Gram matrices per content image.")
+
+        content_w = content_weight if content_weight is not None else self.content_weight
+        style_w = style_weight if style_weight is not None else self.style_weight
+        tv_w = tv_weight if tv_weight is not None else self.tv_weight
+
+        with torch.no_grad():
+            content_features = self.feature_extractor(content_images)
+        target_content_features = {
+            layer: content_features[layer].detach()
+            for layer in self.content_layers
+        }
+        target_grams = {
+            layer: torch.cat([grams[layer].detach() for grams in style_grams], dim=0)
+            for layer in self.style_layers
+        }
+
+        # fp16 gradients of the heavily weighted style loss can underflow, so fp16 batches are loss-scaled.
+        # The scaler's overflow check syncs with the host on every step, which a captured graph cannot do,
+        # so loss-scaled batches run eagerly; bf16 and fp32 need no scaling and keep graph replay.
+        scaler = torch.amp.GradScaler("cuda", enabled=self.amp_dtype == torch.float16 and self.device.type == "cuda")
+        use_graph = (
+            self.use_cuda_graphs and self.device.type == "cuda" and num_steps > CUDA_GRAPH_WARMUP_STEPS
+            and not scaler.is_enabled()
+        )
+        graph_key = (
+            tuple(content_images.shape), tuple(self.content_layers), tuple(self.style_layers),
+            content_w, style_w, tv_w, learning_rate
+        )
+        # Popped while in use, so concurrent calls never replay the same graph; a concurrent miss
+        # captures a second graph for the same key, and the earlier one is dropped when it is stored back
+        cached_graph = self._step_graphs.pop(graph_key, None) if use_graph else None
+        if cached_graph is not None:
+            # The captured graph reads and writes these exact tensors, so new inputs are copied into them
+            input_images, static_content_features, static_grams, optimizer, graph, static_losses = cached_graph
+            with torch.no_grad():
+                input_images.copy_(content_images)
+                for layer in self.content_layers:
+                    static_content_features[layer].copy_(target_content_features[layer])
+                for layer in self.style_layers:
+                    static_grams[layer].copy_(target_grams[layer])
+                for state in optimizer.state.values():
+                    for value in state.values():
+                        value.zero_()
+            target_content_features, target_grams = static_content_features, static_grams
+        else:
+            input_images = content_images.detach().clone(memory_format=self._image_memory_format).requires_grad_(True)
+            optimizer = _make_adam(input_images, learning_rate, capturable=use_graph)
+            graph = None
+            static_losses = None
+        step_losses: List[torch.Tensor] = []
+        # Both eager and replayed steps are checked through the guard (created after a cached graph's inputs
+        # are refreshed, so its snapshot is this call's start); with loss scaling, overflowing steps are
+        # skipped by the scaler instead (which then lowers the scale), so no guard or snapshot is needed
+        nan_guard = None if scaler.is_enabled() else _FiniteGradGuard(input_images)
+        aborted = False
+
+        def compute_losses() -> torch.Tensor:
+            """Forward and backward pass; returns per-image losses (B x 4) ordered as HISTORY_KEYS."""
+            with torch.autocast(
+                device_type=self.device.type,
+                dtype=self.amp_dtype or torch.float32,
+                enabled=self.amp_dtype is not None
+            ):
+                content_loss, style_loss, tv_loss = self._batch_step_terms_fn(
+                    input_images, target_content_features, target_grams
+                )
+
+            total_loss = content_w * content_loss + style_w * style_loss + tv_w * tv_loss
+            scaler.scale(total_loss.sum()).backward()
+            return torch.stack([content_loss, style_loss, tv_loss, total_loss], dim=1).detach()
+
+        logger.info(f"Starting batched Adam Optimization - Batch: {batch_size}, Steps: {num_steps}, LR: {learning_rate}, CUDA graph: {use_graph} (cached: {cached_graph is not None})")
+
+        # Warmup steps run eagerly on a side stream; the step is then captured once and replayed
+        side_stream = torch.cuda.Stream() if use_graph and graph is None else None
+        if side_stream is not None:
+            side_stream.wait_stream(torch.cuda.current_stream())
+
+        for i in range(num_steps):
+            if use_graph and graph is None and i == CUDA_GRAPH_WARMUP_STEPS:
+                torch.cuda.current_stream().wait_stream(side_stream)
+                graph = torch.cuda.CUDAGraph()
+                optimizer.zero_grad(set_to_none=True)
+                # thread_local: CUDA calls made by other threads cannot invalidate this capture; the gate
+                # additionally keeps the service's own device work off the GPU until it is finished
+                with self._capture_gate.exclusive(), torch.cuda.graph(graph, capture_error_mode="thread_local"):
+                    static_losses = compute_losses()
+                    optimizer.step()
+                    with torch.no_grad():
+                        input_images.clamp_(0, 1)
+
+            if graph is not None:
+                graph.replay()
+                losses = static_losses.clone()
+                # The replayed step has already applied its update, so it is checked after the fact:
+                # a failure rolls back to the last passing check, before the offending update
+                nan_guard.record()
+                step_losses.append(losses)
+                if (i + 1) % NAN_CHECK_INTERVAL == 0 and not nan_guard.check(i + 1):
+                    logger.error(f"NaN gradient detected by step {i + 1}. Restored step {nan_guard.good_steps} and stopping batched optimization.")
+                    aborted = True
+                    break
+            else:
+                with torch.cuda.stream(side_stream) if side_stream is not None else contextlib.nullcontext():
+                    optimizer.zero_grad(set_to_none=True)
+                    losses = compute_losses()
+
+                    if nan_guard is not None:
+                        nan_guard.record()
+                        if i > 0 and i % NAN_CHECK_INTERVAL == 0 and not nan_guard.check(i):
+                            logger.error(f"NaN gradient detected by step {i}. Restored step {nan_guard.good_steps} and stopping batched optimization.")
+                            aborted = True
+                            break
+
+                    scaler.step(optimizer)
+                    scaler.update()
+
+                    with torch.no_grad():
+                        input_images.clamp_(0, 1)
+
+                step_losses.append(losses)
+
+            if i % 25 == 0:
+                logger.info(f"Step {i}/{num_steps} - Mean Total Loss: {losses[:, 3].mean().item():.4e}")
+
+        if side_stream is not None:
+            torch.cuda.current_stream().wait_stream(side_stream)
+
+        if nan_guard is not None and not aborted and not nan_guard.check(num_steps):
+            logger.error(f"NaN gradient detected. Restored step {nan_guard.good_steps}.")
+            aborted = True
+        # Every completed step already ends with a clamp; only a rollback to the unclamped start needs one here
+        if aborted:
+            del step_losses[nan_guard.good_steps:]
+            with torch.no_grad():
+                input_images.clamp_(0, 1)
+
+        histories: List[Dict[str, List[float]]] = [{key: [] for key in HISTORY_KEYS} for _ in range(batch_size)]
+        if step_losses:
+            # (steps x batch x 4) -> one history per image
+            for image_index, image_losses in enumerate(torch.stack(step_losses, dim=1).cpu()):
+                _append_history(histories[image_index], list(image_losses))
+        for history in histories:
+            final_steps = len(history['total_loss'])
+            if final_steps < num_steps:
+                nan_fill = [np.nan] * (num_steps - final_steps)
+                for key in history:
+                    history[key].extend(nan_fill)
+
+        if graph is not None and self.graph_cache_size > 0:
+            self._step_graphs[graph_key] = (input_images, target_content_features, target_grams, optimizer, graph, static_losses)
+            while len(self._step_graphs) > self.graph_cache_size:
+                self._step_graphs.popitem(last=False)
+            # The next call with this key overwrites the static image in place
+            return input_images.detach().clone(), histories
+
+        return input_images.detach(), histories
@@ -0,0 +1,187 @@
+"""
+Feed-forward style transfer network (Johnson et al., 2016).
+A single forward pass replaces the iterative VGG optimization for pre-trained styles.
+"""
+
+import torch
+import torch.nn as nn
+from pathlib import Path
+from typing import Optional, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ConvLayer(nn.Module):
+    """Reflection-padded convolution."""
+
+    def __init__(self, in_channels: int, out_channels: int, kernel_size: int, stride: int):
+        super().__init__()
+        self.reflection_pad = nn.ReflectionPad2d(kernel_size // 2)
+        self.conv2d = nn.Conv2d(in_channels, out_channels, kernel_size, stride)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.conv2d(self.reflection_pad(x))
+
+class ResidualBlock(nn.Module):
+    """Residual block with instance normalization."""
+
+    def __init__(self, channels: int):
+        super().__init__()
+        self.conv1 = ConvLayer(channels, channels, kernel_size=3, stride=1)
+        self.in1 = nn.InstanceNorm2d(channels, affine=True)
+        self.conv2 = ConvLayer(channels, channels, kernel_size=3, stride=1)
+        self.in2 = nn.InstanceNorm2d(channels, affine=True)
+        self.relu = nn.ReLU()
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        residual = x
+        out = self.relu(self.in1(self.conv1(x)))
+        out = self.in2(self.conv2(out))
+        return out + residual
+
+class UpsampleConvLayer(nn.Module):
+    """Nearest-neighbour upsampling followed by a convolution (avoids checkerboard artifacts)."""
+
+    def __init__(self, in_channels: int, out_channels: int, kernel_size: int, stride: int, upsample: Optional[int] = None):
+        super().__init__()
+        self.upsample = upsample
+        self.reflection_pad = nn.ReflectionPad2d(kernel_size // 2)
+        self.conv2d = nn.Conv2d(in_channels, out_channels, kernel_size, stride)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        if self.upsample:
+            x = nn.functional.interpolate(x, mode='nearest', scale_factor=self.upsample)
+        return self.conv2d(self.reflection_pad(x))
+
+class TransformerNet(nn.Module):
+    """
+    Image transformation network trained for a single style.
+
+    Layer names match the PyTorch fast-neural-style example so its
+    state dicts can be loaded directly. Inputs and outputs are RGB
+    tensors in the 0-255 range (B x 3 x H x W).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.conv1 = ConvLayer(3, 32, kernel_size=9, stride=1)
+        self.in1 = nn.InstanceNorm2d(32, affine=True)
+        self.conv2 = ConvLayer(32, 64, kernel_size=3, stride=2)
+        self.in2 = nn.InstanceNorm2d(64, affine=True)
+        self.conv3 = ConvLayer(64, 128, kernel_size=3, stride=2)
+        self.in3 = nn.InstanceNorm2d(128, affine=True)
+        self.res1 = ResidualBlock(128)
+        self.res2 = ResidualBlock(128)
+        self.res3 = ResidualBlock(128)
+        self.res4 = ResidualBlock(128)
+        self.res5 = ResidualBlock(128)
+        self.deconv1 = UpsampleConvLayer(128, 64, kernel_size=3, stride=1, upsample=2)
+        self.in4 = nn.InstanceNorm2d(64, affine=True)
+        self.deconv2 = UpsampleConvLayer(64, 32, kernel_size=3, stride=1, upsample=2)
+        self.in5 = nn.InstanceNorm2d(32, affine=True)
+        self.deconv3 = ConvLayer(32, 3, kernel_size=9, stride=1)
+        self.relu = nn.ReLU()
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        """
+        Stylize a batch of images.
+
+        Args:
+            x: Input tensor (B x 3 x H x W) in the 0-255 range
+
+        Returns:
+            Stylized tensor (B x 3 x H x W) in the 0-255 range (unclamped)
+        """
+        y = self.relu(self.in1(self.conv1(x)))
+        y = self.relu(self.in2(self.conv2(y)))
+        y = self.relu(self.in3(self.conv3(y)))
+        y = self.res1(y)
+        y = self.res2(y)
+        y = self.res3(y)
+        y = self.res4(y)
+        y = self.res5(y)
+        y = self.relu(self.in4(self.deconv1(y)))
+        y = self.relu(self.in5(self.deconv2(y)))
+        return self.deconv3(y)
+
+    @classmethod
+    def from_checkpoint(cls, path: Union[str, Path], device: torch.device) -> "TransformerNet":
+        """
+        Load a pre-trained network from a saved state dict.
+
+        Args:
+            path: Path to the .pt/.pth state dict
+            device: Torch device to place the network on
+
+        Returns:
+            TransformerNet in eval mode with gradients disabled
+        """
+        model = cls()
+        state_dict = torch.load(path, map_location=device)
+        # Checkpoints saved with older PyTorch versions carry deprecated InstanceNorm running stats
+        for key in [k for k in state_dict if k.endswith(('running_mean', 'running_var'))]:
+            del state_dict[key]
+        model.load_state_dict(state_dict)
+        for param in model.parameters():
+            param.requires_grad = False
+        logger.info(f"Loaded TransformerNet weights from {path}")
+        return model.to(device).eval()
+
+    def export_onnx(self, path: Union[str, Path], image_size: int = 512, opset_version: int = 17) -> None:
+        """
+        Export the network to ONNX with dynamic batch and spatial dimensions.
+
+        Args:
+            path: Output .onnx path
+            image_size: Spatial size of the dummy input used for tracing
+            opset_version: ONNX opset to target
+        """
+        device = next(self.parameters()).device
+        dummy = torch.zeros(1, 3, image_size, image_size, device=device)
+        dynamic_axes = {'input': {0: 'batch', 2: 'height', 3: 'width'},
+                        'output': {0: 'batch', 2: 'height', 3: 'width'}}
+        torch.onnx.export(
+            self.eval(), dummy, str(path),
+            input_names=['input'], output_names=['output'],
+            dynamic_axes=dynamic_axes, opset_version=opset_version
+        )
+        logger.info(f"Exported TransformerNet to {path}")
+
+class OnnxTransformerNet:
+    """TransformerNet executed through ONNX Runtime with full graph optimizations."""
+
+    def __init__(self, path: Union[str, Path], device: torch.device):
+        """
+        Create an inference session for an exported TransformerNet.
+
+        Args:
+            path: Path to the .onnx model
+            device: Torch device; CUDA enables the CUDA execution provider when available
+
+        Raises:
+            ImportError: If onnxruntime is not installed
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        providers = ["CPUExecutionProvider"]
+        if device.type == "cuda" and "CUDAExecutionProvider" in ort.get_available_providers():
+            providers.insert(0, "CUDAExecutionProvider")
+
+        self.session = ort.InferenceSession(str(path), sess_options=options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+        logger.info(f"Loaded ONNX TransformerNet from {path} (providers: {self.session.get_providers()})")
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        """
+        Stylize a batch of images.
+
+        Args:
+            x: Input tensor (B x 3 x H x W) in the 0-255 range
+
+        Returns:
+            Stylized CPU tensor (B x 3 x H x W) in the 0-255 range (unclamped)
+        """
+        inputs = {self.input_name: x.detach().float().cpu().contiguous().numpy()}
+        return torch.from_numpy(self.session.run(None, inputs)[0])
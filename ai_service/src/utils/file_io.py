@@ -0,0 +1,85 @@
+"""
+File I/O helpers for the AI service.
+Handles non-blocking persistence of uploaded files.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, Union
+
+import aiofiles
+from fastapi import UploadFile
+
+# 1 MiB keeps read/write syscalls per multi-MB upload low versus the 16 KiB shutil default
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Uploads up to this size are kept in memory instead of being written to disk
+IN_MEMORY_UPLOAD_LIMIT = 8 * 1024 * 1024
+
+SHM_DIR = Path("/dev/shm")
+
+
+def default_temp_root() -> Path:
+    """
+    Return the root directory for short-lived service files.
+
+    Prefers the RAM-backed tmpfs at /dev/shm (Linux) so intermediate files
+    never hit disk, falling back to the platform temp directory elsewhere.
+
+    Returns:
+        Path to the temp root (not created)
+    """
+    if SHM_DIR.is_dir() and os.access(SHM_DIR, os.W_OK):
+        return SHM_DIR / "postcard_ai"
+    return Path(tempfile.gettempdir()) / "postcard_ai"
+
+
+async def save_upload_file(upload_file: UploadFile, destination: Path, chunk_size: int = UPLOAD_CHUNK_SIZE) -> None:
+    """
+    Stream an uploaded file to disk in chunks without blocking the event loop.
+    The whole copy runs on one worker thread, instead of two thread hops
+    (read, then write) per chunk.
+
+    Args:
+        upload_file: Uploaded file received by a FastAPI endpoint
+        destination: Path to write the file contents to
+        chunk_size: Number of bytes read and written per iteration
+    """
+    await asyncio.to_thread(_copy_file_object, upload_file.file, destination, chunk_size)
+
+
+def _copy_file_object(source: BinaryIO, destination: Path, chunk_size: int) -> None:
+    """Copy a file object to destination with a bounded buffer."""
+    with open(destination, "wb") as f:
+        shutil.copyfileobj(source, f, chunk_size)
+
+
+async def buffer_upload_file(
+    upload_file: UploadFile,
+    spill_path: Path,
+    limit: int = IN_MEMORY_UPLOAD_LIMIT
+) -> Union[BytesIO, Path]:
+    """
+    Read an uploaded file into memory, spilling to disk only when it is large.
+
+    Args:
+        upload_file: Uploaded file received by a FastAPI endpoint
+        spill_path: Path used when the upload exceeds the in-memory limit
+        limit: Maximum number of bytes kept in memory
+
+    Returns:
+        A BytesIO buffer for small uploads, otherwise spill_path
+    """
+    head = await upload_file.read(limit + 1)
+    if len(head) <= limit:
+        return BytesIO(head)
+
+    async with aiofiles.open(spill_path, "wb") as f:
+        await f.write(head)
+        while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
+            await f.write(chunk)
+    return spill_path
@@ -16,11 +16,13 @@ def unsharp_mask(image_array: np.ndarray, kernel_size=(5, 5), sigma=1.0, amount=
     if original_type != np.float32 and original_type != np.float64:
         image_float = image_array.astype(np.float32)
     else:
-        image_float = image_array.copy()
+        # Only read from below, so float input needs no defensive copy
+        image_float = image_array
 
     blurred = cv2.GaussianBlur(image_float, kernel_size, sigma)
-    sharpened = float(amount + 1) * image_float - float(amount) * blurred
-    sharpened = np.clip(sharpened, 0, 255)
+    # One fused pass instead of two scaled temporaries and a subtraction
+    sharpened = cv2.addWeighted(image_float, float(amount + 1), blurred, -float(amount), 0)
+    np.clip(sharpened, 0, 255, out=sharpened)
 
     if threshold > 0:
         diff = np.abs(image_float - blurred)
@@ -62,3 +64,13 @@ def adjust_saturation(pil_image: Image.Image, factor: float) -> Image.Image:
     """
     enhancer = ImageEnhance.Color(pil_image)
     return enhancer.enhance(factor)
+
+def adjust_saturation_array(image_array: np.ndarray, factor: float) -> np.ndarray:
+    """
+    Adjust the color saturation of a BGR uint8 NumPy array.
+    Same blend as adjust_saturation (towards the image's luma), but without a PIL round trip.
+    """
+    if image_array.ndim != 3 or image_array.shape[2] != 3:
+        return image_array
+    gray = cv2.cvtColor(cv2.cvtColor(image_array, cv2.COLOR_BGR2GRAY), cv2.COLOR_GRAY2BGR)
+    return cv2.addWeighted(image_array, factor, gray, 1.0 - factor, 0)
@@ -6,59 +6,214 @@ Handles image loading, preprocessing, and basic transformations.
 import torch
 import torchvision.transforms as transforms
 from PIL import Image
-from typing import Tuple, Optional
+from io import BytesIO
+from pathlib import Path
+from typing import Tuple, Optional, Union, BinaryIO
 import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    _TURBO_JPEG = TurboJPEG()
+except Exception:  # PyTurboJPEG or the libjpeg-turbo shared library is unavailable
+    _TURBO_JPEG = None
+
+ImageSource = Union[str, Path, BinaryIO]
+
+JPEG_MAGIC = b'\xff\xd8\xff'
+PNG_MAGIC = b'\x89PNG\r\n\x1a\n'
+
+# Bytes needed to recognize every supported format (RIFF....WEBP is the longest)
+IMAGE_SIGNATURE_LENGTH = 12
+
+
+def is_image_data(head: bytes) -> bool:
+    """
+    Check whether encoded data starts with a JPEG, PNG, WebP or GIF signature.
+
+    Args:
+        head: At least the first IMAGE_SIGNATURE_LENGTH bytes of the data
+
+    Returns:
+        True if the data looks like a supported image
+    """
+    return (
+        head.startswith(JPEG_MAGIC)
+        or head.startswith(PNG_MAGIC)
+        or (head[:4] == b'RIFF' and head[8:12] == b'WEBP')
+        or head[:6] in (b'GIF87a', b'GIF89a')
+    )
+
 
 class ImageProcessor:
     """Handles image processing operations for the style transfer pipeline."""
 
-    def __init__(self, max_image_size: int = 1024):
+    def __init__(self, max_image_size: int = 1024, decoder: str = "turbojpeg"):
+        """
+        Args:
+            max_image_size: Default maximum length of the longer image side
+            decoder: JPEG decoder: "turbojpeg" (libjpeg-turbo via PyTurboJPEG, falling
+                     back to Pillow when unavailable) or "pillow" (also covers Pillow-SIMD,
+                     which is a drop-in replacement)
+        """
+        if decoder not in ("turbojpeg", "pillow"):
+            raise ValueError(f"Unsupported image decoder '{decoder}'. Use 'turbojpeg' or 'pillow'.")
         self.max_image_size = max_image_size
+        self.decoder = decoder
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-        self.preprocess = transforms.Compose([
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                              std=[0.229, 0.224, 0.225])
-        ])
+        # Tensors stay raw RGB in [0, 1]: VGG19FeatureExtractor folds the ImageNet
+        # normalization into its first convolution
+        self.preprocess = transforms.ToTensor()
 
-        self.postprocess = transforms.Compose([
-            transforms.Lambda(lambda x: x.mul(torch.tensor([0.229, 0.224, 0.225])
-                                           .view(-1, 1, 1).to(x.device))),
-            transforms.Lambda(lambda x: x.add(torch.tensor([0.485, 0.456, 0.406])
-                                           .view(-1, 1, 1).to(x.device))),
-            transforms.Lambda(lambda x: torch.clamp(x, 0, 1))
-        ])
+        self.postprocess = transforms.Lambda(lambda x: torch.clamp(x, 0, 1))
 
-    def load_image(self, image_path: str) -> Tuple[Image.Image, torch.Tensor]:
+    def load_image(self, image_path: ImageSource, max_side: Optional[int] = None) -> Tuple[Image.Image, torch.Tensor]:
         """
         Load and preprocess an image for the neural network.
+        The longer side is always capped before tensor conversion, since VGG
+        cost grows with the pixel count.
 
         Args:
-            image_path: Path to the image file
+            image_path: Path to the image file, or an in-memory binary buffer
+            max_side: Maximum length of the longer side (defaults to max_image_size)
 
         Returns:
-            Tuple of (original PIL Image, preprocessed tensor)
+            Tuple of (resized PIL Image, preprocessed tensor)
         """
-        image = Image.open(image_path).convert('RGB')
-        image = self._resize_image(image)
-        tensor = self.preprocess(image).unsqueeze(0).to(self.device)
+        image = self.load_pil(image_path, max_side)
+        tensor = self.to_device(self.preprocess(image).unsqueeze(0))
         return image, tensor
 
-    def _resize_image(self, image: Image.Image) -> Image.Image:
+    def load_pil(self, image_path: ImageSource, max_side: Optional[int] = None) -> Image.Image:
+        """
+        Decode an image to RGB with its longer side capped, without tensor conversion.
+
+        Args:
+            image_path: Path to the image file, or an in-memory binary buffer
+            max_side: Maximum length of the longer side (defaults to max_image_size)
+
+        Returns:
+            Resized RGB PIL Image
+        """
+        max_side = max_side or self.max_image_size
+        image = self.open_image(image_path, max_side)
+        return self._resize_image(image, max_side)
+
+    def to_device(self, tensor: torch.Tensor, device: Optional[torch.device] = None) -> torch.Tensor:
+        """
+        Copy a CPU tensor to the device without stalling the host.
+        CUDA copies are only asynchronous from page-locked memory, so the
+        tensor is pinned first; the copy is ordered on the current stream.
+
+        Args:
+            tensor: CPU tensor to transfer
+            device: Target device (defaults to the processor's device)
+
+        Returns:
+            Tensor on the target device
+        """
+        device = device or self.device
+        if device.type == "cuda" and not tensor.is_cuda:
+            return tensor.pin_memory().to(device, non_blocking=True)
+        return tensor.to(device)
+
+    def open_image(
+        self,
+        image_path: ImageSource,
+        min_side: Optional[int] = None,
+        min_size: Optional[Tuple[int, int]] = None
+    ) -> Image.Image:
+        """
+        Read and decode an image to RGB without resizing it.
+
+        Args:
+            image_path: Path to the image file, or an in-memory binary buffer
+            min_side: Longer side the caller still needs; large JPEGs may be
+                      decoded at a reduced scale that keeps at least this size
+            min_size: (width, height) the caller will resize to regardless of
+                      aspect ratio; the reduced scale then covers both dimensions
+
+        Returns:
+            RGB PIL Image
+        """
+        if hasattr(image_path, 'seek'):
+            image_path.seek(0)
+            data = image_path.read()
+        else:
+            data = Path(image_path).read_bytes()
+        return self._decode_image(data, min_side, min_size)
+
+    @staticmethod
+    def _select_scaling_factor(
+        width: int,
+        height: int,
+        target_width: int,
+        target_height: int,
+        scaling_factors
+    ) -> Optional[Tuple[int, int]]:
+        """Smallest (num, den) DCT scaling factor whose output still covers the target in both dimensions."""
+        for num, den in sorted(scaling_factors, key=lambda f: f[0] / f[1]):
+            if width * num / den >= target_width and height * num / den >= target_height:
+                return (num, den)
+        return None
+
+    def _decode_image(
+        self,
+        data: bytes,
+        max_side: Optional[int] = None,
+        min_size: Optional[Tuple[int, int]] = None
+    ) -> Image.Image:
+        """
+        Decode encoded image bytes to an RGB PIL Image.
+        JPEGs go through libjpeg-turbo when available, using its DCT scaling to
+        skip full-resolution decoding of images far larger than needed.
+
+        Args:
+            data: Encoded image bytes
+            max_side: Target length of the longer side (defaults to max_image_size)
+            min_size: Target (width, height) both decoded dimensions must cover; overrides max_side
+
+        Returns:
+            RGB PIL Image
+        """
+        if self.decoder == "turbojpeg" and _TURBO_JPEG is not None and data[:3] == JPEG_MAGIC:
+            try:
+                width, height, _, _ = _TURBO_JPEG.decode_header(data)
+                if min_size is not None:
+                    target_width, target_height = min_size
+                else:
+                    # Only the longer side is constrained: the caller keeps the aspect ratio
+                    side = max_side or self.max_image_size
+                    target_width, target_height = (side, 0) if width >= height else (0, side)
+                scaling_factor = self._select_scaling_factor(
+                    width, height, target_width, target_height, _TURBO_JPEG.scaling_factors
+                )
+                array = _TURBO_JPEG.decode(data, pixel_format=TJPF_RGB, scaling_factor=scaling_factor)
+                return Image.fromarray(array)
+            except Exception as e:
+                logger.warning(f"libjpeg-turbo decode failed, falling back to Pillow: {e}")
+        return Image.open(BytesIO(data)).convert('RGB')
+
+    def _resize_image(self, image: Image.Image, max_side: Optional[int] = None) -> Image.Image:
         """
         Resize image while maintaining aspect ratio.
 
         Args:
             image: PIL Image to resize
+            max_side: Maximum length of the longer side (defaults to max_image_size)
 
         Returns:
             Resized PIL Image
         """
-        if max(image.size) > self.max_image_size:
-            ratio = self.max_image_size / max(image.size)
-            new_size = tuple(int(dim * ratio) for dim in image.size)
-            image = image.resize(new_size, Image.Resampling.LANCZOS)
+        max_side = max_side or self.max_image_size
+        if max(image.size) > max_side:
+            ratio = max_side / max(image.size)
+            new_size = tuple(max(1, int(dim * ratio)) for dim in image.size)
+            # reducing_gap shrinks by an integer factor first, so LANCZOS only filters the last step
+            image = image.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
         return image
 
     def tensor_to_image(self, tensor: torch.Tensor) -> Image.Image:
@@ -74,21 +229,22 @@ class ImageProcessor:
         if tensor.dim() == 4:
             tensor = tensor.squeeze(0)
 
-        tensor = self.postprocess(tensor)
-        tensor = tensor.cpu().detach()
-        tensor = tensor.mul(255).clamp(0, 255).byte()
-        return Image.fromarray(tensor.permute(1, 2, 0).numpy())
+        # Quantize on the tensor's device so only uint8 HWC bytes cross to the host
+        tensor = self.postprocess(tensor.detach())
+        tensor = tensor.mul_(255).clamp_(0, 255).to(torch.uint8)
+        return Image.fromarray(tensor.permute(1, 2, 0).contiguous().cpu().numpy())
 
-    def save_image(self, image: Image.Image, path: str, quality: int = 95) -> None:
+    def save_image(self, image: Image.Image, path: str, quality: int = 90) -> None:
         """
         Save image with specified quality.
+        Encodes in a single baseline pass (no Huffman optimization pass).
 
         Args:
             image: PIL Image to save
             path: Output path
             quality: JPEG quality (1-100)
         """
-        image.save(path, 'JPEG', quality=quality, optimize=True)
+        image.save(path, 'JPEG', quality=quality, optimize=False, progressive=False)
 
     def prepare_batch(self, images: list) -> torch.Tensor:
         """
@@ -105,4 +261,4 @@ class ImageProcessor:
             img = self._resize_image(img)
             tensor = self.preprocess(img).unsqueeze(0)
             tensors.append(tensor)
-        return torch.cat(tensors, 0).to(self.device)
+        return self.to_device(torch.cat(tensors, 0))
@@ -14,6 +14,9 @@ from .image_processing import ImageProcessor
 
 logger = logging.getLogger(__name__)
 
+# Side length of the SSIM averaging window
+SSIM_WINDOW_SIZE = 11
+
 class QualityMetrics:
     """Quality assessment tools for style transfer."""
 
@@ -47,21 +50,45 @@ class QualityMetrics:
         original_y = 0.299 * original[:, 0] + 0.587 * original[:, 1] + 0.114 * original[:, 2]
         transformed_y = 0.299 * transformed[:, 0] + 0.587 * transformed[:, 1] + 0.114 * transformed[:, 2]
 
-        c1 = (0.01 * 255) ** 2
-        c2 = (0.03 * 255) ** 2
+        # Stabilizers for a data range of 1: images are RGB in [0, 1]
+        c1 = 0.01 ** 2
+        c2 = 0.03 ** 2
 
-        mu_x = F.avg_pool2d(original_y, kernel_size=11, stride=1, padding=5)
-        mu_y = F.avg_pool2d(transformed_y, kernel_size=11, stride=1, padding=5)
+        # All five local means in one pair of depthwise passes instead of five 2D pooling windows
+        moments = torch.stack([
+            original_y, transformed_y, original_y ** 2, transformed_y ** 2, original_y * transformed_y
+        ], dim=1)
+        mu_x, mu_y, e_xx, e_yy, e_xy = self._box_filter(moments, SSIM_WINDOW_SIZE).unbind(dim=1)
 
-        sigma_x = F.avg_pool2d(original_y ** 2, kernel_size=11, stride=1, padding=5) - mu_x ** 2
-        sigma_y = F.avg_pool2d(transformed_y ** 2, kernel_size=11, stride=1, padding=5) - mu_y ** 2
-        sigma_xy = F.avg_pool2d(original_y * transformed_y, kernel_size=11, stride=1, padding=5) - mu_x * mu_y
+        sigma_x = e_xx - mu_x ** 2
+        sigma_y = e_yy - mu_y ** 2
+        sigma_xy = e_xy - mu_x * mu_y
 
         ssim = ((2 * mu_x * mu_y + c1) * (2 * sigma_xy + c2)) / \
                ((mu_x ** 2 + mu_y ** 2 + c1) * (sigma_x + sigma_y + c2))
 
         return ssim.mean().item()
 
+    @staticmethod
+    def _box_filter(x: torch.Tensor, window_size: int) -> torch.Tensor:
+        """
+        Local mean over a square window, as a horizontal then a vertical 1D pass
+        (2k instead of k^2 multiply-adds per pixel). Zero padding keeps the
+        output size and matches avg_pool2d with count_include_pad.
+
+        Args:
+            x: Tensor (B x C x H x W); each channel is filtered independently
+            window_size: Odd side length of the averaging window
+
+        Returns:
+            Filtered tensor (B x C x H x W)
+        """
+        channels = x.size(1)
+        padding = window_size // 2
+        kernel = torch.full((channels, 1, 1, window_size), 1.0 / window_size, device=x.device, dtype=x.dtype)
+        x = F.conv2d(x, kernel, padding=(0, padding), groups=channels)
+        return F.conv2d(x, kernel.transpose(2, 3), padding=(padding, 0), groups=channels)
+
     def compute_style_consistency(
         self,
         style: torch.Tensor,
@@ -79,24 +106,76 @@ class QualityMetrics:
         Returns:
             Style consistency score (0-1)
         """
-        style_features = feature_extractor(style)
-        transformed_features = feature_extractor(transformed)
+        transformed_grams = self._selected_grams(feature_extractor(transformed), feature_extractor)
+        style_grams = self._selected_grams(feature_extractor(style), feature_extractor)
+        return self._gram_consistencies(style_grams, transformed_grams)[0]
 
-        consistency_scores = []
-        for layer in feature_extractor.get_selected_layers():
-            style_gram = feature_extractor.gram_matrix(style_features[layer])
-            transformed_gram = feature_extractor.gram_matrix(transformed_features[layer])
+    def compute_style_consistencies(
+        self,
+        styles: List[torch.Tensor],
+        transformed: torch.Tensor,
+        feature_extractor
+    ) -> List[float]:
+        """
+        Compute style consistency of the transformed image against each style image.
+        Style images of equal size share one batched VGG forward, and the
+        transformed image's features and Gram matrices are computed only once.
 
-            style_norm = torch.norm(style_gram)
-            transformed_norm = torch.norm(transformed_gram)
+        Args:
+            styles: Style image tensors (1 x C x H x W each)
+            transformed: Transformed image tensor
+            feature_extractor: VGG feature extractor
 
-            if style_norm > 0 and transformed_norm > 0:
-                similarity = torch.sum(style_gram * transformed_gram) / (style_norm * transformed_norm)
-                consistency_scores.append(similarity.item())
+        Returns:
+            Style consistency score (0-1) for each style image
+        """
+        transformed_grams = self._selected_grams(feature_extractor(transformed), feature_extractor)
+
+        groups: Dict[Tuple[int, ...], List[int]] = {}
+        for index, style in enumerate(styles):
+            groups.setdefault(tuple(style.shape), []).append(index)
+
+        consistencies = [0.0] * len(styles)
+        for indices in groups.values():
+            batch_features = feature_extractor(torch.cat([styles[i] for i in indices], dim=0))
+            style_grams = self._selected_grams(batch_features, feature_extractor)
+            for index, consistency in zip(indices, self._gram_consistencies(style_grams, transformed_grams)):
+                consistencies[index] = consistency
+        return consistencies
+
+    @staticmethod
+    def _selected_grams(features: Dict[str, torch.Tensor], feature_extractor) -> Dict[str, torch.Tensor]:
+        """Gram matrices (B x C x C) of the extractor's selected layers."""
+        return {
+            layer: feature_extractor.gram_matrix(features[layer])
+            for layer in feature_extractor.get_selected_layers()
+        }
 
-        if not consistency_scores:
-            return 0.0
-        return np.mean(consistency_scores)
+    @staticmethod
+    def _gram_consistencies(
+        style_grams: Dict[str, torch.Tensor],
+        transformed_grams: Dict[str, torch.Tensor]
+    ) -> List[float]:
+        """
+        Mean cosine similarity between each style image's Gram matrices and the
+        transformed image's, over the layers where both are non-zero. All style
+        images and layers are reduced on the device with a single host sync.
+        """
+        similarities = []
+        valid = []
+        for layer, transformed_gram in transformed_grams.items():
+            style_flat = style_grams[layer].flatten(1)
+            transformed_flat = transformed_gram.flatten(1)
+            norms = style_flat.norm(dim=1) * transformed_flat.norm(dim=1)
+            layer_valid = norms > 0
+            similarities.append((style_flat @ transformed_flat.t()).squeeze(1) / norms.clamp_min(1e-30))
+            valid.append(layer_valid)
+
+        similarities = torch.stack(similarities)
+        valid = torch.stack(valid)
+        counts = valid.sum(dim=0)
+        scores = torch.where(valid, similarities, torch.zeros_like(similarities)).sum(dim=0) / counts.clamp_min(1)
+        return torch.where(counts > 0, scores, torch.zeros_like(scores)).tolist()
 
     def measure_performance(
         self,
@@ -142,6 +221,7 @@ class QualityMetrics:
 
         return metrics, result
 
+    @torch.inference_mode()
     def assess_quality(
         self,
         content_image: torch.Tensor,
@@ -152,6 +232,8 @@ class QualityMetrics:
     ) -> Dict:
         """
         Comprehensive quality assessment of style transfer result.
+        Runs under inference mode: no autograd state or version counters are
+        tracked for the VGG activations.
 
         Args:
             content_image: Original content image tensor
@@ -167,12 +249,9 @@ class QualityMetrics:
             logger.warning("No style images provided for quality assessment.")
             avg_style_consistency = 0.0
         else:
-            all_consistencies = []
-            for style_image in style_images:
-                consistency = self.compute_style_consistency(
-                    style_image, transformed_image, feature_extractor
-                )
-                all_consistencies.append(consistency)
+            all_consistencies = self.compute_style_consistencies(
+                style_images, transformed_image, feature_extractor
+            )
 
             valid_consistencies = [c for c in all_consistencies if not np.isnan(c)]
             avg_style_consistency = np.mean(valid_consistencies) if valid_consistencies else 0.0
@@ -14,7 +14,11 @@ import json
 import asyncio
 from src.api.app import app
 
-client = TestClient(app)
+@pytest.fixture(scope="module")
+def client():
+    """Test client that runs the application lifespan (service startup/shutdown)."""
+    with TestClient(app) as test_client:
+        yield test_client
 
 @pytest.fixture
 def test_images():
@@ -31,7 +35,7 @@ def test_images():
         'content': content_bytes,
     }
 
-def test_health_check():
+def test_health_check(client):
     """Test the health check endpoint."""
     response = client.get("/health")
     assert response.status_code == 200
@@ -40,7 +44,7 @@ def test_health_check():
     assert data["service"] == "postcard-ai-transformer"
     assert "version" in data
 
-def test_root_endpoint():
+def test_root_endpoint(client):
     """Test the root endpoint."""
     response = client.get("/")
     assert response.status_code == 200
@@ -50,7 +54,7 @@ def test_root_endpoint():
     assert "endpoints" in data
     assert all(endpoint in data["endpoints"] for endpoint in ["health", "transform", "styles"])
 
-def test_transform_endpoint(test_images):
+def test_transform_endpoint(client, test_images):
     """Test the image transformation endpoint using period/category IDs."""
     files = {
         'content_image': ('content.jpg', test_images['content'], 'image/jpeg'),
@@ -88,8 +92,29 @@ def test_transform_endpoint(test_images):
     result_response = client.get(f"/result/{process_id}")
     assert result_response.status_code == 200
     assert result_response.headers["content-type"] == "image/jpeg"
+    assert "max-age" in result_response.headers["cache-control"]
+    assert int(result_response.headers["content-length"]) == len(result_response.content)
 
-def test_transform_invalid_input():
+def test_transform_inline_result(client, test_images):
+    """Test that the transformation result can be streamed back directly."""
+    files = {
+        'content_image': ('content.jpg', test_images['content'], 'image/jpeg'),
+    }
+    data = {
+        'period_id': '1906_1917',
+        'category_id': 'drawn_scenery',
+        'num_steps': 2,
+        'return_inline': True
+    }
+
+    response = client.post("/transform", files=files, data=data)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    assert "x-result-id" in response.headers
+    PIL.Image.open(io.BytesIO(response.content)).verify()
+
+def test_transform_invalid_input(client):
     """Test transformation endpoint with invalid inputs."""
     response = client.post("/transform", data={'period_id': 'test', 'category_id': 'test'})
     assert response.status_code == 422
@@ -108,7 +133,7 @@ def test_transform_invalid_input():
     response = client.post("/transform", files=files, data=data)
     assert response.status_code == 500
 
-def test_result_not_found():
+def test_result_not_found(client):
     """Test result endpoint with non-existent ID."""
     response = client.get("/result/nonexistent")
     assert response.status_code == 404
@@ -117,7 +142,7 @@ def test_result_not_found():
     assert data["detail"] == "Result not found"
 
 @pytest.mark.asyncio
-async def test_concurrent_requests(test_images):
+async def test_concurrent_requests(client, test_images):
     """Test handling of concurrent transformation requests."""
     async with httpx.AsyncClient(app=app, base_url="http://test") as ac:
         files = {
@@ -145,7 +170,7 @@ async def test_concurrent_requests(test_images):
             assert "metrics" in res_data
             assert "result_id" in res_data
 
-def test_transform_parameters(test_images):
+def test_transform_parameters(client, test_images):
     """Test transformation with different parameter values."""
     files = {
         'content_image': ('content.jpg', test_images['content'], 'image/jpeg'),
@@ -4,7 +4,7 @@ Tests for the VGG19 feature extractor module.
 
 import unittest
 import torch
-from src.models.feature_extractor import VGG19FeatureExtractor
+from src.models.feature_extractor import VGG19FeatureExtractor, IMAGENET_MEAN, IMAGENET_STD, _pretrained_vgg19_features
 
 class TestVGG19FeatureExtractor(unittest.TestCase):
     @classmethod
@@ -41,6 +41,28 @@ class TestVGG19FeatureExtractor(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.extractor.set_layers(['invalid_layer'])
 
+    def test_layer_map_matches_blocks(self):
+        """Test that the static layer map points at the convolutions and instances own their weights."""
+        for block_index, layer_index in self.extractor.layer_map.values():
+            self.assertIsInstance(self.extractor.blocks[block_index][layer_index], torch.nn.Conv2d)
+        self.assertEqual(len(self.extractor.layer_map), 16)
+
+        other = VGG19FeatureExtractor(layers=['conv1_1'])
+        self.assertIsNot(other.blocks[0][0].weight, self.extractor.blocks[0][0].weight)
+        self.assertTrue(torch.equal(other.blocks[0][0].weight, self.extractor.blocks[0][0].weight))
+
+    def test_folded_normalization(self):
+        """Test that conv1_1 on raw input matches the original conv1_1 on normalized input away from the border."""
+        original_conv = _pretrained_vgg19_features()[0]
+        raw = torch.rand(1, 3, 32, 32)
+        normalized = (raw - torch.tensor(IMAGENET_MEAN).view(1, 3, 1, 1)) / torch.tensor(IMAGENET_STD).view(1, 3, 1, 1)
+
+        with torch.no_grad():
+            expected = original_conv(normalized)
+            folded = self.extractor.blocks[0][0](raw)
+
+        self.assertTrue(torch.allclose(folded[..., 1:-1, 1:-1], expected[..., 1:-1, 1:-1], atol=1e-4))
+
     def test_feature_extraction(self):
         """Test feature extraction functionality."""
         features = self.extractor(self.test_input)
@@ -56,6 +78,16 @@ class TestVGG19FeatureExtractor(unittest.TestCase):
 
             self.assertFalse(feature.requires_grad)
 
+    def test_set_layers_updates_forward(self):
+        """Test that the forward pass follows the selected layers after set_layers."""
+        extractor = VGG19FeatureExtractor(layers=['conv1_1'])
+        self.assertEqual({name: f.size(1) for name, f in extractor(self.test_input).items()}, {'conv1_1': 64})
+
+        extractor.set_layers(['conv3_1', 'conv1_2'])
+        features = extractor(self.test_input)
+        self.assertEqual({name: f.size(1) for name, f in features.items()}, {'conv3_1': 256, 'conv1_2': 64})
+        self.assertEqual(features['conv3_1'].shape[-2:], (56, 56))
+
     def test_gram_matrix(self):
         """Test Gram matrix computation."""
         test_features = torch.randn(2, 64, 32, 32)
@@ -68,6 +100,74 @@ class TestVGG19FeatureExtractor(unittest.TestCase):
 
         self.assertTrue(torch.allclose(gram, gram.transpose(1, 2), atol=1e-4))
 
+    def test_gram_matrix_normalization(self):
+        """Test the fused Gram matrix against the explicit formula, for NCHW and channels_last input."""
+        test_features = torch.randn(2, 16, 8, 12)
+        flat = test_features.reshape(2, 16, -1)
+        expected = torch.bmm(flat, flat.transpose(1, 2)) / (16 * 8 * 12)
+
+        for features in (test_features, test_features.contiguous(memory_format=torch.channels_last)):
+            self.assertTrue(torch.allclose(VGG19FeatureExtractor.gram_matrix(features), expected, atol=1e-6))
+
+    def test_average_gram_matrix(self):
+        """Test the single-matmul average Gram matrix against per-image Gram matrices."""
+        test_features = torch.randn(3, 16, 8, 8)
+
+        average = VGG19FeatureExtractor.average_gram_matrix(test_features)
+        expected = VGG19FeatureExtractor.gram_matrix(test_features).mean(dim=0, keepdim=True)
+
+        self.assertEqual(average.shape, (1, 16, 16))
+        self.assertTrue(torch.allclose(average, expected, atol=1e-5))
+
+    def test_channels_last(self):
+        """Test that a channels_last extractor matches the default NCHW features."""
+        layers = ['conv1_1', 'conv2_1']
+        reference = VGG19FeatureExtractor(layers=layers)
+        channels_last = VGG19FeatureExtractor(layers=layers).to(memory_format=torch.channels_last)
+
+        expected = reference(self.test_input)
+        features = channels_last(self.test_input)
+
+        for name in layers:
+            self.assertTrue(torch.allclose(features[name], expected[name], atol=1e-4))
+            gram = VGG19FeatureExtractor.gram_matrix(features[name])
+            self.assertTrue(torch.allclose(gram, VGG19FeatureExtractor.gram_matrix(expected[name]), atol=1e-4))
+
+    def test_script(self):
+        """Test that the TorchScript extractor matches eager features and keeps input gradients."""
+        layers = ['conv2_1', 'conv1_1']
+        reference = VGG19FeatureExtractor(layers=layers)
+        scripted = VGG19FeatureExtractor(layers=layers).script()
+
+        expected = reference(self.test_input)
+        test_input = self.test_input.clone().requires_grad_(True)
+        features = scripted(test_input)
+
+        self.assertEqual(set(features.keys()), set(layers))
+        for name in layers:
+            self.assertTrue(torch.allclose(features[name], expected[name], atol=1e-5))
+        features['conv2_1'].sum().backward()
+        self.assertIsNotNone(test_input.grad)
+
+        scripted.set_layers(['conv1_1'])
+        self.assertEqual(set(scripted(self.test_input).keys()), {'conv1_1'})
+
+    def test_quantize_int8(self):
+        """Test that the int8 extractor produces the same feature shapes."""
+        if not torch.backends.quantized.supported_engines or torch.backends.quantized.supported_engines == ['none']:
+            self.skipTest("No quantization engine available")
+        layers = ['conv1_1', 'conv2_1']
+        reference = VGG19FeatureExtractor(layers=layers)
+        quantized = VGG19FeatureExtractor(layers=layers).quantize_int8([torch.randn(1, 3, 64, 64)])
+
+        expected = reference(self.test_input)
+        features = quantized(self.test_input)
+
+        self.assertEqual(set(features.keys()), set(layers))
+        for name in layers:
+            self.assertEqual(features[name].shape, expected[name].shape)
+            self.assertEqual(features[name].dtype, torch.float32)
+
     def test_model_frozen(self):
         """Test that model parameters are frozen."""
         for param in self.extractor.parameters():
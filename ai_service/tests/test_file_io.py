@@ -0,0 +1,60 @@
+"""
+Tests for the file I/O helpers.
+"""
+
+import unittest
+import asyncio
+import io
+from pathlib import Path
+from fastapi import UploadFile
+from src.utils.file_io import save_upload_file, buffer_upload_file
+
+class TestFileIO(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Set up test resources."""
+        cls.test_dir = Path(__file__).parent / "test_data_file_io"
+        cls.test_dir.mkdir(exist_ok=True)
+
+    def test_save_upload_file(self):
+        """Test that uploads larger than one chunk are written completely."""
+        payload = bytes(range(256)) * 100
+        upload = UploadFile(file=io.BytesIO(payload), filename="upload.bin")
+        destination = self.test_dir / "upload.bin"
+
+        asyncio.run(save_upload_file(upload, destination, chunk_size=1000))
+
+        self.assertEqual(destination.read_bytes(), payload)
+
+    def test_buffer_small_upload_in_memory(self):
+        """Test that uploads within the limit stay in memory."""
+        payload = b"x" * 100
+        upload = UploadFile(file=io.BytesIO(payload), filename="small.bin")
+        spill_path = self.test_dir / "small.bin"
+
+        result = asyncio.run(buffer_upload_file(upload, spill_path, limit=100))
+
+        self.assertIsInstance(result, io.BytesIO)
+        self.assertEqual(result.getvalue(), payload)
+        self.assertFalse(spill_path.exists())
+
+    def test_buffer_large_upload_spills_to_disk(self):
+        """Test that uploads over the limit are written to the spill path."""
+        payload = b"y" * 101
+        upload = UploadFile(file=io.BytesIO(payload), filename="large.bin")
+        spill_path = self.test_dir / "large.bin"
+
+        result = asyncio.run(buffer_upload_file(upload, spill_path, limit=100))
+
+        self.assertEqual(result, spill_path)
+        self.assertEqual(spill_path.read_bytes(), payload)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clean up test resources."""
+        import shutil
+        if cls.test_dir.exists():
+            shutil.rmtree(cls.test_dir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+"""
+Tests for the post-processing enhancement helpers.
+"""
+
+import unittest
+import numpy as np
+from PIL import Image
+from src.utils.image_enhancements import adjust_saturation, adjust_saturation_array, unsharp_mask
+
+class TestImageEnhancements(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Set up test resources."""
+        rng = np.random.default_rng(0)
+        cls.image_rgb = rng.integers(0, 256, size=(32, 48, 3), dtype=np.uint8)
+
+    def test_adjust_saturation_array_matches_pil(self):
+        """Test that the array saturation boost matches the PIL implementation."""
+        for factor in (0.5, 1.0, 1.3):
+            expected = np.asarray(adjust_saturation(Image.fromarray(self.image_rgb), factor)).astype(np.int16)
+            result_bgr = adjust_saturation_array(np.ascontiguousarray(self.image_rgb[:, :, ::-1]), factor)
+            result = result_bgr[:, :, ::-1].astype(np.int16)
+
+            self.assertEqual(result.shape, expected.shape)
+            self.assertLessEqual(np.abs(result - expected).max(), 2)
+
+    def test_adjust_saturation_array_grayscale_passthrough(self):
+        """Test that non-color arrays are returned unchanged."""
+        gray = self.image_rgb[:, :, 0]
+        self.assertIs(adjust_saturation_array(gray, 1.5), gray)
+
+    def test_unsharp_mask_leaves_float_input_untouched(self):
+        """Test that float input is not modified and zero amount is a no-op."""
+        image_float = self.image_rgb.astype(np.float32)
+        original = image_float.copy()
+
+        result = unsharp_mask(image_float, amount=0.0, threshold=5)
+
+        self.assertTrue(np.array_equal(image_float, original))
+        self.assertEqual(result.dtype, np.uint8)
+        self.assertTrue(np.array_equal(result, self.image_rgb))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,10 +5,11 @@ Tests for the image processing module.
 import unittest
 import torch
 import os
+import io
 from PIL import Image
 import numpy as np
 from pathlib import Path
-from src.utils.image_processing import ImageProcessor
+from src.utils.image_processing import ImageProcessor, is_image_data
 
 class TestImageProcessor(unittest.TestCase):
     @classmethod
@@ -28,6 +29,16 @@ class TestImageProcessor(unittest.TestCase):
         self.assertEqual(self.processor.max_image_size, 512)
         self.assertTrue(isinstance(self.processor.device, torch.device))
 
+    def test_is_image_data(self):
+        """Test image signature sniffing."""
+        for image_format in ('JPEG', 'PNG', 'WEBP', 'GIF'):
+            buffer = io.BytesIO()
+            self.test_image.save(buffer, format=image_format)
+            self.assertTrue(is_image_data(buffer.getvalue()[:12]), image_format)
+
+        self.assertFalse(is_image_data(b'<!DOCTYPE html>'))
+        self.assertFalse(is_image_data(b''))
+
     def test_resize_image(self):
         """Test image resizing functionality."""
         resized = self.processor._resize_image(self.test_image)
@@ -47,6 +58,52 @@ class TestImageProcessor(unittest.TestCase):
         self.assertIsInstance(tensor, torch.Tensor)
         self.assertEqual(tensor.dim(), 4)
         self.assertEqual(tensor.size(1), 3)
+        self.assertGreaterEqual(tensor.min().item(), 0.0)
+        self.assertLessEqual(tensor.max().item(), 1.0)
+
+    def test_load_image_max_side(self):
+        """Test that load_image caps the longer side at max_side."""
+        image, tensor = self.processor.load_image(str(self.test_image_path), max_side=64)
+
+        self.assertLessEqual(max(image.size), 64)
+        self.assertEqual(tuple(tensor.shape[2:]), (image.size[1], image.size[0]))
+
+    def test_load_pil(self):
+        """Test that load_pil returns the capped RGB image without a tensor."""
+        image = self.processor.load_pil(str(self.test_image_path), max_side=64)
+
+        self.assertIsInstance(image, Image.Image)
+        self.assertEqual(image.mode, 'RGB')
+        self.assertLessEqual(max(image.size), 64)
+
+    def test_select_scaling_factor(self):
+        """Test that the DCT scale covers both target dimensions, not just the longer side."""
+        factors = [(1, 8), (1, 4), (1, 2), (1, 1)]
+        # A wide style image for a portrait target must keep enough height
+        self.assertEqual(ImageProcessor._select_scaling_factor(4000, 1000, 600, 800, factors), (1, 1))
+        self.assertEqual(ImageProcessor._select_scaling_factor(4000, 4000, 600, 800, factors), (1, 4))
+        self.assertEqual(ImageProcessor._select_scaling_factor(4000, 3000, 500, 0, factors), (1, 8))
+        self.assertIsNone(ImageProcessor._select_scaling_factor(400, 300, 600, 800, factors))
+
+    def test_pillow_decoder(self):
+        """Test that the Pillow decoder produces the same image size as the default decoder."""
+        pillow_processor = ImageProcessor(max_image_size=512, decoder="pillow")
+        image = pillow_processor.open_image(str(self.test_image_path))
+
+        self.assertEqual(image.size, self.test_image.size)
+        self.assertEqual(image.mode, 'RGB')
+
+        with self.assertRaises(ValueError):
+            ImageProcessor(decoder="unknown")
+
+    def test_load_image_from_buffer(self):
+        """Test image loading from an in-memory buffer."""
+        buffer = io.BytesIO(self.test_image_path.read_bytes())
+        image, tensor = self.processor.load_image(buffer)
+
+        self.assertIsInstance(image, Image.Image)
+        self.assertEqual(tensor.dim(), 4)
+        self.assertEqual(tensor.size(1), 3)
 
     def test_tensor_to_image(self):
         """Test tensor to image conversion."""
@@ -66,6 +123,14 @@ class TestImageProcessor(unittest.TestCase):
         self.assertEqual(batch.size(0), 3)
         self.assertEqual(batch.size(1), 3)
 
+    def test_to_device(self):
+        """Test that host tensors are transferred to the target device unchanged."""
+        tensor = torch.rand(1, 3, 8, 8)
+        moved = self.processor.to_device(tensor)
+
+        self.assertEqual(moved.device.type, self.processor.device.type)
+        self.assertTrue(torch.equal(moved.cpu(), tensor))
+
     def test_save_image(self):
         """Test image saving functionality."""
         output_path = self.test_dir / "output_test.jpg"
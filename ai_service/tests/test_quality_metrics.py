@@ -16,9 +16,9 @@ class TestQualityMetrics(unittest.TestCase):
         cls.metrics = QualityMetrics(device=cls.device)
         cls.feature_extractor = VGG19FeatureExtractor().to(cls.device)
 
-        cls.content_image = torch.randn(1, 3, 64, 64).to(cls.device)
-        cls.style_image = torch.randn(1, 3, 64, 64).to(cls.device)
-        cls.transformed_image = torch.randn(1, 3, 64, 64).to(cls.device)
+        cls.content_image = torch.rand(1, 3, 64, 64).to(cls.device)
+        cls.style_image = torch.rand(1, 3, 64, 64).to(cls.device)
+        cls.transformed_image = torch.rand(1, 3, 64, 64).to(cls.device)
 
         cls.loss_history = {
             'content_loss': [2.0, 1.5, 1.0],
@@ -44,6 +44,23 @@ class TestQualityMetrics(unittest.TestCase):
         self.assertGreaterEqual(similarity, 0.0)
         self.assertLessEqual(similarity, 1.0)
 
+    def test_content_similarity_separates_noise(self):
+        """Test that a noisy copy of an image in [0, 1] scores clearly below an identical one."""
+        image = torch.rand(1, 3, 64, 64).to(self.device)
+        noisy = (image + 0.5 * torch.randn_like(image)).clamp(0, 1)
+
+        identical = self.metrics.compute_content_similarity(image, image)
+        degraded = self.metrics.compute_content_similarity(image, noisy)
+
+        self.assertAlmostEqual(identical, 1.0, places=4)
+        self.assertLess(degraded, 0.7)
+
+    def test_box_filter_matches_avg_pool(self):
+        """Test that the separable box filter reproduces the 11x11 average pooling window."""
+        x = torch.randn(2, 5, 32, 40).to(self.device)
+        expected = torch.nn.functional.avg_pool2d(x, kernel_size=11, stride=1, padding=5)
+        self.assertTrue(torch.allclose(QualityMetrics._box_filter(x, 11), expected, atol=1e-5))
+
     def test_style_consistency(self):
         """Test style consistency computation."""
         consistency = self.metrics.compute_style_consistency(
@@ -63,6 +80,20 @@ class TestQualityMetrics(unittest.TestCase):
         self.assertGreaterEqual(consistency, 0.0)
         self.assertLessEqual(consistency, 1.0)
 
+    def test_style_consistencies(self):
+        """Test batched style consistency against the per-image computation."""
+        styles = [self.style_image, torch.randn(1, 3, 48, 80).to(self.device), self.content_image]
+        consistencies = self.metrics.compute_style_consistencies(
+            styles,
+            self.transformed_image,
+            self.feature_extractor
+        )
+
+        self.assertEqual(len(consistencies), 3)
+        for style, consistency in zip(styles, consistencies):
+            expected = self.metrics.compute_style_consistency(style, self.transformed_image, self.feature_extractor)
+            self.assertAlmostEqual(consistency, expected, places=4)
+
     def test_performance_measurement(self):
         """Test performance measurement functionality."""
         def dummy_function(x):
@@ -3,8 +3,10 @@ Tests for the style transfer module.
 """
 
 import unittest
+import math
+from concurrent.futures import ThreadPoolExecutor
 import torch
-from src.models.style_transfer import StyleTransfer
+from src.models.style_transfer import StyleTransfer, _FiniteGradGuard, _make_adam, _UNFUSED_ADAM_DEVICES
 
 class TestStyleTransfer(unittest.TestCase):
     @classmethod
@@ -36,6 +38,17 @@ class TestStyleTransfer(unittest.TestCase):
         self.assertEqual(custom_style_transfer.content_layers, ['conv3_2'])
         self.assertEqual(custom_style_transfer.style_layers, ['conv1_1', 'conv2_1'])
 
+    def test_precision(self):
+        """Test precision selection for the VGG forward pass."""
+        fp32_transfer = StyleTransfer(device=torch.device("cpu"), precision="fp32")
+        self.assertIsNone(fp32_transfer.amp_dtype)
+
+        bf16_transfer = StyleTransfer(device=torch.device("cpu"), precision="bf16")
+        self.assertEqual(bf16_transfer.amp_dtype, torch.bfloat16)
+
+        with self.assertRaises(ValueError):
+            StyleTransfer(device=torch.device("cpu"), precision="int4")
+
     def test_content_loss(self):
         """Test content loss computation."""
         content_features = self.style_transfer.feature_extractor(self.content_image)
@@ -58,6 +71,29 @@ class TestStyleTransfer(unittest.TestCase):
 
         self.assertIsInstance(loss, torch.Tensor)
 
+    def test_average_style_grams_mixed_sizes(self):
+        """Test that references of different sizes are averaged like individually computed Gram matrices."""
+        style_images = [self.style_image, torch.randn(1, 3, 48, 80).to(self.device), self.content_image]
+        with torch.no_grad():
+            averaged = self.style_transfer._calculate_average_style_grams(style_images)
+            individual = [self.style_transfer._calculate_average_style_grams([image]) for image in style_images]
+
+        for layer in self.style_transfer.style_layers:
+            expected = torch.stack([grams[layer] for grams in individual]).mean(dim=0)
+            self.assertTrue(torch.allclose(averaged[layer], expected, rtol=1e-3, atol=1e-5))
+
+    def test_image_style_grams_mixed_sizes(self):
+        """Test that per-image Gram matrices keep input order when references of different sizes are grouped."""
+        style_images = [self.style_image, torch.randn(1, 3, 48, 80).to(self.device), self.content_image]
+        image_grams = self.style_transfer.compute_image_style_grams(style_images)
+
+        self.assertEqual(len(image_grams), len(style_images))
+        for style_image, grams in zip(style_images, image_grams):
+            expected = self.style_transfer.compute_style_grams([style_image])
+            for layer in self.style_transfer.style_layers:
+                self.assertEqual(grams[layer].size(), expected[layer].size())
+                self.assertTrue(torch.allclose(grams[layer], expected[layer], rtol=1e-3, atol=1e-5))
+
     def test_tv_loss(self):
         """Test total variation loss computation."""
         loss = self.style_transfer.compute_tv_loss(self.content_image)
@@ -66,6 +102,10 @@ class TestStyleTransfer(unittest.TestCase):
         self.assertEqual(loss.dim(), 0)
         self.assertGreaterEqual(loss.item(), 0)
 
+        stripes = torch.zeros(1, 3, 4, 4, device=self.device)
+        stripes[:, :, :, 1::2] = 0.5
+        self.assertAlmostEqual(self.style_transfer.compute_tv_loss(stripes).item(), 0.25, places=6)
+
     def test_style_transfer(self):
         """Test complete style transfer process."""
         output_image, history = self.style_transfer.transfer_style(
@@ -90,6 +130,153 @@ class TestStyleTransfer(unittest.TestCase):
 
         self.assertLessEqual(history['total_loss'][-1], history['total_loss'][0])
 
+    def test_style_transfer_precomputed_grams(self):
+        """Test style transfer with pre-computed style Gram matrices."""
+        style_grams = self.style_transfer.compute_style_grams([self.style_image])
+        self.assertEqual(set(style_grams.keys()), set(self.style_transfer.style_layers))
+
+        output_image, history = self.style_transfer.transfer_style(
+            self.content_image,
+            [],
+            num_steps=2,
+            style_grams=style_grams
+        )
+
+        self.assertEqual(output_image.size(), self.content_image.size())
+        self.assertEqual(len(history['total_loss']), 2)
+
+    def test_style_transfer_batch(self):
+        """Test batched style transfer matches the single-image optimization."""
+        style_grams = self.style_transfer.compute_style_grams([self.style_image])
+        single_output, single_history = self.style_transfer.transfer_style(
+            self.content_image,
+            [],
+            num_steps=2,
+            style_grams=style_grams
+        )
+
+        other_content = torch.randn(1, 3, 64, 64).to(self.device)
+        batch_output, histories = self.style_transfer.transfer_style_batch(
+            torch.cat([self.content_image, other_content], dim=0),
+            [style_grams, style_grams],
+            num_steps=2
+        )
+
+        self.assertEqual(batch_output.size(), (2, 3, 64, 64))
+        self.assertEqual(len(histories), 2)
+        self.assertEqual(len(histories[0]['total_loss']), 2)
+        self.assertTrue(torch.allclose(batch_output[:1], single_output, atol=1e-4))
+        self.assertAlmostEqual(histories[0]['total_loss'][0], single_history['total_loss'][0], delta=abs(single_history['total_loss'][0]) * 1e-3)
+
+    def test_style_transfer_batch_nan_rollback(self):
+        """Test that a non-finite gradient rolls the batch back instead of returning a corrupted image."""
+        style_grams = {
+            layer: torch.full_like(gram, float('nan'))
+            for layer, gram in self.style_transfer.compute_style_grams([self.style_image]).items()
+        }
+        nan_transfer = StyleTransfer(device=self.device)
+        # On a GPU this drives the replayed graph steps, otherwise the eager ones
+        nan_transfer.use_cuda_graphs = self.device.type == "cuda"
+
+        output_image, histories = nan_transfer.transfer_style_batch(self.content_image, [style_grams], num_steps=12)
+
+        self.assertTrue(torch.isfinite(output_image).all())
+        self.assertTrue(torch.allclose(output_image, self.content_image.clamp(0, 1)))
+        self.assertEqual(len(histories[0]['total_loss']), 12)
+        self.assertTrue(all(math.isnan(value) for value in histories[0]['total_loss']))
+
+    def test_style_transfer_detaches_content(self):
+        """Test that gradients never flow back into the caller's content tensor."""
+        content_image = self.content_image.clone().requires_grad_(True)
+        output_image, _ = self.style_transfer.transfer_style(
+            content_image * 1.0,
+            [self.style_image],
+            num_steps=1
+        )
+
+        self.assertFalse(output_image.requires_grad)
+        self.assertIsNone(content_image.grad)
+
+    def test_finite_grad_guard_rolls_back(self):
+        """Test that a non-finite gradient restores the image from the last passing check."""
+        image = torch.zeros(1, 3, 8, 8, device=self.device, requires_grad=True)
+        guard = _FiniteGradGuard(image)
+
+        image.grad = torch.ones_like(image)
+        guard.record()
+        with torch.no_grad():
+            image.add_(1)
+        self.assertTrue(guard.check(1))
+
+        image.grad = torch.full_like(image, float('nan'))
+        guard.record()
+        with torch.no_grad():
+            image.add_(1)
+        self.assertFalse(guard.check(2))
+        self.assertEqual(guard.good_steps, 1)
+        self.assertTrue(torch.equal(image.detach(), torch.ones_like(image)))
+
+    @unittest.skipUnless(torch.cuda.is_available(), "CUDA graphs require a GPU")
+    def test_style_transfer_cuda_graph(self):
+        """Test that graph replay keeps optimizing after the eager warmup steps."""
+        graph_transfer = StyleTransfer(device=torch.device("cuda"))
+        graph_transfer.use_cuda_graphs = True
+        style_grams = graph_transfer.compute_style_grams([self.style_image])
+
+        output_image, histories = graph_transfer.transfer_style_batch(
+            self.content_image,
+            [style_grams],
+            num_steps=8
+        )
+
+        self.assertEqual(output_image.size(), self.content_image.size())
+        self.assertEqual(len(histories[0]['total_loss']), 8)
+        self.assertLess(histories[0]['total_loss'][-1], histories[0]['total_loss'][0])
+
+    @unittest.skipUnless(torch.cuda.is_available(), "CUDA graphs require a GPU")
+    def test_style_transfer_batch_graph_cache(self):
+        """Test that a cached step graph reproduces a freshly captured one."""
+        graph_transfer = StyleTransfer(device=torch.device("cuda"))
+        graph_transfer.use_cuda_graphs = True
+        graph_transfer.graph_cache_size = 1
+        style_grams = graph_transfer.compute_style_grams([self.style_image])
+
+        first_output, first_histories = graph_transfer.transfer_style_batch(self.content_image, [style_grams], num_steps=8)
+        self.assertEqual(len(graph_transfer._step_graphs), 1)
+        second_output, second_histories = graph_transfer.transfer_style_batch(self.content_image, [style_grams], num_steps=8)
+
+        self.assertTrue(torch.allclose(first_output, second_output, atol=1e-3))
+        self.assertEqual(len(second_histories[0]['total_loss']), 8)
+        self.assertAlmostEqual(second_histories[0]['total_loss'][0], first_histories[0]['total_loss'][0], delta=abs(first_histories[0]['total_loss'][0]) * 1e-3)
+
+    @unittest.skipUnless(torch.cuda.is_available(), "CUDA graphs require a GPU")
+    def test_style_transfer_batch_graph_cache_concurrent(self):
+        """Test that concurrent calls with one key never share a graph and leave a single cache entry."""
+        graph_transfer = StyleTransfer(device=torch.device("cuda"))
+        graph_transfer.use_cuda_graphs = True
+        graph_transfer.graph_cache_size = 2
+        style_grams = graph_transfer.compute_style_grams([self.style_image])
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(graph_transfer.transfer_style_batch, self.content_image, [style_grams], num_steps=8)
+                for _ in range(2)
+            ]
+            outputs = [future.result()[0] for future in futures]
+
+        self.assertEqual(len(graph_transfer._step_graphs), 1)
+        self.assertTrue(torch.allclose(outputs[0], outputs[1], atol=1e-3))
+        self.assertNotEqual(outputs[0].data_ptr(), outputs[1].data_ptr())
+
+    def test_make_adam(self):
+        """Test that the optimizer is fused where supported and falls back quietly elsewhere."""
+        image = torch.rand(1, 3, 8, 8, device=self.device, requires_grad=True)
+        for _ in range(2):
+            optimizer = _make_adam(image, 0.01)
+            fused = bool(optimizer.defaults.get('fused'))
+            self.assertEqual(fused, image.device.type not in _UNFUSED_ADAM_DEVICES)
+        self.assertTrue(_make_adam(image, 0.01, capturable=True).defaults['capturable'])
+
     def test_callback(self):
         """Test callback functionality."""
         callback_called = False
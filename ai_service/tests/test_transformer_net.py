@@ -0,0 +1,46 @@
+"""
+Tests for the feed-forward TransformerNet module.
+"""
+
+import unittest
+import torch
+from pathlib import Path
+from src.models.transformer_net import TransformerNet
+
+class TestTransformerNet(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Set up test resources."""
+        cls.device = torch.device("cpu")
+        cls.model = TransformerNet().eval()
+        cls.test_input = torch.rand(1, 3, 64, 64) * 255
+        cls.test_dir = Path(__file__).parent / "test_data_transformer_net"
+        cls.test_dir.mkdir(exist_ok=True)
+
+    def test_forward_shape(self):
+        """Test that the output has the same shape as the input."""
+        with torch.no_grad():
+            output = self.model(self.test_input)
+        self.assertEqual(output.shape, self.test_input.shape)
+
+    def test_from_checkpoint(self):
+        """Test loading a saved state dict."""
+        checkpoint_path = self.test_dir / "1906_1917__drawn_scenery.pt"
+        torch.save(self.model.state_dict(), checkpoint_path)
+
+        loaded = TransformerNet.from_checkpoint(checkpoint_path, self.device)
+
+        self.assertFalse(loaded.training)
+        self.assertTrue(all(not p.requires_grad for p in loaded.parameters()))
+        with torch.no_grad():
+            self.assertTrue(torch.allclose(loaded(self.test_input), self.model(self.test_input)))
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clean up test resources."""
+        import shutil
+        if cls.test_dir.exists():
+            shutil.rmtree(cls.test_dir)
+
+if __name__ == '__main__':
+    unittest.main()